@@ -56,12 +56,84 @@ def combine(files, port):
     )
 
 
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.argument("outputs_dir", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--output-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory for the combined files (default: OUTPUTS_DIR/combined).",
+)
+@click.option("--begin", "spool_begin", type=int, default=None, help="First spool to combine.")
+@click.option(
+    "--end",
+    "spool_end",
+    type=int,
+    default=None,
+    help="Last spool to combine (inclusive).",
+)
+@click.option(
+    "--variable",
+    "variables",
+    multiple=True,
+    help="Variable to combine. Repeat option for multiple variables (default: all).",
+)
+@click.option(
+    "--complevel",
+    default=4,
+    show_default=True,
+    help="zlib compression level, 0 for none.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Number of reader processes (default: CPU count).",
+)
+@click.option(
+    "--no-resume",
+    is_flag=True,
+    default=False,
+    help="Recombine spools whose combined file already exists.",
+)
+def combine_schout(outputs_dir, output_dir, spool_begin, spool_end, variables,
+                   complevel, workers, no_resume):
+    """Combine per-rank schout_RANK_SPOOL.nc files into schout_SPOOL.nc.
+
+    Ranks are scattered into the global mesh using the local_to_global
+    files in OUTPUTS_DIR.  The combined files go to OUTPUTS_DIR/combined
+    unless --output-dir is given.  Spools already combined are skipped, so
+    an interrupted run can simply be started again.
+
+    Examples::
+
+        schismviz combine-schout study/outputs
+
+        schismviz combine-schout study/outputs --begin 10 --variable elev
+    """
+    from schismviz.schout_reader import combine_schout as _combine_schout
+
+    written = _combine_schout(
+        outputs_dir,
+        path_combined=output_dir,
+        spool_begin=spool_begin,
+        spool_end=spool_end,
+        variables=list(variables) or None,
+        complevel=complevel,
+        resume=not no_resume,
+        n_workers=workers,
+    )
+    for path in written:
+        click.echo(path)
+
+
 main.add_command(schismui.show_schism_output_ui, name="output")
 main.add_command(schismcalibplotui.schism_calib_plot_ui, name="calib")
 main.add_command(viz, name="viz")
 main.add_command(show_out2d_ui, name="out2d")
 main.add_command(show_schism_nc_ui, name="nc")
 main.add_command(combine, name="combine")
+main.add_command(combine_schout, name="combine-schout")
 
 
 if __name__ == "__main__":
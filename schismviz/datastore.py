@@ -1,15 +1,32 @@
-from functools import lru_cache
+from collections import OrderedDict
+import glob
 import logging
 import param
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import diskcache
 from dms_datastore.read_ts import read_ts
 from pathlib import Path
 import pandas as pd
 import geopandas as gpd
 
+from .schismstudy import slice_time_range
+
 logger = logging.getLogger(__name__)
 
+#: Environment variable naming a shared observation cache directory
+OBS_CACHE_DIR_ENV = "SCHISMVIZ_OBS_CACHE_DIR"
+
+
+def default_cache_dir():
+    """Observation cache directory used when none is given.
+
+    ``$SCHISMVIZ_OBS_CACHE_DIR`` if set, so every schismviz process on a host
+    can share one cache, otherwise ``.cache-ds`` in the working directory.
+    """
+    return os.environ.get(OBS_CACHE_DIR_ENV) or ".cache-ds"
+
 
 def convert_station_to_gdf(stations):
     return gpd.GeoDataFrame(
@@ -31,16 +48,98 @@ def find_lastest_fname(pattern, dir="."):
     return fname, mtime
 
 
+def source_signature(fpath):
+    """Return a cache key for *fpath* that changes whenever its contents do.
+
+    *fpath* may be a glob pattern (screened files sharded by year); the
+    signature covers every matching file and its modification time.  Paths
+    are resolved first so processes started in different directories, or
+    reaching the repository through a symlink, agree on the key.
+    """
+    fpath = os.path.realpath(fpath)
+    files = sorted(glob.glob(fpath))
+    return (fpath, tuple((f, os.stat(f).st_mtime_ns) for f in files))
+
+
+def frame_nbytes(df):
+    """Approximate in-memory size of a DataFrame in bytes."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ByteLRUCache:
+    """Thread-safe least-recently-used mapping bounded by total bytes.
+
+    Values are DataFrames; their size is measured with :func:`frame_nbytes`.
+    A value larger than *max_bytes* is not kept.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = frame_nbytes(value)
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
 class StationDatastore(param.Parameterized):
+    """Observed station data from a screened repository and its inventory.
+
+    With ``caching`` on, each screened series is read once with
+    :func:`read_ts` and stored in the disk cache split into one partition per
+    calendar year, keyed by :func:`source_signature` so edits to the
+    repository invalidate it.  Reads with a ``time_range`` load only the
+    partitions for the years in the window.  Partitions in use are also held
+    in memory, up to ``memory_limit`` bytes.
+
+    The disk cache may be shared by several processes (see
+    :func:`default_cache_dir`); a file is partitioned by one process at a
+    time and the others reuse the result.
+    """
+
     caching = param.Boolean(default=True, doc="Use caching")
+    memory_limit = param.Integer(
+        default=512 * 2**20, bounds=(0, None),
+        doc="Bytes of observation partitions kept in memory",
+    )
 
     def __init__(self, **kwargs):
         self.repo_dir = kwargs.pop("repo_dir", "screened")
         self.inventory_file = kwargs.pop("inventory_file", "inventory_datasets.csv")
-        self.cache_dir = kwargs.pop("cache_dir", ".cache-ds")
+        self.cache_dir = kwargs.pop("cache_dir", None) or default_cache_dir()
         super().__init__(**kwargs)
         self.cache = diskcache.Cache(self.cache_dir, size_limit=1e11)
-        self.caching_read_ts = lru_cache(maxsize=32)(self.cache.memoize()(read_ts))
+        self.memory_cache = ByteLRUCache(self.memory_limit)
         # read inventory file for each repo level
         logger.debug("Using inventory file: %s", self.inventory_file)
         self.df_dataset_inventory = pd.read_csv(self.inventory_file, comment="#")
@@ -82,10 +181,36 @@ class StationDatastore(param.Parameterized):
         # calculate min (min year) and max of max_year
         self.min_year = self.df_station_inventory["min_year"].min()
         self.max_year = self.df_station_inventory["max_year"].max()
+        self._build_index()
+
+    def _build_index(self):
+        # (station_id, subloc, param) -> row position; the first row wins, as
+        # with a filtered .iloc[0].  (station_id, param) covers any subloc.
+        self._index = {}
+        self._station_index = {}
+        inv = self.df_station_inventory
+        keys = zip(inv["station_id"].astype(str), inv["subloc"].astype(str), inv["param"])
+        for pos, (station_id, subloc, param) in enumerate(keys):
+            self._index.setdefault((station_id, subloc, param), pos)
+            self._station_index.setdefault((station_id, param), pos)
 
     def get_catalog(self):
         return self.df_station_inventory
 
+    def find_row(self, station_id, param, subloc=None):
+        """Return the inventory row for a station and param, or ``None``.
+
+        With *subloc* ``None`` the first row for the station is returned
+        regardless of its sublocation.
+        """
+        if subloc is None:
+            pos = self._station_index.get((str(station_id), param))
+        else:
+            pos = self._index.get((str(station_id), str(subloc), param))
+        if pos is None:
+            return None
+        return self.df_station_inventory.iloc[pos]
+
     def get_station_inventory_gdf(self):
         df = self.get_station_inventory().copy()
         df["subloc"] = df["subloc"].apply(lambda v: "default" if len(v) == 0 else v)
@@ -96,15 +221,147 @@ class StationDatastore(param.Parameterized):
     def last_part_path(self, dir):
         return os.path.basename(os.path.normpath(dir))
 
-    def get_data(self, row):
+    def get_data(self, row, time_range=None):
+        """Read the observed series for an inventory *row*.
+
+        *time_range* ``(start, end)`` limits the result to that window; if
+        not given, a ``time_range`` entry on *row* is used when present.
+        """
         repo_dir = self.repo_dir
         filename = row["filename"]
+        if time_range is None and hasattr(row, "get"):
+            time_range = row.get("time_range", None)
+        fpath = os.path.join(repo_dir, filename)
         if self.caching:
-            return self.caching_read_ts(os.path.join(repo_dir, filename))
+            return self.read_cached(fpath, time_range)
         else:
-            return read_ts(os.path.join(repo_dir, filename))
+            return slice_time_range(read_ts(fpath), time_range)
+
+    def read_cached(self, fpath, time_range=None):
+        """Read *fpath* through the year-partitioned cache."""
+        signature = source_signature(fpath)
+        meta = self.cache.get(("meta", signature))
+        if meta is None:
+            meta = self._store_partitions(fpath, signature)
+        years = meta["years"]
+        if time_range is not None:
+            start, end = time_range
+            if start is not None:
+                years = [y for y in years if y >= pd.Timestamp(start).year]
+            if end is not None:
+                years = [y for y in years if y <= pd.Timestamp(end).year]
+        parts = [self._get_partition(fpath, signature, year) for year in years]
+        if parts:
+            df = pd.concat(parts)
+        else:
+            df = meta["empty"]
+        df = slice_time_range(df, time_range)
+        if meta["freq"] is not None:
+            try:
+                df.index.freq = meta["freq"]
+            except ValueError:
+                pass
+        df.attrs.update(meta["attrs"])
+        return df
+
+    def _get_partition(self, fpath, signature, year):
+        key = ("part", signature, year)
+        df = self.memory_cache.get(key)
+        if df is None:
+            df = self.cache.get(key)
+            if df is None:  # evicted from disk; rebuild every partition
+                self._store_partitions(fpath, signature)
+                df = self.cache[key]
+            self.memory_cache.put(key, df)
+        return df
+
+    def _store_partitions(self, fpath, signature):
+        # Serialise partitioning of a source across threads and processes
+        # sharing the cache; whoever waited reuses the finished partitions.
+        with diskcache.Lock(self.cache, ("lock", signature), expire=600):
+            meta = self.cache.get(("meta", signature))
+            if meta is not None and all(
+                ("part", signature, year) in self.cache for year in meta["years"]
+            ):
+                return meta
+            return self._partition(fpath, signature)
+
+    def _partition(self, fpath, signature):
+        logger.debug("Partitioning %s into the observation cache", fpath)
+        df = read_ts(fpath)
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        freq = df.index.freq
+        years = sorted(df.index.year.unique()) if len(df) else []
+        for year in years:
+            part = slice_time_range(
+                df, (pd.Timestamp(year, 1, 1), pd.Timestamp(year + 1, 1, 1) - pd.Timedelta(1))
+            )
+            self.cache[("part", signature, int(year))] = part
+        meta = {
+            "years": [int(y) for y in years],
+            "freq": freq,
+            "attrs": dict(df.attrs),
+            "empty": df.iloc[0:0],
+        }
+        self.cache[("meta", signature)] = meta
+        return meta
+
+    def prefetch(self, rows=None, max_workers=8):
+        """Read the screened files of inventory *rows* into the disk cache.
+
+        Files are checked for existence before any reading starts, then the
+        present ones are read concurrently in a thread pool (the reads are
+        I/O bound).  Files already in the cache are not read again.
+
+        Parameters
+        ----------
+        rows : pandas.DataFrame, optional
+            Inventory rows to fetch; defaults to the whole catalog.
+        max_workers : int, optional
+            Size of the thread pool.
+
+        Returns
+        -------
+        dict
+            ``{filename: reason}`` for every file that could not be cached,
+            where reason is ``"missing"`` or the read error message.
+        """
+        if rows is None:
+            rows = self.get_catalog()
+        filenames = list(dict.fromkeys(rows["filename"]))
+        problems = {}
+        present = []
+        for filename in filenames:
+            if glob.glob(os.path.join(self.repo_dir, filename)):
+                present.append(filename)
+            else:
+                problems[filename] = "missing"
+        if problems:
+            logger.warning(
+                "%d of %d observation files not found in %s: %s",
+                len(problems), len(filenames), self.repo_dir, ", ".join(problems),
+            )
+        if not self.caching:
+            return problems
+
+        def _fetch(filename):
+            fpath = os.path.join(self.repo_dir, filename)
+            signature = source_signature(fpath)
+            if ("meta", signature) not in self.cache:
+                self._store_partitions(fpath, signature)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_fetch, f): f for f in present}
+        for future, filename in futures.items():
+            exc = future.exception()
+            if exc is not None:
+                logger.warning("Could not read %s: %s", filename, exc)
+                problems[filename] = str(exc)
+        return problems
 
     def clear_cache(self):
         if self.caching:
             self.cache.clear()
+            self.memory_cache.clear()
             logger.debug("Cache cleared")
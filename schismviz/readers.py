@@ -41,6 +41,8 @@ from __future__ import annotations
 import logging
 import os
 import pathlib
+import threading
+import weakref
 from typing import List, Optional
 
 import holoviews as hv
@@ -57,6 +59,90 @@ from schismviz.schismstudy import SchismStudy
 logger = logging.getLogger(__name__)
 
 
+# ---------------------------------------------------------------------------
+# Study registry
+# ---------------------------------------------------------------------------
+
+#: Keys of a study config that identify a :class:`SchismStudy`, with defaults.
+STUDY_CONFIG_DEFAULTS = {
+    "study_name": None,
+    "base_dir": ".",
+    "output_dir": "outputs",
+    "param_nml_file": "param.nml",
+    "flux_xsect_file": "flow_station_xsects.yaml",
+    "station_in_file": "station.in",
+    "flux_out": "flux.out",
+    "reftime": None,
+}
+
+# Process-wide registry of open studies.  Values are held weakly: a study
+# stays alive only while refs (and therefore catalogs) or readers point to it.
+_study_registry: "weakref.WeakValueDictionary[tuple, SchismStudy]" = (
+    weakref.WeakValueDictionary()
+)
+_study_registry_lock = threading.Lock()
+# Keys of the studies opened in this process.  Only the first open of a study
+# clears its disk cache; a study reopened after being released keeps the
+# cache it already refreshed.
+_opened_study_keys: set = set()
+
+
+def study_key(config: dict) -> tuple:
+    """Return the normalised registry key for a study *config* dict."""
+    config = {k: config.get(k, v) for k, v in STUDY_CONFIG_DEFAULTS.items()}
+    base_dir = os.path.normpath(os.path.abspath(str(config["base_dir"])))
+    if config["study_name"] is None:
+        config["study_name"] = pathlib.Path(base_dir).name
+    reftime = config["reftime"]
+    reftime = str(pd.Timestamp(reftime)) if reftime else None
+    return (
+        str(config["study_name"]),
+        base_dir,
+        os.path.normpath(str(config["output_dir"])),
+        os.path.normpath(str(config["param_nml_file"])),
+        os.path.normpath(str(config["flux_xsect_file"])),
+        os.path.normpath(str(config["station_in_file"])),
+        os.path.normpath(str(config["flux_out"])),
+        reftime,
+    )
+
+
+def get_study(config: dict) -> SchismStudy:
+    """Return the shared :class:`SchismStudy` for *config*, opening it if needed.
+
+    Studies are shared between :meth:`SchismOutputReader.scan`,
+    :meth:`SchismOutputReader.load` and all sessions in the process, so
+    ``param.nml``, ``station.in`` and the flux files are read, and the
+    study's disk cache cleared, only once per study and process.  Raises whatever
+    :class:`SchismStudy` raises if the study cannot be opened.
+    """
+    return get_study_for_key(study_key(config))
+
+
+def get_study_for_key(key: tuple) -> SchismStudy:
+    """Return the shared :class:`SchismStudy` for a :func:`study_key` tuple."""
+    key = tuple(key)
+    with _study_registry_lock:
+        study = _study_registry.get(key)
+        if study is None:
+            study_name, base_dir, output_dir, param_nml_file, flux_xsect_file, \
+                station_in_file, flux_out, reftime = key
+            study = SchismStudy(
+                study_name=study_name,
+                base_dir=base_dir,
+                output_dir=output_dir,
+                param_nml_file=param_nml_file,
+                flux_xsect_file=flux_xsect_file,
+                station_in_file=station_in_file,
+                flux_out=flux_out,
+                reftime=reftime,
+                clear_cache_on_init=key not in _opened_study_keys,
+            )
+            _study_registry[key] = study
+            _opened_study_keys.add(key)
+        return study
+
+
 # ---------------------------------------------------------------------------
 # SchismDataReference
 # ---------------------------------------------------------------------------
@@ -73,6 +159,11 @@ class SchismDataReference(DataReference):
 
     ref_type: str = "schism_output"
 
+    #: The open :class:`SchismStudy` this ref was scanned from.  Holding it on
+    #: the ref keeps the study in the registry for as long as any catalog
+    #: still contains one of its refs.
+    _study: Optional[SchismStudy] = None
+
 
 # ---------------------------------------------------------------------------
 # SchismOutputReader
@@ -83,9 +174,12 @@ class SchismOutputReader(DataReferenceReader):
     """Read SCHISM station output time series.
 
     One reader instance is created per study directory
-    (``source = str(base_dir)``).  The :class:`SchismStudy` is lazily
-    instantiated on the first :meth:`load` call using the study-config
-    attributes stored on the :class:`SchismDataReference`.
+    (``source = str(base_dir)``).  Studies are looked up in the process-wide
+    registry (see :func:`get_study`) using the study-config attributes stored
+    on the :class:`SchismDataReference`, so :meth:`load` reuses the study
+    opened by :meth:`scan` instead of re-reading its input files.  The reader
+    holds the studies it has loaded from, so they stay open for later loads
+    even after the scanned refs are gone.
 
     Parameters
     ----------
@@ -95,7 +189,7 @@ class SchismOutputReader(DataReferenceReader):
 
     def __init__(self, source: str) -> None:
         self.source = source
-        self._study: Optional[SchismStudy] = None
+        self._studies: dict = {}
 
     @classmethod
     def catalog_crs(cls) -> str:
@@ -210,6 +304,11 @@ class SchismOutputReader(DataReferenceReader):
         """Open *config* as a :class:`SchismStudy`, enumerate its catalog,
         and return one :class:`SchismDataReference` per station/variable row.
 
+        The study config is stored once, as the :func:`study_key` tuple
+        shared by every ref of the study (``study_key`` attribute), rather
+        than copied key by key onto each ref.  :meth:`load` resolves the
+        study from it through the registry.
+
         Study-level metadata (``reftime``, ``endtime``) is stored as
         ``study_start`` / ``study_end`` attributes on every ref so that
         :meth:`SchismRegistryUIManager.on_file_added` can set ``time_range``
@@ -218,18 +317,8 @@ class SchismOutputReader(DataReferenceReader):
         base_dir = config["base_dir"]
         study_name = config["study_name"]
         try:
-            study = SchismStudy(
-                study_name=study_name,
-                base_dir=base_dir,
-                output_dir=config.get("output_dir", "outputs"),
-                param_nml_file=config.get("param_nml_file", "param.nml"),
-                flux_xsect_file=config.get(
-                    "flux_xsect_file", "flow_station_xsects.yaml"
-                ),
-                station_in_file=config.get("station_in_file", "station.in"),
-                flux_out=config.get("flux_out", "flux.out"),
-                reftime=config.get("reftime"),
-            )
+            key = study_key(config)
+            study = get_study_for_key(key)
         except Exception as exc:
             logger.warning(
                 "SchismOutputReader: cannot open study at %s: %s", base_dir, exc
@@ -246,48 +335,59 @@ class SchismOutputReader(DataReferenceReader):
 
         study_start = str(study.reftime) if hasattr(study, "reftime") else ""
         study_end = str(study.endtime) if hasattr(study, "endtime") else ""
+        study_attrs: dict = {
+            "study_name": study_name,
+            # Study config — shared tuple used by load() to find the study.
+            "study_key": key,
+            # Time extent — dvue standard names used by RegistryUIManager.on_file_added
+            # to auto-expand time_range without re-opening the study.
+            "time_extent_start": study_start,
+            "time_extent_end": study_end,
+            # Legacy names kept for backward compatibility.
+            "study_start": study_start,
+            "study_end": study_end,
+        }
+
+        # Pull each catalog column out once instead of walking rows.
+        n = len(catalog_df)
+
+        def _column(name):
+            if name in catalog_df.columns:
+                return catalog_df[name].astype(str).tolist()
+            return [""] * n
+
+        ids = _column("id")
+        variables = _column("variable")
+        units = _column("unit")
+        names = _column("name")
+        filenames = _column("filename")
+        if "geometry" in catalog_df.columns:
+            geometries = catalog_df["geometry"].tolist()
+        else:
+            geometries = [None] * n
 
         refs: List[SchismDataReference] = []
-        for _, row in catalog_df.iterrows():
-            station_id = str(row["id"])
-            variable = str(row["variable"])
-            ref_name = f"{study_name}::{station_id}/{variable}"
-            attrs: dict = {
-                # Study config — needed to lazy-reconstruct SchismStudy in load().
-                "base_dir": base_dir,
-                "study_name": study_name,
-                "output_dir": config.get("output_dir", "outputs"),
-                "param_nml_file": config.get("param_nml_file", "param.nml"),
-                "flux_xsect_file": config.get(
-                    "flux_xsect_file", "flow_station_xsects.yaml"
-                ),
-                "station_in_file": config.get("station_in_file", "station.in"),
-                "flux_out": config.get("flux_out", "flux.out"),
-                "reftime": config.get("reftime"),
-                # Time extent — dvue standard names used by RegistryUIManager.on_file_added
-                # to auto-expand time_range without re-opening the study.
-                "time_extent_start": study_start,
-                "time_extent_end": study_end,
-                # Legacy names kept for backward compatibility.
-                "study_start": study_start,
-                "study_end": study_end,
+        for station_id, variable, unit, name, filename, geometry in zip(
+            ids, variables, units, names, filenames, geometries
+        ):
+            ref_attrs = {
                 # Station / variable metadata.
                 "id": station_id,
                 "variable": variable,
-                "unit": str(row.get("unit", "")),
-                "station_name": str(row.get("name", "")),
-                "filename": str(row.get("filename", "")),
+                "unit": unit,
+                "station_name": name,
+                "filename": filename,
             }
-            if "geometry" in row.index and row["geometry"] is not None:
-                attrs["geometry"] = row["geometry"]
-
-            refs.append(
-                SchismDataReference(
-                    source=base_dir,
-                    name=ref_name,
-                    **attrs,
-                )
+            if geometry is not None:
+                ref_attrs["geometry"] = geometry
+            ref = SchismDataReference(
+                source=base_dir,
+                name=f"{study_name}::{station_id}/{variable}",
+                **study_attrs,
+                **ref_attrs,
             )
+            ref._study = study
+            refs.append(ref)
         return refs
 
     # ------------------------------------------------------------------
@@ -297,11 +397,10 @@ class SchismOutputReader(DataReferenceReader):
     def load(self, **attrs) -> pd.DataFrame:
         """Load data for a single station/variable.
 
-        The :class:`SchismStudy` is created lazily on the first call using
-        the study-config attributes stored on the
-        :class:`SchismDataReference`.  ``time_range`` (if present) is used
-        to slice the result after loading the full series, since
-        :class:`SchismStudy` has no native time-windowing API.
+        The :class:`SchismStudy` is taken from the process-wide registry
+        (opened on a miss) using the study-config attributes stored on the
+        :class:`SchismDataReference`.  ``time_range`` (if present) is passed
+        to :meth:`SchismStudy.get_data`, which reads only that window.
 
         Parameters
         ----------
@@ -309,33 +408,23 @@ class SchismOutputReader(DataReferenceReader):
             The full ``_attributes`` dict of the calling
             :class:`SchismDataReference`, unpacked as keyword arguments.
             Required keys: ``id``, ``variable``, ``filename``.
-            Optional keys: all :class:`SchismStudy` constructor args,
+            Optional keys: ``study_key`` (or, for refs built elsewhere, the
+            individual :class:`SchismStudy` constructor args),
             ``time_range``.
         """
-        if self._study is None:
-            self._study = SchismStudy(
-                study_name=attrs.get("study_name", pathlib.Path(self.source).name),
-                base_dir=attrs.get("base_dir", self.source),
-                output_dir=attrs.get("output_dir", "outputs"),
-                param_nml_file=attrs.get("param_nml_file", "param.nml"),
-                flux_xsect_file=attrs.get(
-                    "flux_xsect_file", "flow_station_xsects.yaml"
-                ),
-                station_in_file=attrs.get("station_in_file", "station.in"),
-                flux_out=attrs.get("flux_out", "flux.out"),
-                reftime=attrs.get("reftime"),
-            )
-
-        df = self._study.get_data(attrs)
+        if attrs.get("study_key"):
+            key = tuple(attrs["study_key"])
+        else:
+            config = {k: attrs.get(k, v) for k, v in STUDY_CONFIG_DEFAULTS.items()}
+            config["base_dir"] = attrs.get("base_dir", self.source)
+            key = study_key(config)
+        study = self._studies.get(key)
+        if study is None:
+            study = self._studies[key] = get_study_for_key(key)
+
+        df = study.get_data(attrs, time_range=attrs.get("time_range"))
         df = df[slice(df.first_valid_index(), df.last_valid_index())]
 
-        # Apply time-range windowing (SchismStudy always loads the full series).
-        time_range = attrs.get("time_range")
-        if time_range is not None:
-            start = pd.Timestamp(time_range[0])
-            end = pd.Timestamp(time_range[1])
-            df = df.loc[start:end]
-
         df.attrs["unit"] = attrs.get("unit", "")
         df.attrs["ptype"] = "INST-VAL"
         return df
@@ -343,7 +432,7 @@ class SchismOutputReader(DataReferenceReader):
     def __repr__(self) -> str:
         return (
             f"SchismOutputReader(source={self.source!r}, "
-            f"study_loaded={self._study is not None})"
+            f"study_loaded={bool(self._studies)})"
         )
 
 
@@ -18,8 +18,11 @@ exposed.  Pass ``layers="all"`` to expose every layer, or
 .. note::
     This manager handles **combined** output files only.  If your run
     produced per-processor ``schout_XXXXXX_N.nc`` files, pre-combine them
-    first with :func:`bdschism.combine_nc.combine_nc` before passing them
-    here.
+    first with ``schismviz combine-schout`` (or
+    :func:`bdschism.combine_nc.combine_nc`) before passing them here.
+    ``combine-schout`` writes one ``schout_N.nc`` per spool holding every
+    variable and the node coordinates to ``outputs/combined``; pass those
+    files as they are (e.g. ``--pattern "schout_*.nc"`` on that directory).
 
 Typical usage
 -------------
@@ -817,7 +820,8 @@ def show_schism_nc_ui(
     Note:
       This command works with *combined* output files only.  Per-processor
       ``schout_XXXXXX_N.nc`` files must be pre-combined with
-      ``bdschism combine-nc`` before use.
+      ``schismviz combine-schout`` (then ``--output-dir outputs/combined
+      --pattern "schout_*.nc"``) or ``bdschism combine-nc`` before use.
     """
     import pandas as pd
 
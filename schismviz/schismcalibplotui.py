@@ -239,11 +239,21 @@ class SchismCalibPlotUIManager(DataUIManager):
         self.datastore = datastore.StationDatastore(
             repo_dir=self.config["obs_search_path"][0],
             inventory_file=self.config["obs_links_csv"],
+            cache_dir=self.config.get("obs_cache_dir"),
         )
         self.dcat = self.datastore.get_catalog()
         self.dcat["full_id"] = (
             self.dcat["station_id"].astype(str) + "_" + self.dcat["subloc"].astype(str)
         )
+        # full_id -> (station_id, subloc), first row wins as with a filter
+        self._full_ids = {}
+        for full_id, station_id, subloc in zip(
+            self.dcat["full_id"],
+            self.dcat["station_id"].astype(str),
+            self.dcat["subloc"].astype(str),
+        ):
+            self._full_ids.setdefault(full_id, (station_id, subloc))
+        self._obs_rows = {}
         self._dvue_catalog = self._build_dvue_catalog()
 
     def get_widgets(self):
@@ -344,33 +354,59 @@ class SchismCalibPlotUIManager(DataUIManager):
             df = df.resample(dfobs.index.freq).mean()
             yield df
 
-    def get_data_for_id_var(self, id, variable):
-        dfs = []
-        for study_name, study in self.studies.items():
-            scat = study.get_catalog()
-            rs = scat[scat.eval(f'(id=="{id}") & (variable=="{variable}")')]
-            if not rs.empty:
-                df = study.get_data(rs.iloc[0])
-                df.columns = [study_name]
-                dfs.append(df)
+    def find_obs_row(self, id, variable):
+        """Return the observation inventory row for a model station/variable.
+
+        Returns ``None`` if the inventory has no matching entry.  Results are
+        memoized per ``(id, variable)``.
+        """
+        key = (id, variable)
+        if key not in self._obs_rows:
+            self._obs_rows[key] = self._resolve_obs_row(id, variable)
+        return self._obs_rows[key]
+
+    def _resolve_obs_row(self, id, variable):
         dparam = self.get_datastore_param_name(variable)
         idsplit = id.split("_")
-        try:
-            if len(idsplit) > 1 and variable not in ["flow", "elev"]:
-                id_col = "full_id"
-            else:
-                id_col = "station_id"
-        except Exception:
-            id_col = "station_id"
-        if variable in ["flow", "elev"] and len(idsplit) > 1:
-            id = idsplit[0]
-        try:
-            rd = self.dcat[
-                self.dcat.eval(f'({id_col}=="{id}") & (param=="{dparam}")')
-            ].iloc[0]
-        except IndexError:
+        if len(idsplit) > 1 and variable not in ["flow", "elev"]:
+            station_id, subloc = self._full_ids.get(id, (None, None))
+            rd = self.datastore.find_row(station_id, dparam, subloc=subloc)
+        else:
+            if variable in ["flow", "elev"] and len(idsplit) > 1:
+                id = idsplit[0]
+            rd = self.datastore.find_row(id, dparam)
+        if rd is None:
             logger.debug("No data found for %s %s", id, variable)
-            rd = None
+        return rd
+
+    def prefetch_observations(self, max_workers=8):
+        """Cache the observations for every station/variable in the catalog.
+
+        Resolves the inventory row of each catalog entry and reads the files
+        concurrently via :meth:`StationDatastore.prefetch`.
+
+        Returns
+        -------
+        dict
+            ``{filename: reason}`` for files that are missing or unreadable.
+        """
+        dfcat = self.get_data_catalog()
+        rows = [self.find_obs_row(id, variable)
+                for id, variable in zip(dfcat["id"], dfcat["variable"])]
+        rows = [r for r in rows if r is not None]
+        if not rows:
+            return {}
+        return self.datastore.prefetch(pd.DataFrame(rows), max_workers=max_workers)
+
+    def get_data_for_id_var(self, id, variable):
+        studies = []
+        for study_name, study in self.studies.items():
+            if study.has_data_for(id, variable):
+                studies.append(study)
+        # read the matching studies concurrently; one column per study
+        dfsim = schismstudy.get_data_for_studies(studies, id, variable)
+        dfs = [dfsim[[c]] for c in dfsim.columns]
+        rd = self.find_obs_row(id, variable)
         if rd is not None:
             dfobs, converted_unit = schismstudy.convert_to_SI(
                 self.datastore.get_data(rd), rd["unit"]
@@ -576,8 +612,18 @@ from schismviz.session import serve_session_app
     default=False,
     help="Validate config and print resolved settings without launching the UI",
 )
+@click.option(
+    "--prefetch",
+    is_flag=True,
+    default=False,
+    help="Read the observations for all catalog stations into the cache, "
+    "report missing files and exit",
+)
+@click.option("--workers", default=8, help="Number of threads used by --prefetch.")
 @click.option("--port", default=0, help="Port to serve the UI on (0 = random available port).")
-def schism_calib_plot_ui(config_file, base_dir=None, dry_run=False, port=0, **kwargs):
+def schism_calib_plot_ui(
+    config_file, base_dir=None, dry_run=False, prefetch=False, workers=8, port=0, **kwargs
+):
     """
     config_file: str
         yaml file containing configuration
@@ -603,6 +649,12 @@ def schism_calib_plot_ui(config_file, base_dir=None, dry_run=False, port=0, **kw
         click.echo("Configuration validated successfully.")
         click.echo(yaml.safe_dump(_serialize_for_yaml(manager.config), sort_keys=False))
         return
+    if prefetch:
+        problems = manager.prefetch_observations(max_workers=workers)
+        for filename, reason in problems.items():
+            click.echo(f"{filename}: {reason}")
+        click.echo(f"Prefetch done; {len(problems)} observation file(s) not cached.")
+        return
 
     def build_manager():
         return SchismCalibPlotUIManager(config_file, base_dir=base_dir, **kwargs)
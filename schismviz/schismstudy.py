@@ -1,6 +1,7 @@
 from functools import lru_cache
 import os
 import pathlib
+import numpy as np
 import schimpy
 import pandas as pd
 import schimpy.station as station
@@ -14,6 +15,7 @@ import geopandas as gpd
 import param
 import diskcache
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # use logging
 import logging
@@ -92,23 +94,162 @@ from vtools.functions.unit_conversions import (
 )
 
 
-def convert_to_SI(ts, unit):
-    """converts the time series to SI units"""
+#: source unit -> (vtools conversion, SI unit, conversion is linear)
+_SI_CONVERSIONS = {}
+for _units, _conversion in (
+    (("ft", "feet"), (ft_to_m, "meters", True)),
+    (("cfs", "ft^3/s"), (cfs_to_cms, "m^3/s", True)),
+    (("ec", "microS/cm", "uS/cm"), (ec_psu_25c, "PSU", False)),
+    (("deg F", "degF", "deg_f"), (fahrenheit_to_celsius, "deg_c", True)),
+):
+    for _unit in _units:
+        _SI_CONVERSIONS[_unit] = _conversion
+
+
+@lru_cache(maxsize=None)
+def si_conversion(unit):
+    """Return ``(scale, offset, func, si_unit)`` for converting *unit* to SI.
+
+    For linear conversions *scale* and *offset* are derived once from the
+    vtools function, so values convert as ``x * scale + offset``; otherwise
+    they are ``None`` and *func* is applied to the values.  Returns ``None``
+    if *unit* needs no conversion.
+    """
+    if unit not in _SI_CONVERSIONS:
+        return None
+    func, si_unit, linear = _SI_CONVERSIONS[unit]
+    if linear:
+        offset, one = func(np.array([0.0, 1.0]))
+        return float(one - offset), float(offset), func, si_unit
+    return None, None, func, si_unit
+
+
+def convert_to_SI(ts, unit, dtype=np.float32):
+    """converts the time series to SI units
+
+    The values are copied once into an array of *dtype* (``None`` keeps
+    float64) and converted in place on that array; *ts* is not modified.
+    Series in SI units are returned as is.
+    """
     if ts is None:
         raise ValueError("Cannot convert None")
-    if unit in ["ft", "feet"]:
-        ts = ft_to_m(ts)
-        unit = "meters"
-    elif unit in ["cfs", "ft^3/s"]:
-        ts = cfs_to_cms(ts)
-        unit = "m^3/s"
-    elif unit in ["ec", "microS/cm", "uS/cm"]:
-        ts = ec_psu_25c(ts)
-        unit = "PSU"
-    elif unit in ("deg F", "degF", "deg_f"):
-        ts = fahrenheit_to_celsius(ts)
-        unit = "deg_c"
-    return ts, unit
+    conversion = si_conversion(unit)
+    if conversion is None:
+        return ts, unit
+    scale, offset, func, unit = conversion
+    values = ts.to_numpy(dtype=dtype or np.float64, copy=True)
+    if scale is None:
+        values[...] = func(values)
+    else:
+        values *= scale
+        if offset:
+            values += offset
+    if isinstance(ts, pd.Series):
+        converted = pd.Series(values, index=ts.index, name=ts.name)
+    else:
+        converted = pd.DataFrame(values, index=ts.index, columns=ts.columns)
+    converted.attrs.update(ts.attrs)
+    return converted, unit
+
+
+def slice_time_range(df, time_range):
+    """Return the rows of *df* within *time_range* ``(start, end)`` inclusive.
+
+    Either bound may be ``None``.  For a sorted index the bounds are found by
+    binary search and a positional slice is returned; otherwise falls back
+    to label-based slicing.
+    """
+    if time_range is None:
+        return df
+    start, end = time_range
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    index = df.index
+    if not index.is_monotonic_increasing:
+        return df.loc[start:end]
+    i0 = 0 if start is None else index.searchsorted(start, side="left")
+    i1 = len(index) if end is None else index.searchsorted(end, side="right")
+    return df.iloc[i0:i1]
+
+
+def file_signature(fpath):
+    """Return ``(path, mtime_ns)`` for *fpath*; mtime is ``None`` if missing.
+
+    Used as a cache key so that cached results are invalidated whenever the
+    underlying input file is modified.
+    """
+    fpath = pathlib.Path(fpath)
+    try:
+        return str(fpath), fpath.stat().st_mtime_ns
+    except OSError:
+        return str(fpath), None
+
+
+def read_study_metadata(param_nml_file, station_in_file, flux_xsect_file):
+    """Read the study-level metadata for a SCHISM run.
+
+    The parsed ``param.nml``, ``station.in`` and flux cross-section file are
+    cached per process keyed by file path and modification time, so opening
+    many studies (or the same study repeatedly) parses each file only once.
+    The returned objects are shared between callers and must not be modified
+    in place.
+
+    Returns
+    -------
+    dict
+        ``run_start``, ``rnday``, ``stations_in``, ``stations_gdf``,
+        ``flux_gdf`` (``None`` if the flux file has no geometry),
+        ``flux_pts_gdf`` and ``flux_names``.
+    """
+    return _read_study_metadata(
+        file_signature(param_nml_file),
+        file_signature(station_in_file),
+        file_signature(flux_xsect_file),
+    )
+
+
+@lru_cache(maxsize=64)
+def _read_study_metadata(param_nml_sig, station_in_sig, flux_xsect_sig):
+    param_nml_file = pathlib.Path(param_nml_sig[0])
+    station_in_file = pathlib.Path(station_in_sig[0])
+    flux_xsect_file = pathlib.Path(flux_xsect_sig[0])
+    nml = schimpyparam.read_params(param_nml_file)
+    stations_in = read_station_in(station_in_file)
+    stations = stations_in.reset_index()
+    # only add subloc if subloc value is not == "default"
+    stations["station_id"] = stations["id"] + stations["subloc"].apply(
+        lambda x: ("_" + x) if x.lower() != "default" else ""
+    )
+    stations_gdf = convert_station_to_gdf(stations)
+    flux_gdf = None
+    if flux_xsect_file.suffix in [".yaml", ".yml"]:
+        flux_df = load_flux_dataframe(flux_xsect_file)
+        flux_df["station_id"] = flux_df["name"].str.lower()  # + "_default"
+        flux_gdf = convert_flux_to_gdf(flux_df)
+        flux_pts_gdf = convert_flux_to_points_gdf(flux_df)
+        flux_names = flux_df["name"].tolist()
+    else:
+        logger.debug(
+            "flux xsect file is not a yaml file, so only names loaded with no geometry.\n"
+            + "Filling in with matching stations.in geometry where station_id matches.\n"
+        )
+        names = station.station_names_from_file(str(flux_xsect_file))
+        flux_df = pd.DataFrame(names, columns=["flux_name"])
+        flux_df["station_id"] = flux_df["flux_name"].str.lower()  # + "_default"
+        flux_pts_gdf = flux_df.merge(stations_gdf, on="station_id", how="left")
+        flux_pts_gdf = flux_pts_gdf.drop(columns=["name"], errors="ignore").rename(
+            columns={"flux_name": "name"}
+        )
+        flux_names = names
+    return {
+        "run_start": nml.run_start,
+        "rnday": nml["rnday"],
+        "stations_in": stations_in,
+        "stations_gdf": stations_gdf,
+        "flux_gdf": flux_gdf,
+        "flux_pts_gdf": flux_pts_gdf,
+        "flux_names": flux_names,
+    }
 
 
 class SchismStudy(param.Parameterized):
@@ -154,12 +295,6 @@ class SchismStudy(param.Parameterized):
         # Clear the cache on initialization to start fresh each time
         if clear_cache_on_init:
             self.cache.clear()
-        nml = schimpyparam.read_params(self.param_nml_file)
-        if not reftime:
-            self.reftime = nml.run_start
-        else:
-            self.reftime = pd.Timestamp(reftime)
-        self.endtime = self.reftime + datetime.timedelta(days=nml["rnday"])
         self.flux_xsect_file = self.interpret_file_relative_to(
             self.base_dir, pathlib.Path(flux_xsect_file)
         )
@@ -170,35 +305,24 @@ class SchismStudy(param.Parameterized):
             self.output_dir, pathlib.Path(flux_out)
         )
         super().__init__(**kwargs)
-        stations = read_station_in(self.station_in_file)
-        self.stations_in = stations
-        stations = stations.reset_index()
-        # only add subloc if subloc value is not == "default"
-        stations["station_id"] = stations["id"] + stations["subloc"].apply(
-            lambda x: ("_" + x) if x.lower() != "default" else ""
+        metadata = read_study_metadata(
+            self.param_nml_file, self.station_in_file, self.flux_xsect_file
         )
-        self.stations_gdf = convert_station_to_gdf(stations)
-        if self.flux_xsect_file.suffix in [".yaml", ".yml"]:
-            flux_df = load_flux_dataframe(self.flux_xsect_file)
-            flux_df["station_id"] = flux_df["name"].str.lower()  # + "_default"
-            self.flux_gdf = convert_flux_to_gdf(flux_df)
-            self.flux_pts_gdf = convert_flux_to_points_gdf(flux_df)
-            self.flux_names = flux_df["name"].tolist()
+        if not reftime:
+            self.reftime = metadata["run_start"]
         else:
-            logger.debug(
-                "flux xsect file is not a yaml file, so only names loaded with no geometry.\n"
-                + "Filling in with matching stations.in geometry where station_id matches.\n"
-            )
-            names = station.station_names_from_file(str(self.flux_xsect_file))
-            flux_df = pd.DataFrame(names, columns=["flux_name"])
-            flux_df["station_id"] = flux_df["flux_name"].str.lower()  # + "_default"
-            self.flux_pts_gdf = flux_df.merge(
-                self.stations_gdf, on="station_id", how="left"
-            )
-            self.flux_pts_gdf = self.flux_pts_gdf.drop(
-                columns=["name"], errors="ignore"
-            ).rename(columns={"flux_name": "name"})
-            self.flux_names = names
+            self.reftime = pd.Timestamp(reftime)
+        self.endtime = self.reftime + datetime.timedelta(days=metadata["rnday"])
+        self.stations_in = metadata["stations_in"]
+        self.stations_gdf = metadata["stations_gdf"]
+        if metadata["flux_gdf"] is not None:
+            self.flux_gdf = metadata["flux_gdf"]
+        self.flux_pts_gdf = metadata["flux_pts_gdf"]
+        self.flux_names = metadata["flux_names"]
+        self._catalog_index = None
+        # Per-study memo of the flux and staout frames; kept on the instance
+        # so that it does not keep the study alive
+        self._frames = {}
 
     def interpret_file_relative_to(self, base_dir, fpath):
         return utils.interpret_file_relative_to(base_dir, fpath)
@@ -224,32 +348,55 @@ class SchismStudy(param.Parameterized):
         if catalog_key in self.cache:
             return self.cache[catalog_key]
         else:
-            var_stations = []
+            variables = []
+            filenames = []
             for var in STATION_VARS:
                 staout_path = self.output_dir / station.staout_name(var)
                 if not staout_path.exists():
                     logger.debug("Skipping variable %s: %s not found in outputs", var, staout_path)
                     continue
-                s = self.stations_gdf.copy()
-                s["variable"] = var
-                s["unit"] = self.get_unit_for_variable(var)
-                s["filename"] = str(staout_path)
-                s.drop(columns=["id", "subloc", "x", "y", "z"], inplace=True)
-                s.rename(columns={"station_id": "id"}, inplace=True)
-                var_stations.append(s)
+                variables.append(var)
+                filenames.append(str(staout_path))
+            # Repeat the station table once per available variable in a single
+            # take() instead of copying the GeoDataFrame for every variable.
+            base = self.stations_gdf.drop(columns=["id", "subloc", "x", "y", "z"])
+            base = base.rename(columns={"station_id": "id"})
+            n_stations = len(base)
+            var_stations = base.take(np.tile(np.arange(n_stations), len(variables)))
+            var_stations["variable"] = np.repeat(variables, n_stations)
+            var_stations["unit"] = np.repeat(
+                [self.get_unit_for_variable(var) for var in variables], n_stations
+            )
+            var_stations["filename"] = np.repeat(filenames, n_stations)
             # TODO: if flux_pts_gdf is empty, then use the flux_names to create geometry
             if self.flux_pts_gdf is not None:
-                flux_stations = self.flux_pts_gdf.copy()
-                flux_stations = flux_stations[["station_id", "name", "geometry"]]
-                flux_stations.rename(columns={"station_id": "id"}, inplace=True)
+                flux_stations = self.flux_pts_gdf[["station_id", "name", "geometry"]]
+                flux_stations = flux_stations.rename(columns={"station_id": "id"})
                 flux_stations["variable"] = "flow"
                 flux_stations["unit"] = "m^3/s"
                 flux_stations["filename"] = str(self.flux_out)
-            df = pd.concat(var_stations + [flux_stations])
+            df = pd.concat([var_stations, flux_stations])
             df["source"] = self.study_name
             self.cache[catalog_key] = df
             return df
 
+    def get_catalog_index(self):
+        """Map each ``(id, variable)`` of the catalog to its row position.
+
+        Built once per study so membership tests do not scan the catalog.
+        """
+        if self._catalog_index is None:
+            cat = self.get_catalog()
+            index = {}
+            for pos, key in enumerate(zip(cat["id"], cat["variable"])):
+                index.setdefault(key, pos)
+            self._catalog_index = index
+        return self._catalog_index
+
+    def has_data_for(self, station_id, variable):
+        """True if the catalog has an entry for *station_id* and *variable*."""
+        return (station_id, variable) in self.get_catalog_index()
+
     def cache_vars(self, vars):
         # get data for these vars
         for var in vars:
@@ -260,9 +407,17 @@ class SchismStudy(param.Parameterized):
 
     def clear_cache(self):
         self.cache.clear()
+        self._catalog_index = None
+        self._frames.clear()
+
+    def get_data(self, row, time_range=None):
+        """get data for a row of the catalog
 
-    def get_data(self, row):
-        """get data for a row of the catalog"""
+        If *time_range* ``(start, end)`` is given only that window is
+        returned.  The window is located with a binary search on the sorted
+        time index of the cached series, so the work is proportional to the
+        window rather than to the length of the run.
+        """
         var = row["variable"]
         id = row["id"]
         filename = row["filename"]
@@ -272,7 +427,7 @@ class SchismStudy(param.Parameterized):
                 raise KeyError(
                     f"Station '{id}' not found for variable '{var}' in '{self.flux_out}'"
                 )
-            return flux[[id]]
+            return slice_time_range(flux, time_range)[[id]]
         else:
             staout = self.get_staout(var)
             lookup_id = id if "_" in id else id + "_default"
@@ -280,10 +435,15 @@ class SchismStudy(param.Parameterized):
                 raise KeyError(
                     f"Station '{lookup_id}' not found for variable '{var}' in '{filename}'"
                 )
-            return staout[[lookup_id]]
+            return slice_time_range(staout, time_range)[[lookup_id]]
 
-    @lru_cache(maxsize=32)
     def get_flux(self):
+        key = ("flux",)
+        if key not in self._frames:
+            self._frames[key] = self._read_flux()
+        return self._frames[key]
+
+    def _read_flux(self):
         if self.flux_out in self.cache:
             logger.info(f"Using cached flux from disk: {self.base_dir}")
             return self.cache[self.flux_out]
@@ -295,8 +455,13 @@ class SchismStudy(param.Parameterized):
             self.cache[self.flux_out] = flux
             return flux
 
-    @lru_cache(maxsize=32)
     def get_staout(self, variable, fpath=None):
+        key = ("staout", variable, fpath)
+        if key not in self._frames:
+            self._frames[key] = self._read_staout(variable, fpath)
+        return self._frames[key]
+
+    def _read_staout(self, variable, fpath=None):
         if fpath is None:
             fpath = self.interpret_file_relative_to(
                 self.output_dir, station.staout_name(variable)
@@ -339,9 +504,6 @@ class SchismStudy(param.Parameterized):
             self.cache[fpath] = staout
             return staout
 
-    def clear_cache(self):
-        self.cache.clear()
-
     def get_flux_for(self, station_id):
         flux = self.get_flux()
         return flux[station_id]
@@ -349,3 +511,58 @@ class SchismStudy(param.Parameterized):
     def get_staout_for(self, variable, station_id):
         staout = self.get_staout(variable)
         return staout[station_id]
+
+    def get_data_for(self, station_id, variable, time_range=None):
+        """Get the series for a catalog ``id``/``variable`` pair."""
+        return self.get_data(
+            {"id": station_id, "variable": variable, "filename": ""},
+            time_range=time_range,
+        )
+
+
+def get_data_for_studies(studies, station_id, variable, time_range=None, max_workers=None):
+    """Fetch one station/variable from several studies concurrently.
+
+    Each study is read in its own worker thread through
+    :meth:`SchismStudy.get_data_for`, so the per-study staout/flux caches are
+    used where they are already warm and cold reads overlap.
+
+    Parameters
+    ----------
+    studies : list of SchismStudy
+        Studies to read from.
+    station_id : str
+        Catalog ``id`` of the station, e.g. ``"sta1"`` or ``"sta2_upper"``.
+    variable : str
+        Catalog variable, e.g. ``"elev"`` or ``"flow"``.
+    time_range : tuple, optional
+        ``(start, end)`` window to read; the full series if not given.
+    max_workers : int, optional
+        Size of the thread pool. Defaults to one thread per study.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One column per study named by ``study_name``, aligned on the union of
+        the studies' time indexes. Studies that do not have the series are
+        left out.
+    """
+    studies = list(studies)
+    if not studies:
+        return pd.DataFrame()
+
+    def _fetch(study):
+        try:
+            df = study.get_data_for(station_id, variable, time_range=time_range)
+        except (KeyError, FileNotFoundError) as e:
+            logger.debug("No %s for %s in %s: %s", variable, station_id, study.study_name, e)
+            return None
+        df = df.copy()
+        df.columns = [study.study_name]
+        return df
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(studies)) as executor:
+        dfs = [df for df in executor.map(_fetch, studies) if df is not None]
+    if not dfs:
+        return pd.DataFrame()
+    return pd.concat(dfs, axis=1)
@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 import pandas as pd
 import cartopy.crs as ccrs
 import holoviews as hv
@@ -51,13 +52,21 @@ class SchismDataReferenceReader(DataReferenceReader):
             base_dir = str(pathlib.Path(attributes["filename"]).parent)
             study = self._study_dir_map[base_dir]
             try:
-                df = study.get_data(attributes)
+                df = study.get_data(
+                    attributes, time_range=attributes.get("time_range")
+                )
             except KeyError as e:
                 logger.warning(str(e).strip("'\""))
                 raise
         df = df[slice(df.first_valid_index(), df.last_valid_index())]
         df.attrs["unit"] = unit
         df.attrs["ptype"] = "INST-VAL"
+        # Identifies the series for the converted-frame cache of the manager
+        time_range = attributes.get("time_range")
+        df.attrs["ref_key"] = (
+            f"{source}::{attributes.get('id')}/{attributes.get('variable')}",
+            tuple(time_range) if time_range is not None else None,
+        )
         return df
 
     def __repr__(self) -> str:
@@ -157,6 +166,8 @@ class SchismOutputUIDataManager(TimeSeriesDataUIManager):
         # data_catalog property returns None during base-class init (which triggers
         # the correct get_data_catalog() path rather than crashing with AttributeError).
         self._dvue_catalog = None
+        # (ref_key, unit) -> (raw values, converted frame), oldest first
+        self._converted = {}
         super().__init__(**kwargs)
         self.color_cycle_column = "id"
         self.dashed_line_cycle_column = "source"
@@ -172,16 +183,41 @@ class SchismOutputUIDataManager(TimeSeriesDataUIManager):
         )
         self._dvue_catalog = self._build_dvue_catalog(geo_crs)
 
+    #: Number of converted frames kept by :meth:`apply_unit_conversion`
+    converted_cache_size = 256
+
     def apply_unit_conversion(self, data):
         """Convert SCHISM model-native units (ft, cfs, deg F, µS/cm) to SI.
 
         The ``unit`` string is read from ``data.attrs["unit"]`` and updated
-        to the converted unit so that axis labels stay in sync.
+        to the converted unit so that axis labels stay in sync.  *data* is
+        left untouched.  Frames loaded by :class:`SchismDataReferenceReader`
+        carry a ``ref_key`` (reference name and time range); their converted
+        frame is kept under that key and the unit, so toggling
+        ``convert_units`` back on does not convert again.  A kept frame is
+        only reused for data sharing the raw values it was converted from,
+        as derived frames (math references) inherit ``attrs``.  Callers get a
+        shallow copy sharing the values of the kept frame: renaming columns
+        or changing ``attrs`` is safe, writing values in place is not.
         """
         unit = data.attrs.get("unit", "")
-        data, unit = schismstudy.convert_to_SI(data, unit)
-        data.attrs["unit"] = unit
-        return data
+        key = data.attrs.get("ref_key")
+        values = data.to_numpy()
+        if key is not None:
+            key = (key, unit)
+            hit = self._converted.get(key)
+            if hit is not None and np.may_share_memory(hit[0], values):
+                return hit[1].copy(deep=False)
+        converted, si_unit = schismstudy.convert_to_SI(data, unit)
+        converted = converted.copy(deep=False)
+        converted.attrs["unit"] = si_unit
+        if key is None:
+            return converted
+        self._converted.pop(key, None)
+        self._converted[key] = (values, converted)
+        if len(self._converted) > self.converted_cache_size:
+            del self._converted[next(iter(self._converted))]
+        return converted.copy(deep=False)
 
     def _merge_catalogs(self, studies, datastore):
         """
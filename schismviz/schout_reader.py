@@ -3,18 +3,203 @@
 # PoC to read information from uncombined schout NetCDF files
 import os
 import glob
+import io
+import logging
 import re
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
 import numpy as np
 import netCDF4 as nc
 import pandas as pd
 import xarray as xr
 from schimpy import schism_mesh
 
-__all__ = ['read_schout']
+__all__ = ['read_schout', 'combine_schout', 'read_mesh_npz']
+
+logger = logging.getLogger(__name__)
+
+#: Sidecar file caching the assembled geometry next to the outputs
+GEOMETRY_CACHE_NAME = 'local_to_global_cache.npz'
+
+#: Default subdirectory of the outputs for the combined files
+COMBINED_DIR = 'combined'
+
+#: Per-rank dimension -> (global dimension key, mesh attribute of the maps)
+_MAPPED_DIMS = {
+    'nSCHISM_hgrid_node': ('np', 'nodes_local_to_global'),
+    'nSCHISM_hgrid_face': ('ne', 'elems_local_to_global'),
+    'nSCHISM_hgrid_edge': ('ns', 'sides_local_to_global'),
+}
+
+
+def _parse_block(lines, dtype):
+    """ Parse a block of whitespace separated numbers, one row per line
+    """
+    if not lines:
+        return np.empty((0, 0), dtype=dtype)
+    values = np.fromstring(b' '.join(lines), dtype=dtype, sep=' ')
+    return values.reshape(len(lines), -1)
+
+
+def _parse_elem_block(lines):
+    """ Parse local element connectivity lines ``i34 n1 n2 n3 [n4]``
+
+        Returns a (n, 4) one-based local connectivity with 0 in the fourth
+        column of triangles.
+    """
+    n = len(lines)
+    values = np.fromstring(b' '.join(lines), dtype=np.int32, sep=' ')
+    # The line widths are 4 or 5, so the total only divides evenly when
+    # every element has the same type.
+    if values.size == 4 * n:
+        conn = np.zeros((n, 4), dtype=np.int32)
+        conn[:, :3] = values.reshape(n, 4)[:, 1:]
+        return conn
+    if values.size == 5 * n:
+        return values.reshape(n, 5)[:, 1:].copy()
+    df = pd.read_csv(io.BytesIO(b'\n'.join(lines)), sep=r'\s+',
+                     header=None, names=range(5))
+    if not df[0].isin([3, 4]).all():
+        raise ValueError(
+            'The number of items in the connectivity is not correct.')
+    return df.iloc[:, 1:].fillna(0).to_numpy(dtype=np.int32)
+
+
+def _read_lines(fobj, n):
+    """ Read *n* lines from a text or binary file object as bytes
+    """
+    lines = [fobj.readline() for _ in range(n)]
+    return [l.encode() if isinstance(l, str) else l for l in lines]
+
+
+def parse_local_to_global(fname):
+    """ Parse one ``local_to_global_NNNN`` file
+
+        The whole file is read at once and each section is converted with a
+        single vectorized call.
+
+        Parameters
+        ----------
+        fname: str
+            path of the local_to_global file
+
+        Returns
+        -------
+        dict
+            ``elems``, ``nodes`` and ``sides``: (n, 2) zero-based local to
+            global maps; ``header``: dict with ``nrec`` and ``start``;
+            ``node_values``: (np_lcl, 4) x, y, depth, kbp;
+            ``elem_conn``: (ne_lcl, 4) one-based local connectivity, 0 for
+            the missing fourth node of triangles.
+    """
+    with open(fname, 'rb') as fobj:
+        lines = fobj.read().splitlines()
+    pos = 2
+    result = {}
+    for section in ('elems', 'nodes', 'sides'):
+        n = int(lines[pos].strip())
+        pos += 1
+        result[section] = _parse_block(lines[pos:pos + n], np.int32) - 1
+        pos += n
+    pos += 1  # "Header:"
+    start = [int(x) for x in lines[pos].split()[:3]]
+    pos += 2  # start date, utc_start
+    tkns = lines[pos].split()  # nrec,dtout,nspool,nvrt,kz, h0
+    nrec = int(tkns[0])
+    nvrt = int(tkns[3])
+    pos += 2  # h_s,h_c,theta_b,theta_f,itmp
+    count = nvrt
+    while count > 0:  # ztot, sigma
+        count -= len(lines[pos].split())
+        pos += 1
+    n_nodes, n_elems = [int(x) for x in lines[pos].split()[:2]]
+    pos += 1
+    result['header'] = {'nrec': nrec, 'start': start}
+    result['node_values'] = _parse_block(lines[pos:pos + n_nodes], np.float64)
+    pos += n_nodes
+    result['elem_conn'] = _parse_elem_block(lines[pos:pos + n_elems])
+    return result
+
+
+def read_nc_block(path, name, key, select=None, stride=1):
+    """ Read ``variable[key]`` from a netCDF file as a plain array
+
+        Masked values are filled with NaN.  *select*, if given, picks
+        entries of the second axis after reading, and *stride* decimates
+        the first axis in memory, which is much faster than a strided read
+        of chunked files.  This is a module function
+        so that it can run in worker processes: the netcdf-c library is not
+        thread-safe, so concurrent reads use processes, not threads.
+    """
+    with nc.Dataset(path) as root:
+        data = root.variables[name][key]
+    if stride != 1:
+        data = data[::stride]
+    if select is not None:
+        data = data[:, select]
+    if np.ma.isMaskedArray(data):
+        data = data.filled(np.nan if data.dtype.kind == 'f' else 0)
+    return np.asarray(data)
+
+
+class _SerialExecutor:
+    """ Stand-in for a process pool running the tasks in the caller
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _reader_pool(n_workers):
+    """ Process pool for netCDF reads, or a serial executor for one worker
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers > 1:
+        return ProcessPoolExecutor(max_workers=n_workers)
+    return _SerialExecutor()
+
+
+def read_mesh_npz(path):
+    """ Read a mesh saved as npz into a SchismMesh
+
+        Accepts a file written by :meth:`SchoutUncombinedMesh.save_mesh` or
+        the geometry cache (``local_to_global_cache.npz``) of an uncombined
+        run, so it can stand in for ``hgrid.gr3``.
+
+        Parameters
+        ----------
+        path: str
+            path of the npz file
+
+        Returns
+        -------
+        schimpy.schism_mesh.SchismMesh
+            mesh with nodes (x, y, depth) and elements; ``kbp`` is set as
+            an attribute when present in the file.
+    """
+    with np.load(path) as npz:
+        mesh = schism_mesh.SchismMesh()
+        mesh._nodes = npz['nodes']
+        mesh._elems = npz['elems']
+        if 'kbp' in npz:
+            mesh.kbp = npz['kbp']
+    return mesh
 
 
 class SchoutUncombinedMesh:
-    def __init__(self, *args, path_outputs=None, **kwargs):
+    def __init__(self, *args, path_outputs=None, n_workers=None,
+                 use_cache=True, **kwargs):
         """
         Constructor
 
@@ -22,9 +207,18 @@ class SchoutUncombinedMesh:
         ----------
         path_outputs: str, optional
             The path to the output directory
+        n_workers: int, optional
+            number of processes parsing local_to_global files.
+            Defaults to the number of CPUs.
+        use_cache: bool, optional
+            read and write the assembled geometry from/to
+            ``local_to_global_cache.npz`` in the output directory
         """
         self._schism_mesh = None
+        self._node_owner = None
         self._path_outputs = path_outputs if path_outputs is not None else './outputs'
+        self._n_workers = n_workers
+        self._use_cache = use_cache
         self.read_global_geometry(self._path_outputs)
 
     def _allocate_memory(self):
@@ -36,13 +230,19 @@ class SchoutUncombinedMesh:
         self.elems_local_to_global = []
         self.nodes_local_to_global = []
         self.sides_local_to_global = []
-        self.nodes_local = []
-        self.elems_local = []
+
+    def _local_to_global_files(self, path_outputs):
+        return [os.path.join(path_outputs, 'local_to_global_{:04d}'.format(rank))
+                for rank in range(self.global_dims['nproc'])]
 
     def read_global_geometry(self, path_outputs=None):
         """
         Gather global geometry from uncombined nc outputs
 
+        The local_to_global files are parsed in a process pool and the
+        result is saved to a sidecar cache, which later calls load instead
+        as long as the files are unchanged.
+
         Parameters
         ----------
         path_outputs: str, optional
@@ -52,121 +252,233 @@ class SchoutUncombinedMesh:
             path_outputs = self._path_outputs
         fname = os.path.join(path_outputs, 'local_to_global_0000')
         self.global_dims = self.read_global_dimension(fname)
+        fnames = self._local_to_global_files(path_outputs)
+        signature = np.array([(os.stat(f).st_mtime_ns, os.stat(f).st_size)
+                              for f in fnames], dtype=np.int64)
+        path_cache = os.path.join(path_outputs, GEOMETRY_CACHE_NAME)
+        if self._use_cache and self._load_geometry_cache(path_cache, signature):
+            return
         self._allocate_memory()
         self._create_geometry_variables()
         self.proc_header = []
-        for rank in range(self.global_dims['nproc']):
-            fname = os.path.join(
-                path_outputs, 'local_to_global_{:04d}'.format(rank))
-            with open(fname, 'r') as fobj:
-                fobj.readline()
-                fobj.readline()
-                self.elems_local_to_global.append(
-                    self.read_elements_local_to_global(fobj))
-                self.nodes_local_to_global.append(
-                    self.read_nodes_local_to_global(fobj))
-                self.sides_local_to_global.append(
-                    self.read_sides_local_to_global(fobj))
-                header = self.read_header_local_to_global(fobj)
-                self.proc_header.append(header)
-                self.read_nodes(fobj, self.n_nodes_local)
-                self.read_elems(fobj, self.n_elems_local)
+        n_workers = self._n_workers or os.cpu_count() or 1
+        if n_workers > 1 and len(fnames) > 1:
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(fnames))) as executor:
+                ranks = executor.map(parse_local_to_global, fnames,
+                                     chunksize=max(1, len(fnames) // (4 * n_workers)))
+                for parsed in ranks:
+                    self._add_rank(parsed)
+        else:
+            for f in fnames:
+                self._add_rank(parse_local_to_global(f))
+        if self._use_cache:
+            self._save_geometry_cache(path_cache, signature)
 
-    @property
-    def schism_mesh(self):
-        if self._schism_mesh is None:
-            self._schism_mesh = schism_mesh.SchismMesh()
-            self._schism_mesh._nodes = self._nodes
-            self._schism_mesh._elems = self._elems
-        return self._schism_mesh
+    def _add_rank(self, parsed):
+        """ Scatter the geometry of a parsed rank into the global arrays
+        """
+        self.elems_local_to_global.append(parsed['elems'])
+        self.nodes_local_to_global.append(parsed['nodes'])
+        self.sides_local_to_global.append(parsed['sides'])
+        self.proc_header.append(parsed['header'])
+        nodes_global = parsed['nodes'][:, 1]
+        node_values = parsed['node_values']
+        self._nodes[nodes_global, :] = node_values[:, :3]
+        self._kbp[nodes_global] = node_values[:, 3]
+        conn = parsed['elem_conn']
+        elems = nodes_global[np.maximum(conn - 1, 0)]
+        # Add int32 min (negative) for a missing value
+        elems[conn == 0] = np.iinfo(np.int32).min
+        self._elems[parsed['elems'][:, 1]] = elems
 
-    def read_global_dimension(self, path_local_to_global):
-        """  Read the global dimension from the header of local_to_global
+    def _save_geometry_cache(self, path_cache, signature):
+        def _stack(arrays):
+            offsets = np.cumsum([0] + [len(a) for a in arrays])
+            return np.concatenate(arrays), offsets
+        elems_l2g, elem_offsets = _stack(self.elems_local_to_global)
+        nodes_l2g, node_offsets = _stack(self.nodes_local_to_global)
+        sides_l2g, side_offsets = _stack(self.sides_local_to_global)
+        # Write under a temporary name and rename, so an interrupted write
+        # never leaves a partial cache behind
+        try:
+            fd, path_tmp = tempfile.mkstemp(dir=os.path.dirname(path_cache) or '.',
+                                            prefix='.' + GEOMETRY_CACHE_NAME,
+                                            suffix='.tmp')
+        except OSError as e:
+            logger.warning("Could not write geometry cache %s: %s", path_cache, e)
+            return
+        try:
+            with os.fdopen(fd, 'wb') as fobj:
+                np.savez(fobj,
+                         signature=signature,
+                         global_dims=np.array([self.global_dims[k] for k in
+                                               ('ns', 'ne', 'np', 'nvrt', 'nproc')]),
+                         nodes=self._nodes, kbp=self._kbp, elems=self._elems,
+                         elems_l2g=elems_l2g, elem_offsets=elem_offsets,
+                         nodes_l2g=nodes_l2g, node_offsets=node_offsets,
+                         sides_l2g=sides_l2g, side_offsets=side_offsets,
+                         nrec=np.array([h['nrec'] for h in self.proc_header]),
+                         start=np.array([h['start'] for h in self.proc_header]))
+            os.replace(path_tmp, path_cache)
+        except OSError as e:
+            logger.warning("Could not write geometry cache %s: %s", path_cache, e)
+            try:
+                os.remove(path_tmp)
+            except OSError:
+                pass
 
-            Returns
-            -------
-            global dimensions: dict
-                [ns, ne, np, nvrt, nproc]
+    def _load_geometry_cache(self, path_cache, signature):
+        """ Load the geometry from the sidecar cache if it is current
         """
-        names = ['ns', 'ne', 'np', 'nvrt', 'nproc']
-        with open(path_local_to_global, 'r') as fin:
-            return dict(zip(names,
-                            [int(x) for x in fin.readline().split()[:5]]))
+        if not os.path.exists(path_cache):
+            return False
+        try:
+            with np.load(path_cache) as cache:
+                if not np.array_equal(cache['signature'], signature):
+                    return False
+                self._nodes = cache['nodes']
+                self._kbp = cache['kbp']
+                self._elems = cache['elems']
+                self.elems_local_to_global = np.split(
+                    cache['elems_l2g'], cache['elem_offsets'][1:-1])
+                self.nodes_local_to_global = np.split(
+                    cache['nodes_l2g'], cache['node_offsets'][1:-1])
+                self.sides_local_to_global = np.split(
+                    cache['sides_l2g'], cache['side_offsets'][1:-1])
+                self.proc_header = [{'nrec': int(nrec), 'start': [int(x) for x in start]}
+                                    for nrec, start in zip(cache['nrec'], cache['start'])]
+        except Exception as e:
+            # A damaged cache, e.g. a truncated zip, is only a cache miss
+            logger.warning("Ignoring unreadable geometry cache %s: %s", path_cache, e)
+            return False
+        return True
+
+    # Readers of the sections of an open local_to_global file, kept for
+    # callers parsing files themselves.  read_global_geometry uses the
+    # vectorized parse_local_to_global instead.
 
     def read_elements_local_to_global(self, fobj):
         """ Read the element local to global section from a local_to_global file
         """
         n_elems_local = int(fobj.readline().strip())  # # of local elements
-        elems_local_to_global = np.genfromtxt(
-            fobj, max_rows=n_elems_local, dtype=np.int32)
-        elems_local_to_global -= 1  # to zero-based
-        return elems_local_to_global
+        return _parse_block(_read_lines(fobj, n_elems_local), np.int32) - 1
 
     def read_nodes_local_to_global(self, fobj):
         """ Read the node local to global section from a local_to_global file
         """
         n_nodes_local = int(fobj.readline().strip())  # # of local nodes
-        nodes_local_to_global = np.genfromtxt(
-            fobj, max_rows=n_nodes_local, dtype=np.int32)
-        nodes_local_to_global -= 1  # to zero-based
-        return nodes_local_to_global
+        return _parse_block(_read_lines(fobj, n_nodes_local), np.int32) - 1
 
     def read_sides_local_to_global(self, fobj):
         """ Read the side local to global section from a local_to_global file
         """
         n_sides_local = int(fobj.readline().strip())  # # of local sides
-        sides_local_to_global = np.genfromtxt(
-            fobj, max_rows=n_sides_local, dtype=np.int32)
-        sides_local_to_global -= 1  # to zero-based
-        return sides_local_to_global
+        return _parse_block(_read_lines(fobj, n_sides_local), np.int32) - 1
 
     def read_header_local_to_global(self, fobj):
         """ Read the header section of the end of a local_to_global file
         """
-        # For now, the lines below are not being read.
         fobj.readline()  # "Header:"
         l = fobj.readline().split()  # start_year,start_month,start_day,start_hour
         start = [int(x) for x in l[:3]]
-        l = fobj.readline()  # utc_start
-        l = fobj.readline()  # nrec,dtout,nspool,nvrt,kz, h0
-        tkns = l.strip().split()
+        fobj.readline()  # utc_start
+        tkns = fobj.readline().split()  # nrec,dtout,nspool,nvrt,kz, h0
         nrec = int(tkns[0])
         nvrt = int(tkns[3])
-        l = fobj.readline()  # h_s,h_c,theta_b,theta_f,itmp
+        fobj.readline()  # h_s,h_c,theta_b,theta_f,itmp
         count = nvrt
         while count > 0:
-            l = fobj.readline()  # ztot
-            count -= len(l.strip().split())
+            count -= len(fobj.readline().split())  # ztot, sigma
         l = fobj.readline()  # np_lcl, ne_lcl
         self.n_nodes_local, self.n_elems_local = [
             int(x) for x in l.split()[:2]]
-        # if n_nodes != self.nodes_local_to_global[-1].shape[0]:
-        #     print(len(self.nodes_local_to_global))
-        #     raise ValueError("The number of the local nodes do not agree.")
-        # if n_elems != self.elems_local_to_global[-1].shape[0]:
-        #     raise ValueError("The number of the local elements do not agree.")
-        return {'nrec': nrec}
+        return {'nrec': nrec, 'start': start}
 
     def read_nodes(self, fobj, n_nodes):
         """ Read the nodes section from a local_to_global file
         """
-        nodes = np.genfromtxt(fobj, max_rows=n_nodes)   # x, y, depth, kbp
-        self._nodes[self.nodes_local_to_global[-1][:, 1], :] = nodes[:, :3]
-        self._kbp[self.nodes_local_to_global[-1][:, 1]] = nodes[:, 3]
+        nodes = _parse_block(_read_lines(fobj, n_nodes), np.float64)  # x, y, depth, kbp
+        nodes_global = self.nodes_local_to_global[-1][:, 1]
+        self._nodes[nodes_global, :] = nodes[:, :3]
+        self._kbp[nodes_global] = nodes[:, 3]
 
     def read_elems(self, fobj, n_elems):
-        for elem_i_local in range(n_elems):
-            l = fobj.readline()
-            tkn = [self.nodes_local_to_global[-1]
-                   [int(x) - 1, 1] for x in l.split()[1:]]
-            if len(tkn) == 3:
-                # Add int32 min (negative) for a missing value
-                tkn.append(np.iinfo(np.int32).min)
-            elif len(tkn) != 4:
-                raise ValueError(
-                    'The number of items in the connectivity is not correct.')
-            tkn = np.array(tkn, dtype=np.int32)
-            self._elems[self.elems_local_to_global[-1][elem_i_local, 1]] = tkn
+        """ Read the elements section from a local_to_global file
+        """
+        conn = _parse_elem_block(_read_lines(fobj, n_elems))
+        elems = self.nodes_local_to_global[-1][:, 1][np.maximum(conn - 1, 0)]
+        # Add int32 min (negative) for a missing value
+        elems[conn == 0] = np.iinfo(np.int32).min
+        self._elems[self.elems_local_to_global[-1][:, 1]] = elems
+
+    @property
+    def node_owner(self):
+        """ Global node to (rank, local node index) lookup arrays
+
+            Built once on first use.  A ghost node shared by several ranks is
+            assigned to the lowest rank holding it; nodes not present in any
+            rank have -1 in both arrays.
+
+            Returns
+            -------
+            numpy.ndarray
+                owning rank of each global node
+            numpy.ndarray
+                local node index in the owning rank
+        """
+        if self._node_owner is None:
+            nodes_global = np.concatenate(
+                [l2g[:, 1] for l2g in self.nodes_local_to_global])
+            ranks = np.repeat(
+                np.arange(len(self.nodes_local_to_global), dtype=np.int32),
+                [len(l2g) for l2g in self.nodes_local_to_global])
+            local = np.concatenate(
+                [np.arange(len(l2g), dtype=np.int32)
+                 for l2g in self.nodes_local_to_global])
+            # ranks are concatenated in order, so the first occurrence is
+            # the lowest rank
+            unique, first = np.unique(nodes_global, return_index=True)
+            node_rank = np.full(self.global_dims['np'], -1, dtype=np.int32)
+            node_local = np.full(self.global_dims['np'], -1, dtype=np.int32)
+            node_rank[unique] = ranks[first]
+            node_local[unique] = local[first]
+            self._node_owner = (node_rank, node_local)
+        return self._node_owner
+
+    def save_mesh(self, path):
+        """ Save the global nodes, elements and kbp to a compact npz file
+
+            The file can be read back with :func:`read_mesh_npz` and used in
+            place of ``hgrid.gr3`` by the ``schismviz viz`` commands.
+
+            Parameters
+            ----------
+            path: str
+                path of the npz file to write
+        """
+        with open(path, 'wb') as fobj:
+            np.savez(fobj, nodes=self._nodes, elems=self._elems, kbp=self._kbp)
+
+    @property
+    def schism_mesh(self):
+        if self._schism_mesh is None:
+            self._schism_mesh = schism_mesh.SchismMesh()
+            self._schism_mesh._nodes = self._nodes
+            self._schism_mesh._elems = self._elems
+        return self._schism_mesh
+
+    def read_global_dimension(self, path_local_to_global):
+        """  Read the global dimension from the header of local_to_global
+
+            Returns
+            -------
+            global dimensions: dict
+                [ns, ne, np, nvrt, nproc]
+        """
+        names = ['ns', 'ne', 'np', 'nvrt', 'nproc']
+        with open(path_local_to_global, 'r') as fin:
+            return dict(zip(names,
+                            [int(x) for x in fin.readline().split()[:5]]))
 
 
 class Schout:
@@ -190,6 +502,12 @@ class Schout:
     def schism_mesh(self):
         return self.mesh.schism_mesh
 
+    def schout_path(self, rank, spool):
+        """ Path of the schout file of a rank (zero-based) and a spool
+        """
+        return os.path.join(self._path_outputs,
+                            'schout_{:04d}_{:d}.nc'.format(rank, spool))
+
     def get_available_spools(self):
         """ Get the available spool from the outputs direcotry.
         """
@@ -210,10 +528,10 @@ class Schout:
 
     def node_value(self, variable_name, rank, node_local_i, spool_begin, spool_end,
                    t_basis=None):
-        """ Extract a time series of a variable at a node from the uncombined
-            schout_*.nc files.
-            NOTE: It is a work-in-progress, so it assumes that the variable is
-            a 2D one. The type of the return value is a simple 1D numpy arary.
+        """ Extract a time series of a variable at a node given by its rank
+            and local index.
+
+            A thin wrapper of :meth:`extract_nodes`.
 
             Parameters
             ----------
@@ -227,27 +545,17 @@ class Schout:
                 spool index to start retrieving (one-based)
             spool_end: int
                 spool index to end retrieving (inclusive, one-based)
+            t_basis: datetime-like, optional
+                time of the zero of the ``time`` variable
 
             Returns
             -------
-            numpy.array
-                variable
+            xarray.DataArray
+                values with dimensions (time[, level][, ...])
         """
-        # TODO: Switch to xarray
-        n_spools = spool_end - spool_begin + 1
-
-        xr_datasets = []
-        for spool_i in range(spool_begin, spool_end + 1):
-            path_schout = path_schout = os.path.join(
-                    self._path_outputs, 'schout_{:04d}_{:d}.nc'.format(rank, spool_i))
-            xr_schout = xr.open_dataset(path_schout)
-            xr_datasets.append(xr_schout[variable_name].sel(nSCHISM_hgrid_node=node_local_i))
-        xr_result = xr.concat(xr_datasets, dim='time')
-
-        if t_basis is not None:
-            times = [t_basis + pd.to_timedelta(t, unit='s') for t in xr_result['time'].values]
-            xr_result['time'] = times
-        return xr_result
+        node = self.mesh.nodes_local_to_global[rank][node_local_i, 1]
+        return self.extract_nodes(variable_name, node, spool_begin, spool_end,
+                                  t_basis=t_basis, n_workers=1).isel(node=0)
 
     def available_variables(self):
         """ Get the list of variable names from the first file among
@@ -274,10 +582,170 @@ class Schout:
             var = root.variables[name]
             return len(var.shape)
 
-    def variable(self, name, spool_begin, spool_end, skip=1, node_i=None, level=None):
+    def _node_variable_layout(self, name, level=None, path=None):
+        """ Layout of a node variable in the schout files
+
+            Returns
+            -------
+            list
+                dimension names after (time, nSCHISM_hgrid_node)
+            list
+                shape after (time, nSCHISM_hgrid_node)
+            tuple
+                index to read the trailing dimensions, selecting ``level``
+            numpy.dtype
+                dtype in the file
+        """
+        if path is None:
+            path = glob.glob(os.path.join(self._path_outputs, 'schout_0000_*.nc'))[0]
+        with nc.Dataset(path) as root:
+            nc_var = root.variables[name]
+            dims = nc_var.dimensions
+            shape = nc_var.shape
+            dtype = nc_var.dtype
+        if len(dims) < 2 or dims[1] != 'nSCHISM_hgrid_node':
+            raise ValueError("'{}' is not a node variable".format(name))
+        key_tail = [slice(None)] * (len(dims) - 2)
+        dims_tail = list(dims[2:])
+        shape_tail = list(shape[2:])
+        if level is not None:
+            if 'nSCHISM_vgrid_layers' not in dims_tail:
+                raise ValueError("'{}' has no vertical levels".format(name))
+            i_level = dims_tail.index('nSCHISM_vgrid_layers')
+            key_tail[i_level] = level
+            if np.ndim(level) == 0:
+                del dims_tail[i_level], shape_tail[i_level]
+            else:
+                shape_tail[i_level] = len(level)
+        return dims_tail, shape_tail, tuple(key_tail), dtype
+
+    def _record_plan(self, spool_begin, spool_end, skip=1, time_begin=None,
+                     time_end=None, executor=None):
+        """ Plan the records to read for a decimated time selection
+
+            Returns
+            -------
+            list
+                ``(spool, first, last)`` local records to read contiguously
+                from each spool (inclusive); every ``skip``-th of them is
+                kept.  Spools without selected records are left out.
+            numpy.ndarray
+                times of the selected records
+        """
+        if skip < 1:
+            raise ValueError("skip must be a positive integer")
+        spools = list(range(spool_begin, spool_end + 1))
+        if executor is None:
+            executor = _SerialExecutor()
+        futures = [executor.submit(read_nc_block, self.schout_path(0, spool),
+                                   'time', slice(None))
+                   for spool in spools]
+        plan = []
+        times = []
+        phase = 0  # records to pass over before the next kept one
+        for spool, future in zip(spools, futures):
+            time = future.result()
+            selected = np.ones(len(time), dtype=bool)
+            if time_begin is not None:
+                selected &= time >= time_begin
+            if time_end is not None:
+                selected &= time <= time_end
+            records = np.nonzero(selected)[0]
+            kept = records[phase::skip]
+            if len(records):
+                phase = (phase - len(records)) % skip
+            if len(kept):
+                plan.append((spool, int(kept[0]), int(kept[-1])))
+                times.append(time[kept])
+        times = np.concatenate(times) if times else np.empty(0)
+        return plan, times
+
+    def times(self, spool_begin, spool_end, skip=1, time_begin=None, time_end=None):
+        """ Times in seconds of the records selected by :meth:`variable`
+        """
+        return self._record_plan(spool_begin, spool_end, skip,
+                                 time_begin, time_end)[1]
+
+    def iter_variable(self, name, spool_begin, spool_end, skip=1, level=None,
+                      dtype=np.float64, n_workers=None, time_begin=None,
+                      time_end=None):
+        """ Read a variable of the whole domain one spool at a time
+
+            The ranks are read concurrently in a process pool and scattered
+            into a global block per spool.  The reads of the next spool are
+            queued before a block is yielded, so at most two spools are held
+            in memory.
+
+            With ``skip`` greater than one the span of kept records of a
+            spool is read contiguously and decimated in memory.  The
+            decimation runs across spool boundaries, so ``skip`` need not
+            divide the records in a spool.
+
+            Parameters
+            ----------
+            name: str
+                variable name to read.
+            spool_begin: int
+                spool number to start reading.
+            spool_end: int
+                spool number to end reading (inclusive).
+            skip: int, optional
+                keep every ``skip``-th record.
+            level: int, optional
+                level number to read in, if it is given.
+            dtype: numpy.dtype, optional
+                dtype of the blocks, e.g. ``np.float32`` to halve memory.
+            n_workers: int, optional
+                number of reader processes; defaults to the number of CPUs.
+            time_begin, time_end: float, optional
+                model time window in seconds (inclusive) within the spools.
+
+            Yields
+            ------
+            int
+                spool number
+            numpy.ndarray
+                (records, global nodes, ...) block of the spool
+        """
+        with _reader_pool(n_workers) as executor:
+            plan, _ = self._record_plan(spool_begin, spool_end, skip,
+                                        time_begin, time_end, executor)
+            yield from self._iter_plan(name, plan, skip, level, dtype, executor)
+
+    def _iter_plan(self, name, plan, skip, level, dtype, executor):
+        """ Read the spools of a :meth:`_record_plan` one at a time
+        """
+        _, shape_tail, key_tail, _ = self._node_variable_layout(name, level)
+        nproc = self.mesh.global_dims['nproc']
+        n_nodes_global = self.mesh.global_dims['np']
+
+        def _submit(spool, first, last):
+            key = (slice(first, last + 1), slice(None)) + key_tail
+            return [executor.submit(read_nc_block, self.schout_path(rank, spool),
+                                    name, key, None, skip)
+                    for rank in range(nproc)]
+
+        pending = _submit(*plan[0]) if plan else []
+        for i, (spool, first, last) in enumerate(plan):
+            futures = pending
+            pending = _submit(*plan[i + 1]) if i + 1 < len(plan) else []
+            n_rows = (last - first) // skip + 1
+            block = np.empty([n_rows, n_nodes_global] + shape_tail, dtype=dtype)
+            for rank, future in enumerate(futures):
+                map_node_local_to_global = self.mesh.nodes_local_to_global[rank][:, 1]
+                block[:, map_node_local_to_global] = future.result()
+            yield spool, block
+
+    def variable(self, name, spool_begin, spool_end, skip=1, node_i=None, level=None,
+                 dtype=np.float64, out=None, n_workers=None, time_begin=None,
+                 time_end=None):
         """ Read a variable of the whole domain
             from the uncombined SCHISM schout files.
 
+            Spools are assembled one at a time with :meth:`iter_variable`
+            and copied into the result, which can be a memory-mapped file
+            for variables larger than memory.
+
             Parameters
             ----------
             name: str
@@ -287,10 +755,23 @@ class Schout:
             spool_end: int
                 spool number to end reading (inclusive).
             skip: int, optional
-                skip size in the time dimension. default = 1, no skipping.
+                keep every ``skip``-th record. default = 1, no skipping.
+                Any positive value is accepted; see :meth:`iter_variable`.
+            node_i: int or array-like of int, optional
+                global nodes to read; see :meth:`extract_nodes`.
             level: int, optional
                 level number to read in, if it is given.
                 If not, all levels will be read in.
+            dtype: numpy.dtype, optional
+                dtype of the result; ``np.float32`` halves the memory.
+            out: str or numpy.ndarray, optional
+                array to fill, or the path of a ``.npy`` file to create as
+                a memory map and fill.
+            n_workers: int, optional
+                number of reader processes; defaults to the number of CPUs.
+            time_begin, time_end: float, optional
+                model time window in seconds (inclusive) within the spools;
+                :meth:`times` gives the times of the rows.
 
             Returns
             -------
@@ -298,109 +779,268 @@ class Schout:
                 data for the variable
         """
         if node_i is not None:
-            raise NotImplementedError()
-        nproc = self.mesh.global_dims['nproc']
-        n_spools = spool_end - spool_begin + 1
-        nrec = self.mesh.proc_header[0]['nrec']
-        i23d = -1
-        ivs = -1
-        schout_files = glob.glob(os.path.join(
-            self._path_outputs, 'schout_0000_*.nc'))
-        path_file = os.path.join(self._path_outputs, schout_files[0])
-        with nc.Dataset(path_file) as root:
-            i23d = getattr(root.variables[name], "i23d")
-            ivs = getattr(root.variables[name], "ivs")
-        if i23d == -1:
-            raise RuntimeError("i23d is not retrieved")
-        if nrec % skip != 0:
-            raise ValueError(
-                "The value of 'skip' should be a factor of the number of the records in a spool.")
-        n_rows = n_spools * nrec // skip
-        n_nodes_global = self.mesh.global_dims['np']
-        n_vrt = self.mesh.global_dims['nvrt']
-        if node_i is None:
-            if i23d == 1:
-                shape = (n_rows, n_nodes_global)
-            elif i23d == 2:
-                if ivs == 1:
-                    shape = (n_rows, n_nodes_global, n_vrt)
-                elif ivs == 2:
-                    shape = (n_rows, n_nodes_global, n_vrt, 2)
+            if skip != 1 or time_begin is not None or time_end is not None:
+                raise NotImplementedError(
+                    "skip and time windows are not supported with node_i")
+            return self.extract_nodes(name, node_i, spool_begin, spool_end,
+                                      level=level, n_workers=n_workers).values
+        _, shape_tail, _, _ = self._node_variable_layout(name, level)
+        with _reader_pool(n_workers) as executor:
+            # The plan gives the number of rows, so each spool's time is
+            # read only once
+            plan, times = self._record_plan(spool_begin, spool_end, skip,
+                                            time_begin, time_end, executor)
+            shape = tuple([len(times), self.mesh.global_dims['np']] + shape_tail)
+            if out is None:
+                variable = np.empty(shape, dtype=dtype)
+            elif isinstance(out, np.ndarray):
+                if out.shape != shape:
+                    raise ValueError("out has shape {}, expected {}".format(out.shape, shape))
+                variable = out
             else:
-                raise NotImplementedError("Data type not supported")
-        else:
-            raise NotImplementedError("")
-        variable = np.empty(shape)
-        for spool_i in range(spool_begin, spool_end + 1):
-            slice_time = slice((spool_i - spool_begin) * nrec // skip,
-                               (spool_i - spool_begin + 1) * nrec // skip)
-            for proc_i in range(nproc):
-                path_schout = os.path.join(self._path_outputs,
-                                           'schout_{:04d}_{:d}.nc'.format(proc_i, spool_i))
-                map_node_local_to_global = self.mesh.nodes_local_to_global[proc_i][:, 1]
-                with nc.Dataset(path_schout) as root:
-                    nc_var = root.variables[name]
-                    # 2D variable (time, nodes)
-                    if i23d == 1:
-                        if ivs == 1:
-                            variable[slice_time] = nc_var[::skip, :]
-                        else:
-                            raise NotImplementedError("i23d=1, ivs=2 not impelmeneted")
-                    # 3D variable (time, nodes, levels)
-                    elif i23d == 2:
-                        # Scalar
-                        if ivs == 1:
-                           variable[slice_time,
-                                     map_node_local_to_global, :] = \
-                                             nc_var[::skip, :, :]
-                        # Vector
-                        elif ivs == 2:
-                            variable[slice_time,
-                                     map_node_local_to_global, :] = \
-                                nc_var[::skip, :, :]
-                    # 4D variable
-                    elif i23d == 3:
-                        if ivs == 1:
-                            if level is None:
-                                variable[slice_time,
-                                         map_node_local_to_global, :, :] = \
-                                    nc_var[::skip, :, :]
-                            else:
-                                variable[slice_time,
-                                         map_node_local_to_global, :] = \
-                                    nc_var[::skip, :, level]
-                        elif ivs == 2:
-                            if level is None:
-                                variable[slice_time,
-                                         map_node_local_to_global, :, :, :] = \
-                                    nc_var[::skip, :, :, :]
-                            else:
-                                variable[slice_time,
-                                         map_node_local_to_global, :, :] = \
-                                    nc_var[::skip, :, level, :]
+                variable = np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+            row = 0
+            for _, block in self._iter_plan(name, plan, skip, level, dtype, executor):
+                variable[row:row + len(block)] = block
+                row += len(block)
+        if isinstance(variable, np.memmap):
+            variable.flush()
         return variable
 
+    def extract_nodes(self, name, nodes, spool_begin, spool_end, level=None,
+                      t_basis=None, n_workers=None):
+        """ Extract time series of a node variable at global nodes
+            directly from the uncombined schout files.
+
+            Only the files of the ranks owning the nodes are opened, one
+            (rank, spool) file per task in a process pool.
+
+            Parameters
+            ----------
+            name: str
+                variable name to extract, on nSCHISM_hgrid_node
+            nodes: int or array-like of int
+                global node indices (zero-based)
+            spool_begin: int
+                spool number to start reading.
+            spool_end: int
+                spool number to end reading (inclusive).
+            level: int or list of int, optional
+                vertical level(s) to read for a 3D variable. All levels
+                if not given.
+            t_basis: datetime-like, optional
+                time of the zero of the ``time`` variable. If given the
+                time coordinate is converted to timestamps.
+            n_workers: int, optional
+                number of reader processes; defaults to the number of CPUs.
+
+            Returns
+            -------
+            xarray.DataArray
+                values with dimensions (time, node[, level][, ...])
+        """
+        nodes = np.atleast_1d(np.asarray(nodes))
+        ranks, local = self.find_local_node_index(nodes)
+        spools = list(range(spool_begin, spool_end + 1))
+        first_rank = int(ranks[0])
+        dims_tail, shape_tail, key_tail, dtype = self._node_variable_layout(
+            name, level, self.schout_path(first_rank, spool_begin))
+
+        with _reader_pool(n_workers) as executor:
+            time_futures = [executor.submit(read_nc_block, self.schout_path(first_rank, spool),
+                                            'time', slice(None))
+                            for spool in spools]
+            reads = []
+            for rank in np.unique(ranks):
+                positions = np.nonzero(ranks == rank)[0]
+                local_i, inverse = np.unique(local[positions], return_inverse=True)
+                lo, hi = local_i[0], local_i[-1] + 1
+                # One contiguous read when the nodes are dense in the rank,
+                # otherwise an indexed read of just those nodes
+                if hi - lo <= 4 * len(local_i):
+                    key = (slice(None), slice(lo, hi)) + key_tail
+                    select = local_i - lo
+                else:
+                    key = (slice(None), local_i) + key_tail
+                    select = None
+                for spool_i, spool in enumerate(spools):
+                    future = executor.submit(read_nc_block, self.schout_path(int(rank), spool),
+                                             name, key, select)
+                    reads.append((spool_i, positions, inverse, future))
+            times = [f.result() for f in time_futures]
+            offsets = np.cumsum([0] + [len(t) for t in times])
+            values = np.full([offsets[-1], len(nodes)] + shape_tail,
+                             np.nan, dtype=dtype)
+            for spool_i, positions, inverse, future in reads:
+                values[offsets[spool_i]:offsets[spool_i + 1], positions] = \
+                    future.result()[:, inverse]
+
+        time = np.concatenate(times) if times else np.empty(0)
+        if t_basis is not None:
+            time = pd.Timestamp(t_basis) + pd.to_timedelta(time, unit='s')
+        return xr.DataArray(values,
+                            dims=['time', 'node'] + dims_tail,
+                            coords={'time': time, 'node': nodes},
+                            name=name)
+
+    def combine(self, path_combined=None, spool_begin=None, spool_end=None,
+                variables=None, complevel=4, resume=True, n_workers=None):
+        """ Combine the per-rank schout files into one file per spool
+
+            Each ``schout_{spool}.nc`` holds the global mesh and every
+            time-dependent node, face and edge variable, scattered from the
+            ranks through the local_to_global maps.  The files carry the
+            node coordinates and a ``base_date`` on ``time``, so they open
+            in :class:`schismviz.schism_nc.SchismNcUIManager` (``schismviz
+            nc --pattern "schout_*.nc"``) like out2d files.  They go to a
+            ``combined`` subdirectory of the outputs by default, away from
+            the per-rank files that the same pattern would match.  The ranks of a variable
+            are read concurrently in a process pool, one variable of one
+            spool at a time.  A spool is written to a ``.part`` file that is
+            renamed when complete, so an interrupted run can be resumed by
+            skipping the spools already combined.
+
+            Parameters
+            ----------
+            path_combined: str, optional
+                output directory; defaults to the ``combined`` subdirectory
+                of the outputs directory.
+            spool_begin: int, optional
+                first spool to combine; defaults to the first available.
+            spool_end: int, optional
+                last spool to combine (inclusive); defaults to the last.
+            variables: list of str, optional
+                variables to combine; defaults to all mapped variables.
+            complevel: int, optional
+                zlib compression level, 0 for none.
+            resume: bool, optional
+                skip spools whose combined file already exists.
+            n_workers: int, optional
+                number of reader processes; defaults to the number of CPUs.
+
+            Returns
+            -------
+            list
+                paths of the combined files written in this call
+        """
+        if path_combined is None:
+            path_combined = os.path.join(self._path_outputs, COMBINED_DIR)
+        os.makedirs(path_combined, exist_ok=True)
+        spools = sorted(self.get_available_spools())
+        if spool_begin is not None:
+            spools = [sp for sp in spools if sp >= spool_begin]
+        if spool_end is not None:
+            spools = [sp for sp in spools if sp <= spool_end]
+        written = []
+        with _reader_pool(n_workers) as executor:
+            for spool in spools:
+                path_out = os.path.join(path_combined, 'schout_{:d}.nc'.format(spool))
+                if resume and os.path.exists(path_out):
+                    logger.info("Skipping spool %d: %s exists", spool, path_out)
+                    continue
+                path_part = path_out + '.part'
+                self._combine_spool(executor, spool, path_part, variables, complevel)
+                os.replace(path_part, path_out)
+                logger.info("Combined spool %d into %s", spool, path_out)
+                written.append(path_out)
+        return written
+
+    def _combine_spool(self, executor, spool, path_part, variables, complevel):
+        nproc = self.mesh.global_dims['nproc']
+        with nc.Dataset(self.schout_path(0, spool)) as root:
+            time = root.variables['time'][:]
+            time_attrs = {k: root.variables['time'].getncattr(k)
+                          for k in root.variables['time'].ncattrs()}
+            layouts = {}
+            for name, nc_var in root.variables.items():
+                dims = nc_var.dimensions
+                if variables is not None and name not in variables:
+                    continue
+                if len(dims) < 2 or dims[0] != 'time' or dims[1] not in _MAPPED_DIMS:
+                    continue
+                layouts[name] = (dims, nc_var.shape[2:], nc_var.dtype,
+                                 {k: nc_var.getncattr(k) for k in nc_var.ncattrs()
+                                  if k != '_FillValue'})
+            extra_dims = {d: len(root.dimensions[d]) for name in layouts
+                          for d in layouts[name][0][2:]}
+        mesh = self.mesh
+        n_global = {dim: mesh.global_dims[key] for dim, (key, _) in _MAPPED_DIMS.items()}
+        zlib = complevel > 0
+        with nc.Dataset(path_part, 'w') as out:
+            out.createDimension('time', None)
+            for dim, size in n_global.items():
+                out.createDimension(dim, size)
+            out.createDimension('nMaxSCHISM_hgrid_face_nodes', 4)
+            for dim, size in extra_dims.items():
+                if dim not in out.dimensions:
+                    out.createDimension(dim, size)
+            nc_time = out.createVariable('time', 'f8', ('time',))
+            nc_time.setncatts(time_attrs)
+            if not str(time_attrs.get('base_date', '')).strip():
+                # The viewers decode the time axis from base_date
+                nc_time.base_date = '{:d} {:d} {:d} 0.00 0.00'.format(
+                    *mesh.proc_header[0]['start'])
+            nc_time[:] = time
+            node_dims = ('nSCHISM_hgrid_node',)
+            for name, values in (('SCHISM_hgrid_node_x', mesh._nodes[:, 0]),
+                                 ('SCHISM_hgrid_node_y', mesh._nodes[:, 1]),
+                                 ('depth', mesh._nodes[:, 2])):
+                out.createVariable(name, 'f8', node_dims, zlib=zlib,
+                                   complevel=complevel)[:] = values
+            out.createVariable('bottom_index_node', 'i4', node_dims, zlib=zlib,
+                               complevel=complevel)[:] = mesh._kbp
+            faces = mesh._elems + 1
+            faces[mesh._elems < 0] = -1
+            face_nodes = out.createVariable(
+                'SCHISM_hgrid_face_nodes', 'i4',
+                ('nSCHISM_hgrid_face', 'nMaxSCHISM_hgrid_face_nodes'),
+                zlib=zlib, complevel=complevel, fill_value=-1)
+            face_nodes.start_index = 1
+            face_nodes[:] = faces
+            for name, (dims, shape_tail, dtype, attrs) in layouts.items():
+                n = n_global[dims[1]]
+                chunks = (1, n) + tuple(shape_tail)
+                nc_var = out.createVariable(name, dtype, dims, zlib=zlib,
+                                            complevel=complevel, chunksizes=chunks)
+                nc_var.setncatts(attrs)
+                maps = getattr(mesh, _MAPPED_DIMS[dims[1]][1])
+                futures = [executor.submit(read_nc_block, self.schout_path(rank, spool),
+                                           name, slice(None))
+                           for rank in range(nproc)]
+                block = np.empty((len(time), n) + tuple(shape_tail), dtype=dtype)
+                for rank, future in enumerate(futures):
+                    block[:, maps[rank][:, 1]] = future.result()
+                nc_var[:] = block
+
     def find_local_node_index(self, global_node_i):
         """ Find the local node index and the rank from a global node index.
 
+            Uses the lookup arrays of :attr:`SchoutUncombinedMesh.node_owner`,
+            so an array of nodes is resolved in one call.
+
             Parameters
             ----------
-            global_node_i: int
-                global node index to search (zero-based)
+            global_node_i: int or array-like of int
+                global node index or indices to search (zero-based)
 
             Returns
             -------
-            int
+            int or numpy.ndarray
                 rank where the node belongs to (zero-based)
-            int
+            int or numpy.ndarray
                 local node index in the rank (zero-based)
         """
-        for rank in range(self.mesh.global_dims['nproc']):
-            result = np.where(
-                self.mesh.nodes_local_to_global[rank][:, 1] == global_node_i)
-            if result[0].size != 0:
-                return rank, result[0][0]
-        raise ValueError("Cannot find the node")
+        node_rank, node_local = self.mesh.node_owner
+        nodes = np.asarray(global_node_i)
+        if np.any((nodes < 0) | (nodes >= len(node_rank))):
+            raise ValueError("Cannot find the node")
+        ranks = node_rank[nodes]
+        if np.any(ranks < 0):
+            raise ValueError("Cannot find the node")
+        local = node_local[nodes]
+        if nodes.ndim == 0:
+            return int(ranks), int(local)
+        return ranks, local
 
 
 def read_schout(path_outputs_dir, *args, **kwargs):
@@ -417,3 +1057,26 @@ def read_schout(path_outputs_dir, *args, **kwargs):
     """
     schout = Schout(path_outputs=path_outputs_dir)
     return schout
+
+
+def combine_schout(path_outputs, path_combined=None, **kwargs):
+    """
+    Combine uncombined schout files of a SCHISM run
+
+    Parameters
+    ----------
+    path_outputs: str
+        The outputs path of a SCHISM study
+    path_combined: str, optional
+        directory of the combined files; defaults to
+        ``<path_outputs>/combined``
+    **kwargs:
+        passed to :meth:`Schout.combine`
+
+    Returns
+    -------
+    list
+        paths of the combined files written
+    """
+    schout = Schout(path_outputs=path_outputs)
+    return schout.combine(path_combined=path_combined, **kwargs)
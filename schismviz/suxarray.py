@@ -3,24 +3,42 @@
 `suxarray` is a module that extends the functionality of `uxarray` for the
 SCHISM grid.
 """
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import numba
 import xarray as xr
+import scipy.sparse
+import shapely
 from shapely.geometry import Polygon, Point
 from shapely.strtree import STRtree
 import vtk
 from vtkmodules.vtkCommonCore import (
     VTK_DOUBLE,
-    VTK_FLOAT
+    VTK_FLOAT,
+    VTK_UNSIGNED_CHAR
 )
 from vtkmodules.vtkCommonDataModel import (
+    VTK_HEXAHEDRON,
+    VTK_POLYGON,
     VTK_QUAD,
-    VTK_TRIANGLE
+    VTK_TRIANGLE,
+    VTK_WEDGE
 )
 from vtk.util import numpy_support
 import uxarray as ux
 
+logger = logging.getLogger(__name__)
+
+SPATIAL_INDEX_DIR_ENV = "SCHISMVIZ_SPATIAL_INDEX_DIR"
+
 
 class Grid(ux.Grid):
     """ uxarray Grid class for SCHISM
@@ -29,8 +47,10 @@ class Grid(ux.Grid):
     _face_strtree = None
     _node_points = None
     _node_strtree = None
+    _element_locator = None
+    _spatial_index_dir = None
 
-    def __init__(self, dataset, **kwargs):
+    def __init__(self, dataset, spatial_index_dir=None, **kwargs):
         """ Initialize a Grid object
 
         Parameters
@@ -38,6 +58,12 @@ class Grid(ux.Grid):
         dataset : xarray.Dataset, ndarray, list, tuple, required
             Input xarray.Dataset or vertex coordinates that form one face.
 
+        spatial_index_dir : str, optional
+            Directory where the spatial index of the grid is saved and
+            loaded from, keyed by a hash of the node and face arrays.
+            Default is $SCHISMVIZ_SPATIAL_INDEX_DIR. If neither is set, the
+            index is built in memory only.
+
         Other Parameters
         ----------------
         islatlon : bool, optional
@@ -53,6 +79,8 @@ class Grid(ux.Grid):
         # The current SCHISM out2d does not have this variable.
         if get_topology_variable(dataset) is None:
             dataset = self.add_topology_variable(dataset)
+        self._spatial_index_dir = (spatial_index_dir
+                                   or os.environ.get(SPATIAL_INDEX_DIR_ENV))
         # Initialize the super class
         super().__init__(dataset, **kwargs)
         # Add an optional edge node connectivity variable name
@@ -89,31 +117,24 @@ class Grid(ux.Grid):
             # If the spatial tree is not built yet, build it
             node_x = self.Mesh2_node_x.values
             node_y = self.Mesh2_node_y.values
-            fill_value = self.Mesh2_face_nodes.attrs['_FillValue']
-
-            def create_polygon(node_indices):
-                # The node indices are 1-based
-                valid = node_indices != fill_value
-                ind = node_indices[valid] - 1
-                # Assuming the indices are positional
-                return Polygon(zip(node_x[ind], node_y[ind]))
-
-            self._face_polygons = xr.apply_ufunc(create_polygon,
-                self.Mesh2_face_nodes,
-                input_core_dims=((self.ds_var_names['nMaxMesh2_face_nodes'],),),
-                dask="parallelized",
-                output_dtypes=[object],
-                vectorize=True)
+            face_nodes = self.Mesh2_face_nodes
+            fill_value = face_nodes.attrs['_FillValue']
+            nodes = np.asarray(face_nodes.values)
+            # The node indices are 1-based. Pad missing nodes with the first
+            # node so all rings have the same length; a ring ending on its
+            # first node is already closed, so triangles stay triangles.
+            ind = np.where(nodes != fill_value, nodes, nodes[:, :1]) - 1
+            coords = np.stack((node_x[ind], node_y[ind]), axis=-1)
+            self._face_polygons = xr.DataArray(shapely.polygons(coords),
+                                               dims=face_nodes.dims[:1])
         return self._face_polygons
 
     @property
     def node_points(self):
         if self._node_points is None:
-            self._node_points = xr.apply_ufunc(lambda x, y: Point(x, y),
-                                               self.Mesh2_node_x,
-                                               self.Mesh2_node_y,
-                                               vectorize=True,
-                                               dask='parallelized')
+            self._node_points = xr.DataArray(
+                shapely.points(self.Mesh2_node_x.values, self.Mesh2_node_y.values),
+                dims=self.Mesh2_node_x.dims)
         return self._node_points
 
     @property
@@ -149,6 +170,177 @@ class Grid(ux.Grid):
         point = Point(x, y)
         return self.elem_strtree.query(point, predicate=predicate)
 
+    @property
+    def element_locator(self):
+        if self._element_locator is None:
+            args = (self.Mesh2_node_x.values, self.Mesh2_node_y.values,
+                    self.face_nodes_zero_based())
+            if self._spatial_index_dir is None:
+                self._element_locator = ElementLocator(*args)
+            else:
+                self._element_locator = ElementLocator.cached(
+                    *args, index_dir=self._spatial_index_dir)
+        return self._element_locator
+
+    def face_nodes_zero_based(self):
+        """ Return the face-node connectivity as 0-based indices
+
+        Returns
+        -------
+        face_nodes : np.ndarray
+            Face-node connectivity with missing nodes set to -1
+        """
+        face_nodes = np.asarray(self.Mesh2_face_nodes.values)
+        fill_value = self.Mesh2_face_nodes.attrs['_FillValue']
+        # The node indices are 1-based
+        return np.where(face_nodes != fill_value, face_nodes - 1, -1)
+
+    def locate_points(self, xs, ys):
+        """ Find the elements containing a batch of points
+
+        Unlike `find_element_at`, this does not build any shapely objects.
+        A point on a boundary of elements is assigned to the element with
+        the lowest index.
+
+        Parameters
+        ----------
+        xs : array_like
+            x coordinates
+        ys : array_like
+            y coordinates
+
+        Returns
+        -------
+        faces : np.ndarray
+            0-based element indices, -1 for points outside of the grid
+        weights : np.ndarray
+            Interpolation weights with shape (n_points, n_max_face_nodes)
+            aligned with the columns of the face-node connectivity. NaN for
+            points outside of the grid.
+        """
+        return self.element_locator.locate(xs, ys)
+
+    def interpolation_matrix(self, xs, ys):
+        """ Build a sparse matrix interpolating node values to points
+
+        Parameters
+        ----------
+        xs : array_like
+            x coordinates
+        ys : array_like
+            y coordinates
+
+        Returns
+        -------
+        matrix : scipy.sparse.csr_matrix
+            Matrix with shape (n_points, n_nodes). Rows of points outside of
+            the grid are empty.
+        """
+        faces, weights = self.locate_points(xs, ys)
+        inside = np.nonzero(faces >= 0)[0]
+        nodes = self.face_nodes_zero_based()[faces[inside]]
+        weights = weights[inside]
+        rows = np.broadcast_to(inside[:, None], nodes.shape)
+        keep = (nodes >= 0) & (weights != 0.)
+        return scipy.sparse.csr_matrix(
+            (weights[keep], (rows[keep], nodes[keep])),
+            shape=(faces.size, self.Mesh2_node_x.size))
+
+    def interpolate_points(self, var, xs, ys, zs=None, time_chunk=100):
+        """ Interpolate a variable to points
+
+        Horizontal weights are computed once for all the points and applied
+        as a sparse matrix product. The data are read one chunk along the
+        leading (time) dimension at a time, and only at the nodes around
+        the points, so a long 3-D variable is read in a single pass.
+
+        Parameters
+        ----------
+        var : str or xr.DataArray, required
+            Variable name or a variable with dimensions ([time,] node[, layer])
+        xs : array_like, required
+            x coordinates
+        ys : array_like, required
+            y coordinates
+        zs : array_like, optional
+            z coordinates of the points, positive upward, for a variable with
+            layers. The variable is interpolated linearly along zCoordinates
+            at each node and values beyond the bottom or the surface are
+            clamped. If not given, all the layers are returned.
+        time_chunk : int, optional
+            Number of time steps read at a time. Default is 100.
+
+        Returns
+        -------
+        da : xr.DataArray
+            Interpolated values with dimensions ([time,] point[, layer]).
+            NaN for points outside of the grid.
+        """
+        da = self.ds[var] if isinstance(var, str) else var
+        node_dim = self.Mesh2_node_x.dims[0]
+        layer_dim = 'nSCHISM_vgrid_layers'
+        has_layers = layer_dim in da.dims
+        if zs is not None and not has_layers:
+            raise ValueError(f"{da.name} does not have {layer_dim} to interpolate zs")
+        xs, ys = [np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (xs, ys)]
+        leading = [d for d in da.dims if d not in (node_dim, layer_dim)]
+        if len(leading) > 1:
+            raise ValueError("Only one dimension other than nodes and layers is "
+                             f"supported: {leading}")
+        core = [node_dim] + ([layer_dim] if has_layers else [])
+        da = da.transpose(*leading, *core)
+
+        # Work only with the nodes touching the points
+        matrix = self.interpolation_matrix(xs, ys).tocoo()
+        used, entry_node = np.unique(matrix.col, return_inverse=True)
+        n_points = xs.size
+        if zs is None:
+            weights = scipy.sparse.csr_matrix(
+                (matrix.data, (matrix.row, entry_node)), shape=(n_points, used.size))
+        else:
+            zs = np.broadcast_to(np.asarray(zs, dtype=np.float64), xs.shape)
+            z_entry = zs[matrix.row]
+            weights = scipy.sparse.csr_matrix(
+                (matrix.data, (matrix.row, np.arange(matrix.nnz))),
+                shape=(n_points, matrix.nnz))
+            da_z = self.ds.zCoordinates.transpose(*leading, *core)
+        outside = np.diff(matrix.tocsr().indptr) == 0
+
+        n_time = da.sizes[leading[0]] if leading else 1
+        keep_layers = has_layers and zs is None
+        n_layer = da.sizes[layer_dim] if keep_layers else 1
+        dtype = np.promote_types(da.dtype, np.float32)
+        out = np.full((n_time, n_points, n_layer), np.nan, dtype=dtype)
+        for start in range(0, n_time if used.size else 0, time_chunk):
+            sel = {node_dim: used}
+            if leading:
+                sel[leading[0]] = slice(start, start + time_chunk)
+            block = _as_time_node_layer(da.isel(sel).values, leading, has_layers)
+            n_block = block.shape[0]
+            if zs is None:
+                # (node, time * layer) so that one product covers the chunk
+                values = block.transpose(1, 0, 2).reshape(used.size, -1)
+                result = (weights @ values).reshape(n_points, n_block, n_layer)
+                out[start:start + n_block] = result.transpose(1, 0, 2)
+            else:
+                z = _as_time_node_layer(da_z.isel(sel).values, leading, has_layers)
+                values = _interpolate_vertical(z[:, entry_node], block[:, entry_node], z_entry)
+                out[start:start + n_block, :, 0] = (weights @ values.T).T
+        out[:, outside] = np.nan
+        if not keep_layers:
+            out = out[..., 0]
+        if not leading:
+            out = out[0]
+
+        dims = leading + ['point'] + ([layer_dim] if keep_layers else [])
+        coords = {d: da.coords[d] for d in leading if d in da.coords}
+        coords['x'] = ('point', xs)
+        coords['y'] = ('point', ys)
+        if zs is not None:
+            coords['z'] = ('point', zs)
+        return xr.DataArray(out, dims=dims, coords=coords,
+                            name=da.name, attrs=da.attrs)
+
     def subset(self, Polygon: Polygon):
         """ Subset the grid to the given polygon
 
@@ -174,40 +366,44 @@ class Grid(ux.Grid):
         # Find the elements that intersect the polygon
         elem_ilocs = self.elem_strtree.query(Polygon, predicate='contains')
 
-        face_subset = self.Mesh2_face_nodes[elem_ilocs, :]
+        face_nodes = self.face_nodes_zero_based()[elem_ilocs]
+        valid = face_nodes >= 0
+        node_subset = np.unique(face_nodes[valid])
+        # Inverse index from the original nodes to the 1-based subset nodes.
+        # Nodes outside of the subset map to 0.
+        new_node_index = np.zeros(self.Mesh2_node_x.size, dtype=np.int32)
+        new_node_index[node_subset] = np.arange(1, node_subset.size + 1,
+                                                dtype=np.int32)
+
+        # Integer indexers keep dask and lazily loaded variables lazy, so
+        # the time-varying variables are only read when they are used.
+        indexers = {'nSCHISM_hgrid_node': node_subset,
+                    'nSCHISM_hgrid_face': elem_ilocs}
+        has_edges = 'SCHISM_hgrid_edge_nodes' in self.ds
+        if has_edges:
+            # If the two nodes in an edge are in the node_subset, then the
+            # edge is in the subset
+            mesh2_edge_nodes = np.asarray(self.ds.SCHISM_hgrid_edge_nodes.values) - 1
+            in_subset = new_node_index[mesh2_edge_nodes] > 0
+            edge_subset = np.nonzero(in_subset.all(axis=1))[0]
+            indexers['nSCHISM_hgrid_edge'] = edge_subset
+        ds = self.ds.isel(indexers)
+
         fill_value = self.Mesh2_face_nodes.attrs['_FillValue']
-        node_subset = np.unique(face_subset.where(
-            face_subset > 0, drop=True).values).astype(int) - 1
-        # Find edges in the subset
-        # If the two nodes in an edge are in the node_subset, then the edge is in the subset
-        # Select the edges that are in the subset
-        mesh2_edge_nodes = self.ds.SCHISM_hgrid_edge_nodes.values - 1
-        edge_subset_mask = (np.isin(mesh2_edge_nodes[:, 0], node_subset) &
-                       np.isin(mesh2_edge_nodes[:, 1], node_subset))
-        edge_subset = mesh2_edge_nodes[edge_subset_mask, :]
-
-        # TODO Need to slice the edge variable as well.
-        ds = self.ds.sel(nSCHISM_hgrid_node=node_subset,
-                         nSCHISM_hgrid_face=elem_ilocs,
-                         nSCHISM_hgrid_edge=edge_subset_mask)
-        new_face_nodes = renumber_nodes(face_subset.values, fill_value)
-        da_new_face_nodes = xr.DataArray(new_face_nodes,
+        new_face_nodes = np.where(valid, new_node_index[face_nodes], fill_value)
+        da_new_face_nodes = xr.DataArray(new_face_nodes.astype(self.Mesh2_face_nodes.dtype),
                                          dims=('nSCHISM_hgrid_face', 'nMaxSCHISM_hgrid_face_nodes'),
                                          attrs=self.Mesh2_face_nodes.attrs)
         # Update the face-nodes connectivity variable
         ds.update({self.ds_var_names['Mesh2_face_nodes']: da_new_face_nodes})
 
         # Update the edge-nodes connectivity variable
-        # Replace node indices in the edge connectivity with a node index dictionary
-        node_dict = dict(zip(node_subset, np.arange(1, len(node_subset) + 1)),
-                         dtype=np.int32)
-        node_dict[-1] = -1
-        new_edge_nodes = np.array([[node_dict[n] for n in edge] for edge in edge_subset],
-                                  dtype=np.int32)
-        da_new_edge_nodes = xr.DataArray(new_edge_nodes,
-                                         dims=('nSCHISM_hgrid_edge', 'two'),
-                                         attrs=self.ds.SCHISM_hgrid_edge_nodes.attrs)
-        ds.update({self.ds_var_names['Mesh2_edge_nodes']: da_new_edge_nodes})
+        if has_edges:
+            new_edge_nodes = new_node_index[mesh2_edge_nodes[edge_subset]]
+            da_new_edge_nodes = xr.DataArray(new_edge_nodes,
+                                             dims=self.ds.SCHISM_hgrid_edge_nodes.dims,
+                                             attrs=self.ds.SCHISM_hgrid_edge_nodes.attrs)
+            ds.update({self.ds_var_names['Mesh2_edge_nodes']: da_new_edge_nodes})
 
         # Add the original node numbers as a variable
         da_original_node_indices = xr.DataArray(node_subset + 1,
@@ -220,86 +416,278 @@ class Grid(ux.Grid):
         ds.attrs['history'] = "Subset by suxarray"
 
         # Remove the face dimension
-        ds = ds.drop_vars("Mesh2_face_dimension")
+        ds = ds.drop_vars("Mesh2_face_dimension", errors='ignore')
 
         # Create a suxarray grid and return
-        grid_subset = Grid(ds)
+        grid_subset = Grid(ds, spatial_index_dir=self._spatial_index_dir)
         return grid_subset
 
-    def depth_average(self, var_name):
+    def depth_average(self, var_name, time_chunk=24):
         """ Calculate depth-average of a variable
 
+        The variable is integrated with the trapezoidal rule over the
+        layers from `bottom_index_node` to the surface, reading one chunk
+        along the leading (time) dimension at a time. Dry nodes, flagged by
+        `dryFlagNode`, are set to NaN.
+
         Parameters
         ----------
         var_name : str, required
             Variable name
+        time_chunk : int, optional
+            Number of time steps read at a time. Default is 24.
 
         Returns
         -------
         da : xr.DataArray
-            Depth averaged variable
+            Depth averaged variable in float32
         """
-        def _depth_average(v, zs, k, dry):
-            # Select the values with the last index from the bottom index array, k
-            z_bottom = np.take_along_axis(zs, k.reshape(1, -1, 1), axis=-1)
-            depth = zs[:, :, -1] - z_bottom.squeeze(axis=-1)
-            # Mask nan values
-            v = np.ma.masked_invalid(v, copy=False)
-            zs = np.ma.masked_invalid(zs, copy=False)
-            return np.trapz(v, x=zs, axis=-1) / depth
-
-        da_da = xr.apply_ufunc(_depth_average,
-                               self.ds[var_name],
-                               self.ds.zCoordinates,
-                               self.ds.bottom_index_node - 1,
-                               self.ds.dryFlagNode,
-                               input_core_dims=[["nSCHISM_vgrid_layers",],
-                                                ["nSCHISM_vgrid_layers",],
-                                                [],
-                                                []],
-                               dask='parallelized',
-                               output_dtypes=[float])
-        return da_da
+        node_dim = self.Mesh2_node_x.dims[0]
+        layer_dim = 'nSCHISM_vgrid_layers'
+        da = self.ds[var_name]
+        leading = [d for d in da.dims if d not in (node_dim, layer_dim)]
+        da = da.transpose(*leading, node_dim, layer_dim)
+        da_z = self.ds.zCoordinates.transpose(*leading, node_dim, layer_dim)
+        k_bottom = np.asarray(self.ds.bottom_index_node.values, dtype=np.int64) - 1
+        da_dry = self.ds.get('dryFlagNode')
+        if da_dry is not None:
+            da_dry = da_dry.transpose(*leading, node_dim)
+
+        n_time = da.sizes[leading[0]] if leading else 1
+        out = np.empty((n_time, da.sizes[node_dim]), dtype=np.float32)
+        for start in range(0, n_time, time_chunk):
+            sel = {leading[0]: slice(start, start + time_chunk)} if leading else {}
+            v = _as_float(da.isel(sel).values).reshape(-1, *da.shape[-2:])
+            z = _as_float(da_z.isel(sel).values).reshape(v.shape)
+            block = out[start:start + v.shape[0]]
+            _depth_average_kernel(v, z, k_bottom, block)
+            if da_dry is not None:
+                dry = np.asarray(da_dry.isel(sel).values).reshape(block.shape)
+                block[dry == 1] = np.nan
+        if not leading:
+            out = out[0]
+        coords = {d: da.coords[d] for d in leading if d in da.coords}
+        return xr.DataArray(out, dims=leading + [node_dim], coords=coords,
+                            name=da.name, attrs=da.attrs)
 
     def create_vtk_grid(self):
         """ Create a VTK grid from the grid object
 
+        The points and cells are set from NumPy buffers in one pass, without
+        copying them where the dtypes allow.
+
+        Returns
+        -------
+        vtk.vtkUnstructuredGrid
+        """
+        return _build_vtk_grid(self.vtk_geometry())
+
+    def vtk_geometry(self):
+        """ Arrays describing the grid as VTK cells
+
+        Returns
+        -------
+        geometry : dict
+            'points' with shape (n_nodes, 3), and 'offsets', 'connectivity'
+            and 'cell_types' of the cells
+        """
+        points = np.zeros((self.Mesh2_node_x.size, 3), dtype=np.float64)
+        points[:, 0] = self.Mesh2_node_x.values
+        points[:, 1] = self.Mesh2_node_y.values
+        face_nodes = self.face_nodes_zero_based()
+        valid = face_nodes >= 0
+        n_nodes = valid.sum(axis=1)
+        offsets = np.zeros(n_nodes.size + 1, dtype=_VTK_ID_DTYPE)
+        np.cumsum(n_nodes, out=offsets[1:])
+        cell_types = np.select([n_nodes == 3, n_nodes == 4],
+                               [VTK_TRIANGLE, VTK_QUAD], VTK_POLYGON).astype(np.uint8)
+        return {'points': points,
+                'offsets': offsets,
+                'connectivity': face_nodes[valid].astype(_VTK_ID_DTYPE),
+                'cell_types': cell_types}
+
+    def write_vtk_time_series(self, var_names, path_pvd, n_workers=None):
+        """ Write node variables to a VTU file per time step and a PVD file
+
+        The grid geometry is sent to each worker process once, and the time
+        steps are written in parallel. The VTU files are named after the PVD
+        file with the time step index, e.g. out_00000.vtu for out.pvd.
+
         Parameters
         ----------
-        var_name : str, required
-            Variable name
+        var_names : str or list of str, required
+            Names of variables with dimensions (time, node)
+        path_pvd : str, required
+            Path of the PVD file to write
+        n_workers : int, optional
+            Number of worker processes. Default is the number of CPUs.
+
+        Returns
+        -------
+        paths : list of str
+            Paths of the VTU files
+        """
+        if isinstance(var_names, str):
+            var_names = [var_names]
+        node_dim = self.Mesh2_node_x.dims[0]
+        das = []
+        for var_name in var_names:
+            da = self.ds[var_name]
+            if da.ndim != 2 or node_dim not in da.dims:
+                raise ValueError(f"{var_name} is not a (time, node) variable: {da.dims}")
+            das.append(da.transpose(..., node_dim))
+        time_dim = das[0].dims[0]
+        steps = ({name: da.isel({time_dim: i}) for name, da in zip(var_names, das)}
+                 for i in range(das[0].sizes[time_dim]))
+        return _write_vtk_steps(self.vtk_geometry(), steps,
+                                _pvd_timesteps(das[0], time_dim), path_pvd, n_workers)
+
+    def vtk_geometry_3d(self):
+        """ Arrays describing the layered grid as VTK prism cells
+
+        Every node has a point at every level, numbered level by level, so
+        the point of node i at level k is k * n_nodes + i. Cells span two
+        neighboring levels above the bottom of a face, which is the highest
+        `bottom_index_node` of its nodes: wedges for triangles and hexahedra
+        for quads.
+
+        Returns
+        -------
+        geometry : dict
+            'offsets', 'connectivity' and 'cell_types' of the cells. The
+            points depend on zCoordinates, see `vtk_points_3d`.
+        """
+        face_nodes = self.face_nodes_zero_based()
+        n_per_face = (face_nodes >= 0).sum(axis=1)
+        if n_per_face.max() > 4:
+            raise ValueError("Only triangles and quads can be extruded")
+        n_node = self.Mesh2_node_x.size
+        n_level = self.ds.sizes['nSCHISM_vgrid_layers']
+        k_node = np.asarray(self.ds.bottom_index_node.values, dtype=np.int64) - 1
+        k_face = np.where(face_nodes >= 0, k_node[face_nodes], -1).max(axis=1)
+        n_cells = np.clip(n_level - 1 - k_face, 0, None)
+        cell_face = np.repeat(np.arange(face_nodes.shape[0]), n_cells)
+        level = (np.arange(n_cells.sum())
+                 - np.repeat(np.cumsum(n_cells) - n_cells, n_cells)
+                 + np.repeat(k_face, n_cells))
+        nodes = face_nodes[cell_face]
+        bottom = level[:, None] * n_node + nodes
+        top = bottom + n_node
+        is_tri = n_per_face[cell_face] == 3
+        # Both VTK wedges and hexahedra list the counterclockwise bottom
+        # face first, then the top face
+        cells = np.where(is_tri[:, None],
+                         np.concatenate((bottom[:, :3], top[:, :3], top[:, :2]), axis=1),
+                         np.concatenate((bottom, top), axis=1))
+        n_points = np.where(is_tri, 6, 8)
+        offsets = np.zeros(cell_face.size + 1, dtype=_VTK_ID_DTYPE)
+        np.cumsum(n_points, out=offsets[1:])
+        valid = np.arange(8)[None, :] < n_points[:, None]
+        return {'offsets': offsets,
+                'connectivity': cells[valid].astype(_VTK_ID_DTYPE),
+                'cell_types': np.where(is_tri, VTK_WEDGE, VTK_HEXAHEDRON).astype(np.uint8)}
+
+    def vtk_points_3d(self, z):
+        """ Points of the layered grid for one set of zCoordinates
+
+        Parameters
+        ----------
+        z : array_like, required
+            Elevations with shape (node, layer). Values below the bottom are
+            replaced by the bottom elevation.
+
+        Returns
+        -------
+        points : np.ndarray
+            Points with shape (n_layers * n_nodes, 3)
+        """
+        z = self._mask_below_bottom(z, fill='bottom')
+        n_node, n_level = z.shape
+        points = np.empty((n_level, n_node, 3), dtype=np.float64)
+        points[..., 0] = self.Mesh2_node_x.values
+        points[..., 1] = self.Mesh2_node_y.values
+        points[..., 2] = z.T
+        return points.reshape(-1, 3)
+
+    def _mask_below_bottom(self, values, fill):
+        """ Replace (node, layer) values below the bottom by NaN or the bottom """
+        values = np.array(values, dtype=np.float64)
+        k_node = np.asarray(self.ds.bottom_index_node.values, dtype=np.int64) - 1
+        below = np.arange(values.shape[1])[None, :] < k_node[:, None]
+        if fill == 'bottom':
+            bottom = values[np.arange(values.shape[0]), k_node]
+            values[below] = np.broadcast_to(bottom[:, None], values.shape)[below]
+        else:
+            values[below] = np.nan
+        return values
+
+    def create_vtk_grid_3d(self, time_index=0):
+        """ Create a layered VTK grid at a time step of zCoordinates
+
+        Parameters
+        ----------
+        time_index : int, optional
+            Time step of zCoordinates. Default is 0.
+
         Returns
         -------
         vtk.vtkUnstructuredGrid
         """
-        # Get he number of nodes
-        n_points = self.nMesh2_node
-        # Create an unstructured grid object
-        vtkgrid = vtk.vtkUnstructuredGrid()
-
-        # Create an empty VTK points (or nodes)
-        points = vtk.vtkPoints()
-        points.SetNumberOfPoints(n_points)
-
-        v_set_point = np.vectorize(lambda i, x, y: points.SetPoint(i, x, y, 0.))
-        v_set_point(np.arange(n_points), self.Mesh2_node_x, self.Mesh2_node_y)
-        vtkgrid.SetPoints(points)
-
-        # Create faces (or cells)
-        # Add VTK cells to the grid
-        def insert_cell(face):
-            if face[-1] < 0:
-                vtkgrid.InsertNextCell(VTK_TRIANGLE, 3, face[:3])
-            else:
-                vtkgrid.InsertNextCell(VTK_QUAD, 4, face[:4])
+        geometry = self.vtk_geometry_3d()
+        geometry['points'] = self.vtk_points_3d(self._zcoords_at(time_index))
+        return _build_vtk_grid(geometry)
+
+    def _zcoords_at(self, time_index):
+        node_dim = self.Mesh2_node_x.dims[0]
+        da_z = self.ds.zCoordinates.transpose(..., node_dim, 'nSCHISM_vgrid_layers')
+        if da_z.ndim == 3:
+            da_z = da_z.isel({da_z.dims[0]: time_index})
+        return da_z.values
+
+    def write_vtk_time_series_3d(self, var_names, path_pvd, n_workers=None):
+        """ Write layered variables to a VTU file per time step and a PVD file
+
+        The connectivity is sent to each worker process once, and only the
+        points, from zCoordinates, and the variables change between time
+        steps. Values below the bottom are written as NaN.
+
+        Parameters
+        ----------
+        var_names : str or list of str, required
+            Names of variables with dimensions (time, node, layer)
+        path_pvd : str, required
+            Path of the PVD file to write
+        n_workers : int, optional
+            Number of worker processes. Default is the number of CPUs.
 
-        [insert_cell(face) for face in (self.Mesh2_face_nodes - 1).values]
-        # xr.apply_ufunc(insert_cell, self.Mesh2_face_nodes - 1,
-        #                input_core_dims=[['nMaxSCHISM_hgrid_face_nodes',]],
-        #                dask='parallelized',
-        #                vectorize=True,
-        #                output_dtypes=[None])
-        return vtkgrid
+        Returns
+        -------
+        paths : list of str
+            Paths of the VTU files
+        """
+        if isinstance(var_names, str):
+            var_names = [var_names]
+        node_dim = self.Mesh2_node_x.dims[0]
+        layer_dim = 'nSCHISM_vgrid_layers'
+        das = []
+        for var_name in var_names:
+            da = self.ds[var_name]
+            if da.ndim != 3 or node_dim not in da.dims or layer_dim not in da.dims:
+                raise ValueError(f"{var_name} is not a (time, node, layer) variable: {da.dims}")
+            das.append(da.transpose(..., node_dim, layer_dim))
+        time_dim = das[0].dims[0]
+
+        def steps():
+            for i in range(das[0].sizes[time_dim]):
+                step = {'points': self.vtk_points_3d(self._zcoords_at(i))}
+                for name, da in zip(var_names, das):
+                    values = self._mask_below_bottom(da.isel({time_dim: i}).values, fill='nan')
+                    # Points are numbered level by level
+                    step[name] = values.T.ravel()
+                yield step
+
+        return _write_vtk_steps(self.vtk_geometry_3d(), steps(),
+                                _pvd_timesteps(das[0], time_dim), path_pvd, n_workers)
 
     def read_vgrid(self, path_vgrid):
         """ Read a SCHISM vgrid file """
@@ -333,18 +721,437 @@ class Grid(ux.Grid):
         """ Compute face areas
 
         Though uxarray has its own area calculation, it does not work at the
-        moment for a hybrid grid. This function builds Shapley polygons for
-        faces (elements) and calculates their areas using Shaplely, overriding
-        the uxarray's area calculation.
+        moment for a hybrid grid. This function takes the areas from the
+        spatial index of the grid, overriding the uxarray's area calculation.
 
         Returns
         -------
         da_face_areas : xr.DataArray
             Face areas
         """
-        ret = xr.apply_ufunc(lambda v: np.vectorize(lambda x: x.area)(
-            v), self.face_polygons, dask="parallelized", output_dtypes=float)
-        return ret
+        return xr.DataArray(np.asarray(self.element_locator.face_areas),
+                            dims=self.Mesh2_face_nodes.dims[:1])
+
+
+class ElementLocator:
+    """ Point-in-element locator working on raw node and face arrays
+
+    Faces are split into triangles fanning out from their first node, and
+    the triangles are registered by their bounding boxes in a hierarchy of
+    uniform bin grids. The bins of level `(lx, ly)` are `base_size * 2**lx`
+    wide and `base_size * 2**ly` high, where `base_size` is the smallest
+    triangle extent, and a triangle goes to the finest level whose bins are
+    at least as wide and as high as it, so it overlaps at most four bins
+    there. The number of triangles per bin then stays small however much
+    the element size and aspect ratio vary across the mesh.
+    Only occupied bins are stored, as sorted keys. A query looks up the
+    bin of each point on every level and runs vectorized barycentric tests
+    on the triangles in those bins only, at most `max_pairs` point and
+    triangle pairs at a time. The fan split assumes convex faces, which
+    holds for SCHISM quads.
+
+    The index also holds the centroids, bounding boxes and areas of the
+    faces. It can be saved to a directory of .npy files and loaded back
+    memory-mapped, see `cached`.
+
+    Parameters
+    ----------
+    node_x : array_like, required
+        x coordinates of the nodes
+    node_y : array_like, required
+        y coordinates of the nodes
+    face_nodes : array_like, required
+        0-based face-node connectivity padded with -1
+    """
+    #: Tolerance of the barycentric coordinates for a point to be inside
+    tolerance = 1e-10
+    #: Maximum number of point and triangle pairs tested at a time
+    max_pairs = 1 << 18
+    #: Smallest bin size relative to the extent of the mesh, which bounds
+    #: the bin keys
+    min_relative_bin_size = 2. ** -24
+    #: Version of the saved index. Bump it when the layout changes.
+    version = 2
+    _arrays = ('tri_face', 'tri_cols', 'tri_nodes', 'levels', 'level_nx',
+               'level_ny', 'level_offset', 'bin_keys', 'bin_start', 'bin_tris',
+               'face_centroids', 'face_bboxes', 'face_areas')
+    _scalars = ('n_max_face_nodes', 'x0', 'y0', 'base_size')
+
+    def __init__(self, node_x, node_y, face_nodes):
+        self.node_x = np.asarray(node_x, dtype=np.float64)
+        self.node_y = np.asarray(node_y, dtype=np.float64)
+        face_nodes = np.asarray(face_nodes)
+        self.n_max_face_nodes = face_nodes.shape[1]
+        self.tri_face, self.tri_cols = _fan_triangles(face_nodes)
+        self.tri_nodes = face_nodes[self.tri_face[:, None], self.tri_cols]
+        self._build_face_geometry(face_nodes)
+        self._build_bins()
+
+    def _build_face_geometry(self, face_nodes):
+        n_face = face_nodes.shape[0]
+        x = self.node_x[self.tri_nodes]
+        y = self.node_y[self.tri_nodes]
+        # Signed areas of the fan triangles add up to the shoelace area
+        tri_areas = 0.5 * ((x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0])
+                           - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0]))
+        areas = np.bincount(self.tri_face, weights=tri_areas, minlength=n_face)
+        cx = np.bincount(self.tri_face, weights=tri_areas * x.mean(axis=1),
+                         minlength=n_face)
+        cy = np.bincount(self.tri_face, weights=tri_areas * y.mean(axis=1),
+                         minlength=n_face)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.face_centroids = np.stack((cx / areas, cy / areas), axis=-1)
+        self.face_areas = np.abs(areas)
+        valid = face_nodes >= 0
+        fx = self.node_x[face_nodes]
+        fy = self.node_y[face_nodes]
+        self.face_bboxes = np.stack(
+            (np.where(valid, fx, np.inf).min(axis=1),
+             np.where(valid, fy, np.inf).min(axis=1),
+             np.where(valid, fx, -np.inf).max(axis=1),
+             np.where(valid, fy, -np.inf).max(axis=1)), axis=-1)
+
+    @staticmethod
+    def key(node_x, node_y, face_nodes):
+        """ Hash of the node and face arrays identifying a saved index """
+        h = hashlib.sha1(str(ElementLocator.version).encode())
+        for a in (node_x, node_y, face_nodes):
+            a = np.ascontiguousarray(a)
+            h.update(f"{a.dtype.str}{a.shape}".encode())
+            h.update(a)
+        return h.hexdigest()
+
+    def save(self, path):
+        """ Save the index to a directory
+
+        The directory is written under a temporary name and renamed, so
+        concurrent readers never see a partial index.
+
+        Parameters
+        ----------
+        path : str, required
+            Directory to create
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, prefix='.sindex-')
+        try:
+            for name in self._arrays:
+                np.save(os.path.join(tmp, name + '.npy'), getattr(self, name))
+            with open(os.path.join(tmp, 'index.json'), 'w') as f:
+                json.dump({name: getattr(self, name) for name in self._scalars}, f)
+            os.rename(tmp, path)
+        except OSError:
+            # Another process got there first, or the directory is not
+            # writable
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+
+    @classmethod
+    def load(cls, path, node_x, node_y):
+        """ Load an index saved by `save`, memory-mapping its arrays
+
+        Parameters
+        ----------
+        path : str, required
+            Directory of the saved index
+        node_x : array_like, required
+            x coordinates of the nodes
+        node_y : array_like, required
+            y coordinates of the nodes
+
+        Returns
+        -------
+        ElementLocator
+        """
+        locator = cls.__new__(cls)
+        locator.node_x = np.asarray(node_x, dtype=np.float64)
+        locator.node_y = np.asarray(node_y, dtype=np.float64)
+        with open(os.path.join(path, 'index.json')) as f:
+            locator.__dict__.update(json.load(f))
+        for name in cls._arrays:
+            setattr(locator, name,
+                    np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+        return locator
+
+    @classmethod
+    def cached(cls, node_x, node_y, face_nodes, index_dir):
+        """ Load the index of a grid from a directory, building it if needed
+
+        Parameters
+        ----------
+        node_x : array_like, required
+            x coordinates of the nodes
+        node_y : array_like, required
+            y coordinates of the nodes
+        face_nodes : array_like, required
+            0-based face-node connectivity padded with -1
+        index_dir : str, required
+            Directory holding saved indices
+
+        Returns
+        -------
+        ElementLocator
+        """
+        path = os.path.join(index_dir,
+                            'sindex_' + cls.key(node_x, node_y, face_nodes))
+        if os.path.isdir(path):
+            return cls.load(path, node_x, node_y)
+        locator = cls(node_x, node_y, face_nodes)
+        try:
+            locator.save(path)
+        except OSError as e:
+            logger.warning("Could not save the spatial index to %s: %s", path, e)
+        return locator
+
+    def _build_bins(self):
+        x = self.node_x[self.tri_nodes]
+        y = self.node_y[self.tri_nodes]
+        xmin, xmax = x.min(axis=1), x.max(axis=1)
+        ymin, ymax = y.min(axis=1), y.max(axis=1)
+        self.x0, self.y0 = float(xmin.min()), float(ymin.min())
+        width = float(xmax.max()) - self.x0
+        height = float(ymax.max()) - self.y0
+        extent = np.stack((xmax - xmin, ymax - ymin), axis=-1)
+        positive = extent[extent > 0.]
+        self.base_size = max(float(positive.min()) if positive.size else 1.,
+                             max(width, height) * self.min_relative_bin_size)
+        # The finest level whose bins cover the bounding box of a triangle,
+        # give or take rounding; a bounding box a little larger than the
+        # bins only overlaps more of them
+        tri_level = np.ceil(np.log2(np.maximum(extent, self.base_size)
+                                    / self.base_size) - 1e-6).astype(np.int64)
+        self.levels, j = np.unique(tri_level, axis=0, return_inverse=True)
+        j = j.ravel()
+        sizes = self.base_size * np.exp2(self.levels)
+        self.level_nx = (width // sizes[:, 0]).astype(np.int64) + 1
+        self.level_ny = (height // sizes[:, 1]).astype(np.int64) + 1
+        self.level_offset = np.zeros(len(self.levels), dtype=np.int64)
+        np.cumsum((self.level_nx * self.level_ny)[:-1], out=self.level_offset[1:])
+        ix0 = self._bin_of(xmin, self.x0, sizes[j, 0])
+        ix1 = self._bin_of(xmax, self.x0, sizes[j, 0])
+        iy0 = self._bin_of(ymin, self.y0, sizes[j, 1])
+        iy1 = self._bin_of(ymax, self.y0, sizes[j, 1])
+        # Register each triangle in every bin its bounding box overlaps on
+        # its level
+        nbx = ix1 - ix0 + 1
+        counts = nbx * (iy1 - iy0 + 1)
+        tris = np.repeat(np.arange(len(counts)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        keys = (self.level_offset[j[tris]]
+                + (iy0[tris] + local // nbx[tris]) * self.level_nx[j[tris]]
+                + ix0[tris] + local % nbx[tris])
+        # A stable sort keeps the triangles in a bin in the order of faces
+        order = np.argsort(keys, kind='stable')
+        self.bin_tris = tris[order]
+        self.bin_keys, counts = np.unique(keys[order], return_counts=True)
+        self.bin_start = np.zeros(len(self.bin_keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.bin_start[1:])
+
+    @staticmethod
+    def _bin_of(v, origin, size):
+        return np.floor((v - origin) / size).astype(np.int64)
+
+    def locate(self, xs, ys, chunk_size=65536):
+        """ Find the elements containing points and their weights
+
+        Parameters
+        ----------
+        xs : array_like, required
+            x coordinates
+        ys : array_like, required
+            y coordinates
+        chunk_size : int, optional
+            Number of points looked up at a time. Default is 65536.
+
+        Returns
+        -------
+        faces : np.ndarray
+            0-based element indices, -1 for points outside of the grid
+        weights : np.ndarray
+            Interpolation weights with shape (n_points, n_max_face_nodes),
+            NaN for points outside of the grid
+        """
+        xs, ys = np.broadcast_arrays(np.atleast_1d(np.asarray(xs, dtype=np.float64)),
+                                     np.atleast_1d(np.asarray(ys, dtype=np.float64)))
+        xs, ys = xs.ravel(), ys.ravel()
+        n_points = xs.size
+        faces = np.full(n_points, -1, dtype=np.int64)
+        weights = np.full((n_points, self.n_max_face_nodes), np.nan)
+        for start in range(0, n_points, chunk_size):
+            sl = slice(start, start + chunk_size)
+            self._locate_chunk(xs[sl], ys[sl], faces[sl], weights[sl])
+        return faces, weights
+
+    def _candidates(self, xs, ys):
+        """ Start and count in `bin_tris` of the bin of each point per level """
+        starts = np.zeros((xs.size, len(self.levels)), dtype=np.int64)
+        counts = np.zeros_like(starts)
+        for j, (lx, ly) in enumerate(self.levels):
+            ix = self._bin_of(xs, self.x0, self.base_size * 2. ** int(lx))
+            iy = self._bin_of(ys, self.y0, self.base_size * 2. ** int(ly))
+            in_grid = ((ix >= 0) & (ix < self.level_nx[j])
+                       & (iy >= 0) & (iy < self.level_ny[j]))
+            keys = self.level_offset[j] + iy * self.level_nx[j] + ix
+            pos = np.minimum(np.searchsorted(self.bin_keys, keys), len(self.bin_keys) - 1)
+            found = in_grid & (self.bin_keys[pos] == keys)
+            starts[:, j] = self.bin_start[pos]
+            counts[:, j] = np.where(found, self.bin_start[pos + 1] - starts[:, j], 0)
+        return starts, counts
+
+    def _locate_chunk(self, xs, ys, faces, weights):
+        if not len(self.bin_keys):
+            return
+        starts, counts = self._candidates(xs, ys)
+        # Split the points so that a batch has at most max_pairs pairs,
+        # or a single point
+        n_pairs = np.cumsum(counts.sum(axis=1))
+        begin = 0
+        while begin < xs.size:
+            done = n_pairs[begin - 1] if begin else 0
+            end = max(int(np.searchsorted(n_pairs, done + self.max_pairs, side='right')),
+                      begin + 1)
+            sl = slice(begin, end)
+            self._locate_batch(xs[sl], ys[sl], starts[sl].ravel(), counts[sl].ravel(),
+                               faces[sl], weights[sl])
+            begin = end
+
+    def _locate_batch(self, xs, ys, starts, counts, faces, weights):
+        # Expand to (point, candidate triangle) pairs, with the levels of a
+        # point next to each other
+        n_levels = len(self.levels)
+        pts = np.repeat(np.arange(xs.size * n_levels) // n_levels, counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tris = self.bin_tris[np.repeat(starts, counts) + local]
+        lam = self._barycentric(tris, xs[pts], ys[pts])
+        hits = np.nonzero(np.all(lam >= -self.tolerance, axis=1))[0]
+        # The lowest triangle containing a point wins
+        hits = hits[np.lexsort((tris[hits], pts[hits]))]
+        found, first = np.unique(pts[hits], return_index=True)
+        hits = hits[first]
+        faces[found] = self.tri_face[tris[hits]]
+        weights[found] = 0.
+        weights[found[:, None], self.tri_cols[tris[hits]]] = lam[hits]
+
+    def _barycentric(self, tris, x, y):
+        nodes = self.tri_nodes[tris]
+        xa, ya = self.node_x[nodes[:, 0]], self.node_y[nodes[:, 0]]
+        x1, y1 = self.node_x[nodes[:, 1]] - xa, self.node_y[nodes[:, 1]] - ya
+        x2, y2 = self.node_x[nodes[:, 2]] - xa, self.node_y[nodes[:, 2]] - ya
+        xp, yp = x - xa, y - ya
+        with np.errstate(divide='ignore', invalid='ignore'):
+            det = x1 * y2 - x2 * y1
+            l1 = (xp * y2 - x2 * yp) / det
+            l2 = (x1 * yp - xp * y1) / det
+        return np.stack((1. - l1 - l2, l1, l2), axis=-1)
+
+
+def _as_float(values):
+    """ Return an array as is if it is floating point, or in float64 """
+    values = np.asarray(values)
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+    return values
+
+
+@numba.njit(cache=True)
+def _depth_average_kernel(v, z, k_bottom, out):
+    """ Trapezoidal depth average over the wet layers of each column
+
+    Parameters
+    ----------
+    v : np.ndarray
+        Values with shape (time, node, layer)
+    z : np.ndarray
+        Elevations of the layers with the same shape as `v`
+    k_bottom : np.ndarray
+        0-based bottom layer index of each node
+    out : np.ndarray
+        Output with shape (time, node)
+    """
+    n_time, n_node, n_layer = v.shape
+    top = n_layer - 1
+    for t in range(n_time):
+        for i in range(n_node):
+            kb = k_bottom[i]
+            depth = z[t, i, top] - z[t, i, kb]
+            if depth > 0.:
+                total = 0.
+                for k in range(kb, top):
+                    total += 0.5 * (v[t, i, k] + v[t, i, k + 1]) * (z[t, i, k + 1] - z[t, i, k])
+                out[t, i] = total / depth
+            else:
+                out[t, i] = v[t, i, top]
+
+
+def _as_time_node_layer(values, leading, has_layers):
+    """ Reshape a block of values to (time, node, layer) in float64 """
+    values = np.asarray(values, dtype=np.float64)
+    if not leading:
+        values = values[None]
+    if not has_layers:
+        values = values[..., None]
+    return values
+
+
+def _interpolate_vertical(z, v, zt):
+    """ Interpolate profiles linearly to target elevations
+
+    Parameters
+    ----------
+    z : np.ndarray
+        Elevations of the layers with shape (..., n, n_layers), ascending
+        from the bottom. NaN below the bottom.
+    v : np.ndarray
+        Values with the same shape as `z`
+    zt : np.ndarray
+        Target elevations with shape (n,)
+
+    Returns
+    -------
+    np.ndarray
+        Values with shape (..., n). Values beyond the bottom or the surface
+        are clamped.
+    """
+    n_layers = z.shape[-1]
+    valid = ~np.isnan(z)
+    bottom = np.argmax(valid, axis=-1)
+    below = (z < zt[:, None]).sum(axis=-1)
+    lo = np.clip(bottom + below - 1, bottom, n_layers - 1)[..., None]
+    hi = np.clip(bottom + below, bottom, n_layers - 1)[..., None]
+    z_lo = np.take_along_axis(z, lo, axis=-1)[..., 0]
+    z_hi = np.take_along_axis(z, hi, axis=-1)[..., 0]
+    v_lo = np.take_along_axis(v, lo, axis=-1)[..., 0]
+    v_hi = np.take_along_axis(v, hi, axis=-1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(z_hi > z_lo, (zt - z_lo) / (z_hi - z_lo), 0.)
+    frac = np.clip(frac, 0., 1.)
+    return v_lo + frac * (v_hi - v_lo)
+
+
+def _fan_triangles(face_nodes):
+    """ Split padded faces into triangles fanning out from the first node
+
+    Returns
+    -------
+    tri_face : np.ndarray
+        Face index of each triangle, in ascending order
+    tri_cols : np.ndarray
+        Columns of the face-node connectivity forming each triangle
+    """
+    n_nodes = (face_nodes >= 0).sum(axis=1)
+    tri_face = []
+    tri_cols = []
+    for j in range(1, face_nodes.shape[1] - 1):
+        faces = np.nonzero(n_nodes > j + 1)[0]
+        tri_face.append(faces)
+        tri_cols.append(np.broadcast_to(np.array([0, j, j + 1], dtype=np.int8),
+                                        (faces.size, 3)))
+    tri_face = np.concatenate(tri_face)
+    tri_cols = np.concatenate(tri_cols)
+    order = np.argsort(tri_face, kind='stable')
+    return tri_face[order], tri_cols[order]
 
 
 def add_np_array_to_vtk(vtkgrid, np_array, name):
@@ -357,6 +1164,133 @@ def add_np_array_to_vtk(vtkgrid, np_array, name):
     vtkgrid.GetPointData().AddArray(array)
 
 
+# ---------------------------------------------------------------------------
+# VTK time series
+# ---------------------------------------------------------------------------
+
+_VTK_ID_DTYPE = numpy_support.get_vtk_to_numpy_typemap()[vtk.VTK_ID_TYPE]
+
+# Geometry of the grid in a VTK worker process, set by _init_vtk_worker
+_worker_geometry = None
+
+
+def _build_vtk_grid(geometry):
+    """ Build a vtkUnstructuredGrid from the arrays of `Grid.vtk_geometry`
+    """
+    vtkgrid = vtk.vtkUnstructuredGrid()
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(geometry['points'], deep=False))
+    vtkgrid.SetPoints(points)
+    cells = vtk.vtkCellArray()
+    cells.SetData(numpy_support.numpy_to_vtkIdTypeArray(geometry['offsets'], deep=False),
+                  numpy_support.numpy_to_vtkIdTypeArray(geometry['connectivity'], deep=False))
+    cell_types = numpy_support.numpy_to_vtk(geometry['cell_types'], deep=False,
+                                            array_type=VTK_UNSIGNED_CHAR)
+    # numpy_to_vtk keeps references to the NumPy buffers it wraps
+    vtkgrid.SetCells(cell_types, cells)
+    return vtkgrid
+
+
+def _init_vtk_worker(geometry):
+    global _worker_geometry
+    _worker_geometry = geometry
+
+
+def _write_vtk_step(fname, point_data, points=None):
+    """ Write one time step in a worker with the shared geometry """
+    geometry = _worker_geometry
+    if points is not None:
+        geometry = dict(geometry, points=points)
+    vtkgrid = _build_vtk_grid(geometry)
+    for name, values in point_data.items():
+        add_np_array_to_vtk(vtkgrid, np.ascontiguousarray(values), name)
+    write_vtk_grid(vtkgrid, fname)
+    return fname
+
+
+def _write_vtk_steps(geometry, steps, timesteps, path_pvd, n_workers=None):
+    """ Write VTU files of time steps in parallel and a PVD file listing them
+
+    Parameters
+    ----------
+    geometry : dict
+        Geometry shared by all the steps, see `Grid.vtk_geometry`
+    steps : iterable of dict
+        Point data of each step by name. An optional 'points' entry
+        replaces the points of the geometry. The steps are consumed one at
+        a time, so a generator reading each step keeps memory bounded.
+    timesteps : array_like
+        Time of each step for the PVD file
+    path_pvd : str
+        Path of the PVD file
+    n_workers : int, optional
+        Number of worker processes. Default is the number of CPUs.
+
+    Returns
+    -------
+    paths : list of str
+        Paths of the VTU files
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_vtk_worker,
+                                   initargs=(geometry,))
+    else:
+        _init_vtk_worker(geometry)
+        pool = ThreadPoolExecutor(max_workers=1)
+    stem = os.path.splitext(path_pvd)[0]
+    paths = []
+    pending = deque()
+    with pool:
+        for i, step in enumerate(steps):
+            # Bound the number of steps held in memory
+            while len(pending) >= 2 * n_workers:
+                pending.popleft().result()
+            fname = f"{stem}_{i:05d}.vtu"
+            step = {name: np.asarray(values) for name, values in step.items()}
+            points = step.pop('points', None)
+            pending.append(pool.submit(_write_vtk_step, fname, step, points))
+            paths.append(fname)
+        for future in pending:
+            future.result()
+    write_pvd(path_pvd, paths, timesteps)
+    return paths
+
+
+def _pvd_timesteps(da, time_dim):
+    """ Time steps for a PVD file, in seconds from the first one for dates """
+    if time_dim not in da.coords:
+        return np.arange(da.sizes[time_dim], dtype=np.float64)
+    times = da.coords[time_dim].values
+    if np.issubdtype(times.dtype, np.datetime64):
+        return (times - times[0]) / np.timedelta64(1, 's')
+    return times.astype(np.float64)
+
+
+def write_pvd(fname, paths, timesteps):
+    """ Write a ParaView collection file of time steps
+
+    Parameters
+    ----------
+    fname : str
+        PVD file name to write
+    paths : list of str
+        Data files of the time steps
+    timesteps : array_like
+        Time of each step
+    """
+    dirname = os.path.dirname(os.path.abspath(fname))
+    with open(fname, 'w') as f:
+        f.write('<?xml version="1.0"?>\n'
+                '<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">\n'
+                '  <Collection>\n')
+        for path, timestep in zip(paths, timesteps):
+            rel = os.path.relpath(os.path.abspath(path), dirname)
+            f.write(f'    <DataSet timestep="{float(timestep)!r}" group="" part="0"'
+                    f' file="{rel}"/>\n')
+        f.write('  </Collection>\n</VTKFile>\n')
+
+
 def write_vtk_grid(vtkgrid, fname):
     """ Write a vtk unstructured grid file
 
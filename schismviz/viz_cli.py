@@ -96,7 +96,8 @@ _SHOW = click.option(
 _TITLE = click.option("--title", default=None, help="Dashboard title shown in the browser.")
 _HGRID = click.option(
     "--hgrid", default=None, type=click.Path(),
-    help="Path to hgrid.gr3 SCHISM mesh file.",
+    help="Path to hgrid.gr3 SCHISM mesh file, or a binary .npz mesh "
+    "(e.g. outputs/local_to_global_cache.npz of an uncombined run).",
 )
 _WIDTH = click.option(
     "--width", default=None, type=int,
@@ -42,6 +42,15 @@ def _open_mfdataset(pattern: str) -> xr.Dataset:
 
 
 def _read_mesh(hgrid: str):
+    """Read a SCHISM mesh from ``hgrid.gr3`` or a binary ``.npz`` mesh.
+
+    ``.npz`` meshes are written from uncombined outputs (see
+    :func:`schismviz.schout_reader.read_mesh_npz`) and load without
+    parsing text.
+    """
+    if str(hgrid).endswith(".npz"):
+        from .schout_reader import read_mesh_npz
+        return read_mesh_npz(hgrid)
     from schimpy import schism_mesh
     return schism_mesh.read_mesh(hgrid)
 
@@ -91,7 +100,7 @@ def mesh_view_panel(hgrid: str, width: int = 800, height: int = 400,
     Parameters
     ----------
     hgrid:
-        Path to ``hgrid.gr3`` mesh file.
+        Path to ``hgrid.gr3`` mesh file, or a binary ``.npz`` mesh.
     width, height:
         Dimensions of the rendered plot in pixels.
     title:
@@ -149,7 +158,7 @@ def elevation_animation_panel(hgrid: str, out2d_pattern: str,
     Parameters
     ----------
     hgrid:
-        Path to ``hgrid.gr3`` mesh file.
+        Path to ``hgrid.gr3`` mesh file, or a binary ``.npz`` mesh.
     out2d_pattern:
         Glob pattern for ``out2d_*.nc`` output files.
     width, height:
@@ -218,7 +227,7 @@ def var_animation_panel(hgrid: str, var_pattern: str, varname: str = "salinity",
     Parameters
     ----------
     hgrid:
-        Path to ``hgrid.gr3`` mesh file.
+        Path to ``hgrid.gr3`` mesh file, or a binary ``.npz`` mesh.
     var_pattern:
         Glob pattern for the variable nc files (e.g. ``salinity_*.nc``).
     varname:
@@ -375,7 +384,7 @@ def var_velocity_panel(hgrid: str, out2d_pattern: str, var_pattern: str,
     Parameters
     ----------
     hgrid:
-        Path to ``hgrid.gr3`` mesh file.
+        Path to ``hgrid.gr3`` mesh file, or a binary ``.npz`` mesh.
     out2d_pattern:
         Glob pattern for ``out2d_*.nc`` files.
     var_pattern:
@@ -503,7 +512,7 @@ def var_velocity_level_panel(hgrid: str, out2d_pattern: str,
     Parameters
     ----------
     hgrid:
-        Path to ``hgrid.gr3`` mesh file.
+        Path to ``hgrid.gr3`` mesh file, or a binary ``.npz`` mesh.
     out2d_pattern:
         Glob pattern for ``out2d_*.nc`` files (used for node coordinates).
     velx_pattern:
@@ -633,7 +642,7 @@ def stations_map_panel(hgrid: str, station_in: str, staout_prefix: str,
     Parameters
     ----------
     hgrid:
-        Path to ``hgrid.gr3`` mesh file.
+        Path to ``hgrid.gr3`` mesh file, or a binary ``.npz`` mesh.
     station_in:
         Path to ``station.in`` file.
     staout_prefix:
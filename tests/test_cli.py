@@ -13,3 +13,10 @@ def test_cli_help():
     runner = CliRunner()
     result = runner.invoke(main, ["--help"])
     assert result.exit_code == 0
+
+
+def test_cli_combine_schout_help():
+    runner = CliRunner()
+    result = runner.invoke(main, ["combine-schout", "--help"])
+    assert result.exit_code == 0
+    assert "--no-resume" in result.output
@@ -0,0 +1,182 @@
+"""Unit tests for schismviz.datastore.
+
+``read_ts`` is mocked; the inventory file and the disk cache live in a
+temporary directory.
+"""
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import pytest
+
+from schismviz import datastore
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _write_inventory(path):
+    pd.DataFrame(
+        [
+            {
+                "station_id": "anh", "subloc": "", "name": "Antioch", "unit": "ft",
+                "param": "elev", "min_year": 2018, "max_year": 2020,
+                "filename": "des_anh_elev.csv", "agency": "dwr",
+                "agency_id_dbase": "ANH", "lat": 38.0, "lon": -121.8,
+                "x": 615000.0, "y": 4209000.0,
+            },
+            {
+                "station_id": "mrz", "subloc": "upper", "name": "Martinez", "unit": "ec",
+                "param": "ec", "min_year": 2019, "max_year": 2020,
+                "filename": "cdec_mrz_ec.csv", "agency": "cdec",
+                "agency_id_dbase": "MRZ", "lat": 38.0, "lon": -122.1,
+                "x": 580000.0, "y": 4210000.0,
+            },
+        ]
+    ).to_csv(path, index=False)
+    return path
+
+
+def _fake_series(fpath, *args, **kwargs):
+    idx = pd.date_range("2018-06-01", "2020-06-01", freq="h")
+    df = pd.DataFrame({"value": np.arange(len(idx), dtype=float)}, index=idx)
+    df.attrs["unit"] = "ft"
+    return df
+
+
+@pytest.fixture
+def store(tmp_path):
+    inventory = _write_inventory(tmp_path / "inventory_datasets.csv")
+    return datastore.StationDatastore(
+        repo_dir=str(tmp_path / "screened"),
+        inventory_file=str(inventory),
+        cache_dir=str(tmp_path / ".cache-ds"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Inventory index
+# ---------------------------------------------------------------------------
+
+
+def test_find_row(store):
+    assert store.find_row("anh", "elev")["filename"] == "des_anh_elev.csv"
+    assert store.find_row("mrz", "ec", subloc="upper")["name"] == "Martinez"
+    assert store.find_row("mrz", "ec")["name"] == "Martinez"
+    assert store.find_row("mrz", "ec", subloc="lower") is None
+    assert store.find_row("anh", "ec") is None
+
+
+# ---------------------------------------------------------------------------
+# Year-partitioned cache
+# ---------------------------------------------------------------------------
+
+
+def test_get_data_reads_once_and_partitions(store):
+    row = store.get_catalog().iloc[0]
+    with patch("schismviz.datastore.read_ts", side_effect=_fake_series) as mock_read:
+        full = store.get_data(row)
+        again = store.get_data(row)
+    assert mock_read.call_count == 1
+    pd.testing.assert_frame_equal(full, again)
+    assert full.index.freq == "h"
+    assert full.attrs["unit"] == "ft"
+    assert len(full) == len(_fake_series(None))
+
+
+def test_get_data_time_range_loads_only_needed_years(store):
+    row = store.get_catalog().iloc[0]
+    window = (pd.Timestamp("2019-03-01"), pd.Timestamp("2019-03-02 23:00"))
+    with patch("schismviz.datastore.read_ts", side_effect=_fake_series):
+        df = store.get_data(row, time_range=window)
+    assert df.index[0] == window[0]
+    assert df.index[-1] == window[1]
+    assert len(df) == 48
+    # only the 2019 partition was pulled into memory
+    assert len(store.memory_cache) == 1
+
+
+def test_get_data_uses_time_range_on_row(store):
+    row = store.get_catalog().iloc[0].copy()
+    row["time_range"] = (pd.Timestamp("2020-01-01"), None)
+    with patch("schismviz.datastore.read_ts", side_effect=_fake_series):
+        df = store.get_data(row)
+    assert df.index[0] == pd.Timestamp("2020-01-01")
+    assert df.index[-1] == pd.Timestamp("2020-06-01")
+
+
+def test_source_signature_resolves_relative_paths(tmp_path, monkeypatch):
+    (tmp_path / "obs.csv").write_text("")
+    monkeypatch.chdir(tmp_path)
+    assert datastore.source_signature("obs.csv") == datastore.source_signature(
+        str(tmp_path / "obs.csv")
+    )
+
+
+def test_stores_share_cache_dir(tmp_path, monkeypatch):
+    inventory = _write_inventory(tmp_path / "inventory_datasets.csv")
+    monkeypatch.setenv(datastore.OBS_CACHE_DIR_ENV, str(tmp_path / "shared"))
+    stores = [
+        datastore.StationDatastore(
+            repo_dir=str(tmp_path / "screened"), inventory_file=str(inventory)
+        )
+        for _ in range(2)
+    ]
+    assert stores[0].cache_dir == str(tmp_path / "shared")
+    row = stores[0].get_catalog().iloc[0]
+    with patch("schismviz.datastore.read_ts", side_effect=_fake_series) as mock_read:
+        first = stores[0].get_data(row)
+        second = stores[1].get_data(row)
+    assert mock_read.call_count == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+# ---------------------------------------------------------------------------
+# Prefetch
+# ---------------------------------------------------------------------------
+
+
+def test_prefetch_reports_missing_and_caches_present(store, tmp_path):
+    (tmp_path / "screened").mkdir()
+    (tmp_path / "screened" / "des_anh_elev.csv").write_text("")
+    with patch("schismviz.datastore.read_ts", side_effect=_fake_series) as mock_read:
+        problems = store.prefetch(max_workers=2)
+        # a second prefetch and a later get_data hit the cache
+        store.prefetch(max_workers=2)
+        store.get_data(store.get_catalog().iloc[0])
+    assert problems == {"cdec_mrz_ec.csv": "missing"}
+    assert mock_read.call_count == 1
+
+
+def test_prefetch_reports_read_errors(store, tmp_path):
+    (tmp_path / "screened").mkdir()
+    (tmp_path / "screened" / "des_anh_elev.csv").write_text("")
+    with patch("schismviz.datastore.read_ts", side_effect=ValueError("bad file")):
+        problems = store.prefetch(store.get_catalog().iloc[:1])
+    assert problems == {"des_anh_elev.csv": "bad file"}
+
+
+# ---------------------------------------------------------------------------
+# ByteLRUCache
+# ---------------------------------------------------------------------------
+
+
+def test_byte_lru_cache_evicts_by_size():
+    df = pd.DataFrame({"v": np.zeros(100)})
+    size = datastore.frame_nbytes(df)
+    cache = datastore.ByteLRUCache(max_bytes=2 * size)
+    cache.put("a", df)
+    cache.put("b", df)
+    cache.get("a")  # "b" becomes least recently used
+    cache.put("c", df)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.nbytes == 2 * size
+
+
+def test_byte_lru_cache_skips_oversized_values():
+    cache = datastore.ByteLRUCache(max_bytes=10)
+    cache.put("big", pd.DataFrame({"v": np.zeros(100)}))
+    assert len(cache) == 0
+    assert cache.nbytes == 0
@@ -193,6 +193,24 @@ def test_scan_nml_stores_study_times(mock_study_class, tmp_path):
     assert refs[0]._attributes["study_end"] == "2020-12-31 00:00:00"
 
 
+@patch("schismviz.readers.SchismStudy")
+def test_scan_nml_shares_study_config(mock_study_class, tmp_path):
+    """Refs of one study point to a single shared study_key, not copies."""
+    from schismviz.readers import SchismOutputReader
+
+    mock_study_class.return_value = _make_mock_study()
+
+    nml_file = tmp_path / "param.nml"
+    nml_file.write_text("")
+
+    refs = SchismOutputReader.scan(str(nml_file))
+    keys = [r._attributes["study_key"] for r in refs]
+    assert all(k is keys[0] for k in keys)
+    assert "param_nml_file" not in refs[0]._attributes
+    assert refs[0]._attributes["station_name"] == "Station A"
+    assert refs[0].name == f"{tmp_path.name}::DWR_A1/elev"
+
+
 @patch("schismviz.readers.SchismStudy")
 def test_scan_yaml_multiple_studies(mock_study_class, tmp_path):
     """scan() of a multi-study YAML returns refs for every study."""
@@ -221,6 +239,106 @@ def test_scan_yaml_multiple_studies(mock_study_class, tmp_path):
     assert study_names == {"s1", "s2"}
 
 
+@patch("schismviz.readers.SchismStudy")
+def test_load_reuses_scanned_study(mock_study_class, tmp_path):
+    """load() reuses the study opened by scan() instead of re-opening it."""
+    from schismviz.readers import SchismOutputReader
+
+    study = _make_mock_study()
+    study.get_data.return_value = pd.DataFrame(
+        {"DWR_A1": [1.0, 2.0]},
+        index=pd.date_range("2020-01-01", periods=2, freq="h"),
+    )
+    mock_study_class.return_value = study
+
+    nml_file = tmp_path / "param.nml"
+    nml_file.write_text("")
+
+    refs = SchismOutputReader.scan(str(nml_file))
+    reader = SchismOutputReader(str(tmp_path))
+    df = reader.load(**refs[0]._attributes)
+
+    assert mock_study_class.call_count == 1
+    assert len(df) == 2
+
+
+@patch("schismviz.readers.SchismStudy")
+def test_load_after_study_released_keeps_cache(mock_study_class, tmp_path):
+    """Dropping the scanned refs reopens the study once, without clearing its cache."""
+    import gc
+    from schismviz.readers import SchismOutputReader
+
+    def make_study(**kwargs):
+        study = _make_mock_study()
+        study.get_data.return_value = pd.DataFrame(
+            {"DWR_A1": [1.0, 2.0]},
+            index=pd.date_range("2020-01-01", periods=2, freq="h"),
+        )
+        return study
+
+    mock_study_class.side_effect = make_study
+
+    nml_file = tmp_path / "param.nml"
+    nml_file.write_text("")
+
+    refs = SchismOutputReader.scan(str(nml_file))
+    attrs = dict(refs[0]._attributes)
+    del refs
+    gc.collect()
+
+    reader = SchismOutputReader(str(tmp_path))
+    reader.load(**attrs)
+    gc.collect()
+    df = reader.load(**attrs)
+
+    assert mock_study_class.call_count == 2
+    assert mock_study_class.call_args_list[0].kwargs["clear_cache_on_init"] is True
+    assert mock_study_class.call_args_list[1].kwargs["clear_cache_on_init"] is False
+    assert len(df) == 2
+
+
+def test_study_released_after_reading_staout(tmp_path):
+    """A study whose frames were read is freed once its refs and readers go."""
+    import gc
+    import weakref
+    from schismviz import readers, schismstudy
+    from tests.test_schismstudy import _fake_read_params, _write_study
+
+    _write_study(tmp_path)
+    with patch.object(schismstudy.schimpyparam, "read_params", _fake_read_params):
+        refs = readers.SchismOutputReader.scan(str(tmp_path / "param.nml"))
+        reader = readers.SchismOutputReader(str(tmp_path))
+        assert len(reader.load(**refs[0]._attributes)) > 0
+    study = readers.get_study({"base_dir": str(tmp_path)})
+    study.get_staout("elev")
+    study_ref = weakref.ref(study)
+    key = readers.study_key({"base_dir": str(tmp_path)})
+
+    del study, refs, reader
+    gc.collect()
+
+    assert study_ref() is None
+    assert key not in readers._study_registry
+
+
+@patch("schismviz.readers.SchismStudy")
+def test_get_study_normalises_config(mock_study_class, tmp_path):
+    """Equivalent study configs share one registry entry."""
+    from schismviz.readers import get_study
+
+    study = get_study({"base_dir": str(tmp_path), "reftime": "2020-01-01"})
+    same = get_study(
+        {
+            "base_dir": str(tmp_path / "." / "outputs" / ".."),
+            "study_name": tmp_path.name,
+            "output_dir": "outputs/",
+            "reftime": pd.Timestamp("2020-01-01"),
+        }
+    )
+    assert study is same
+    assert mock_study_class.call_count == 1
+
+
 # ---------------------------------------------------------------------------
 # SchismRegistryUIManager
 # ---------------------------------------------------------------------------
@@ -59,6 +59,8 @@ def _make_minimal_manager():
     mgr.datastore = mock_datastore
     mgr.dcat = mock_datastore.get_catalog.return_value
     mgr.dcat["full_id"] = ""
+    mgr._full_ids = {}
+    mgr._obs_rows = {}
 
     # Config stubs needed for other methods
     mgr.config = {}
@@ -221,6 +223,26 @@ def test_get_datastore_param_name(manager, variable, expected):
     assert result == expected
 
 
+# ---------------------------------------------------------------------------
+# find_obs_row
+# ---------------------------------------------------------------------------
+
+
+def test_find_obs_row_resolves_and_memoizes(manager):
+    row = pd.Series({"station_id": "sta", "subloc": "upper", "param": "ec"})
+    manager._full_ids = {"sta_upper": ("sta", "upper")}
+    manager.datastore.find_row.return_value = row
+    assert manager.find_obs_row("sta_upper", "salt") is row
+    assert manager.find_obs_row("sta_upper", "salt") is row
+    manager.datastore.find_row.assert_called_once_with("sta", "ec", subloc="upper")
+
+
+def test_find_obs_row_elev_uses_station_part(manager):
+    manager.datastore.find_row.return_value = None
+    assert manager.find_obs_row("sta_upper", "elev") is None
+    manager.datastore.find_row.assert_called_once_with("sta", "elev")
+
+
 # ---------------------------------------------------------------------------
 # Verify get_map_color_category has been removed (B5 fix)
 # ---------------------------------------------------------------------------
@@ -0,0 +1,214 @@
+"""Unit tests for schismviz.schismstudy.
+
+``param.nml`` parsing is mocked; ``station.in``, flux and staout files are
+written to a temporary study directory.
+"""
+import os
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import pytest
+
+from schismviz import schismstudy
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+class _FakeParams(dict):
+    run_start = pd.Timestamp("2020-01-01")
+
+
+def _fake_read_params(fname):
+    return _FakeParams(rnday=10)
+
+
+def _write_study(base_dir, n_records=10):
+    (base_dir / "outputs").mkdir()
+    (base_dir / "param.nml").write_text("")
+    (base_dir / "station.in").write_text(
+        "1 1 1 1 1 1 1 1 1 ! elev\n"
+        "3\n"
+        '1 100.0 200.0 0.0 ! sta1 default "Station 1"\n'
+        '2 110.0 210.0 -1.0 ! sta2 upper "Station 2"\n'
+        '3 120.0 220.0 0.0 ! sta3 default "Station 3"\n'
+    )
+    (base_dir / "flow_station_xsects.yaml").write_text(
+        "linestrings:\n"
+        "  - name: FLX1\n"
+        "    coordinates: [[0, 0], [10, 10]]\n"
+    )
+    times = np.arange(1, n_records + 1) * 900.0
+    data = np.column_stack([times, np.arange(n_records * 3).reshape(n_records, 3)])
+    np.savetxt(base_dir / "outputs" / "staout_1", data)
+    np.savetxt(base_dir / "outputs" / "staout_5", data)
+    return base_dir
+
+
+@pytest.fixture
+def study_dir(tmp_path):
+    return _write_study(tmp_path)
+
+
+@pytest.fixture
+def study(study_dir):
+    with patch.object(schismstudy.schimpyparam, "read_params", _fake_read_params):
+        yield schismstudy.SchismStudy(base_dir=str(study_dir))
+
+
+# ---------------------------------------------------------------------------
+# Study metadata cache
+# ---------------------------------------------------------------------------
+
+
+def test_read_study_metadata_is_cached(study_dir):
+    with patch.object(schismstudy.schimpyparam, "read_params", _fake_read_params):
+        args = (
+            study_dir / "param.nml",
+            study_dir / "station.in",
+            study_dir / "flow_station_xsects.yaml",
+        )
+        first = schismstudy.read_study_metadata(*args)
+        second = schismstudy.read_study_metadata(*args)
+    assert first is second
+    assert first["flux_names"] == ["FLX1"]
+    assert list(first["stations_gdf"]["station_id"]) == ["sta1", "sta2_upper", "sta3"]
+
+
+def test_read_study_metadata_invalidated_by_mtime(study_dir):
+    with patch.object(schismstudy.schimpyparam, "read_params", _fake_read_params):
+        args = (
+            study_dir / "param.nml",
+            study_dir / "station.in",
+            study_dir / "flow_station_xsects.yaml",
+        )
+        first = schismstudy.read_study_metadata(*args)
+        st = os.stat(study_dir / "station.in")
+        os.utime(study_dir / "station.in", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        second = schismstudy.read_study_metadata(*args)
+    assert first is not second
+
+
+# ---------------------------------------------------------------------------
+# Catalog
+# ---------------------------------------------------------------------------
+
+
+def test_get_catalog_rows_per_variable(study):
+    cat = study.get_catalog()
+    # 3 stations x (elev, salt) + 1 flux line
+    assert len(cat) == 7
+    assert list(cat.columns) == [
+        "name", "id", "geometry", "variable", "unit", "filename", "source"
+    ]
+    elev = cat[cat["variable"] == "elev"]
+    assert list(elev["id"]) == ["sta1", "sta2_upper", "sta3"]
+    assert (elev["unit"] == "meters").all()
+    assert elev["filename"].str.endswith("staout_1").all()
+    salt = cat[cat["variable"] == "salt"]
+    assert (salt["unit"] == "PSU").all()
+    flow = cat[cat["variable"] == "flow"]
+    assert list(flow["id"]) == ["flx1"]
+    assert str(cat.crs) == "EPSG:32610"
+
+
+def test_has_data_for(study):
+    assert study.has_data_for("sta2_upper", "elev")
+    assert study.has_data_for("flx1", "flow")
+    assert not study.has_data_for("sta1", "flow")
+    assert study.get_catalog_index()[("sta1", "elev")] == 0
+
+
+def test_clear_cache_resets_catalog_index(study):
+    index = study.get_catalog_index()
+    study.clear_cache()
+    assert study._catalog_index is None
+    assert study.get_catalog_index() is not index
+    assert study.has_data_for("sta1", "elev")
+
+
+# ---------------------------------------------------------------------------
+# Multi-study fetch
+# ---------------------------------------------------------------------------
+
+
+def test_get_data_for_studies_aligns_columns(tmp_path):
+    dirs = []
+    for name, n in (("a", 10), ("b", 6)):
+        d = tmp_path / name
+        d.mkdir()
+        dirs.append(_write_study(d, n_records=n))
+    with patch.object(schismstudy.schimpyparam, "read_params", _fake_read_params):
+        studies = [
+            schismstudy.SchismStudy(study_name=d.name, base_dir=str(d)) for d in dirs
+        ]
+    df = schismstudy.get_data_for_studies(studies, "sta1", "elev")
+    assert list(df.columns) == ["a", "b"]
+    assert len(df) == 10
+    assert df["b"].isna().sum() == 4
+
+
+def test_get_data_for_studies_skips_missing(study):
+    df = schismstudy.get_data_for_studies([study], "nosuch", "elev")
+    assert df.empty
+
+
+# ---------------------------------------------------------------------------
+# Time-window reads
+# ---------------------------------------------------------------------------
+
+
+def test_slice_time_range_bounds_inclusive():
+    idx = pd.date_range("2020-01-01", periods=10, freq="D")
+    df = pd.DataFrame({"v": np.arange(10)}, index=idx)
+    out = schismstudy.slice_time_range(df, ("2020-01-03", "2020-01-05"))
+    assert list(out["v"]) == [2, 3, 4]
+    assert list(schismstudy.slice_time_range(df, (None, "2020-01-02"))["v"]) == [0, 1]
+    assert schismstudy.slice_time_range(df, None) is df
+
+
+def test_get_data_time_range(study):
+    row = {"id": "sta1", "variable": "elev", "filename": ""}
+    full = study.get_data(row)
+    window = (full.index[2], full.index[4])
+    df = study.get_data(row, time_range=window)
+    assert len(df) == 3
+    pd.testing.assert_frame_equal(df, full.iloc[2:5])
+
+
+# ---------------------------------------------------------------------------
+# Unit conversion
+# ---------------------------------------------------------------------------
+
+
+def test_convert_to_SI_linear_float32():
+    idx = pd.date_range("2020-01-01", periods=3, freq="h")
+    df = pd.DataFrame({"v": [0.0, 1.0, 10.0]}, index=idx)
+    df.attrs["unit"] = "ft"
+    out, unit = schismstudy.convert_to_SI(df, "feet")
+    assert unit == "meters"
+    assert out["v"].dtype == np.float32
+    np.testing.assert_allclose(out["v"], [0.0, 0.3048, 3.048], rtol=1e-6)
+    assert df["v"].iloc[2] == 10.0  # input untouched
+    assert out.index.freq == "h"
+    assert out.attrs["unit"] == "ft"
+
+
+def test_convert_to_SI_offset_and_nonlinear():
+    s = pd.Series([32.0, 212.0])
+    out, unit = schismstudy.convert_to_SI(s, "deg F", dtype=None)
+    assert unit == "deg_c"
+    assert out.dtype == np.float64
+    np.testing.assert_allclose(out, [0.0, 100.0], atol=1e-9)
+    ec = pd.Series([0.0, 53087.0])
+    out, unit = schismstudy.convert_to_SI(ec, "uS/cm")
+    assert unit == "PSU"
+    assert 34.0 < out.iloc[1] < 36.0
+
+
+def test_convert_to_SI_passthrough():
+    df = pd.DataFrame({"v": [1.0]})
+    out, unit = schismstudy.convert_to_SI(df, "meters")
+    assert out is df and unit == "meters"
@@ -15,6 +15,7 @@ import pytest
 
 from dvue.catalog import DataCatalog, DataReference
 from dvue.math_reference import MathDataReference
+from schismviz import schismstudy
 from schismviz.schismui import (
     SchismDataReferenceReader,
     SchismOutputUIDataManager,
@@ -225,6 +226,50 @@ def test_is_irregular(minimal_manager):
     assert minimal_manager.is_irregular(row) is False
 
 
+def test_apply_unit_conversion_caches_converted(minimal_manager):
+    stored = _make_time_series()
+
+    def load(time_range=None):
+        # Like the reader: a new frame over the values held by the study
+        raw = stored.iloc[:]
+        raw.attrs["unit"] = "ft"
+        raw.attrs["ref_key"] = ("study1::DWR_A1/elev", time_range)
+        return raw
+
+    raw = load()
+    with patch.object(
+        schismstudy, "convert_to_SI", wraps=schismstudy.convert_to_SI
+    ) as mock_convert:
+        first = minimal_manager.apply_unit_conversion(raw)
+        # A fresh frame of the same reference reuses the converted values
+        second = minimal_manager.apply_unit_conversion(load())
+        assert mock_convert.call_count == 1
+        minimal_manager.apply_unit_conversion(load(("2020-01-01", "2020-01-02")))
+        assert mock_convert.call_count == 2
+        # A derived frame inherits the attrs but not the values
+        doubled = minimal_manager.apply_unit_conversion(raw * 2.0)
+        assert mock_convert.call_count == 3
+        assert doubled["value"].iloc[1] == pytest.approx(2.0 * first["value"].iloc[1])
+        # Frames without a ref_key are converted every time
+        unkeyed = _make_time_series()
+        unkeyed.attrs["unit"] = "ft"
+        minimal_manager.apply_unit_conversion(unkeyed)
+        minimal_manager.apply_unit_conversion(unkeyed)
+        assert mock_convert.call_count == 5
+    assert first is not second
+    assert np.shares_memory(first.values, second.values)
+    pd.testing.assert_frame_equal(first, second)
+    assert first.attrs["unit"] == "meters"
+    # Renaming one caller's frame leaves the others alone
+    first.rename(columns={"value": "renamed"}, inplace=True)
+    first.attrs["unit"] = "changed"
+    third = minimal_manager.apply_unit_conversion(raw)
+    assert list(third.columns) == ["value"]
+    assert third.attrs["unit"] == "meters"
+    assert raw.attrs["unit"] == "ft"
+    assert raw["value"].iloc[1] == 1.0
+
+
 # ---------------------------------------------------------------------------
 # Math reference support
 # ---------------------------------------------------------------------------
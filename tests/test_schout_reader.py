@@ -0,0 +1,392 @@
+"""Unit tests for schismviz.schout_reader.
+
+A two-rank uncombined run (``local_to_global_*`` and ``schout_*.nc`` files)
+of a six-node mesh with two triangles and one quad is written to a
+temporary directory.  Values encode the global node, record and level so
+reads can be checked exactly.
+"""
+import os
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+import pytest
+
+from schismviz import schout_reader
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+NODES = np.array(
+    [[0.0, 0.0], [1.0, 0.0], [2.0, 0.0], [0.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+)
+MISSING = np.iinfo(np.int32).min
+ELEMS = np.array(
+    [[0, 1, 4, MISSING], [0, 4, 3, MISSING], [1, 2, 5, 4]], dtype=np.int32
+)
+# rank -> (global elements, global nodes in local order, global sides)
+PARTITION = {
+    0: ([0, 1], [0, 1, 4, 3], [0, 1, 2, 3, 4]),
+    1: ([2], [1, 2, 5, 4], [4, 5, 6, 7]),
+}
+NREC = 4
+NVRT = 2
+
+
+def _write_local_to_global(path_outputs):
+    path_outputs.mkdir(exist_ok=True)
+    for rank, (elems, nodes, sides) in PARTITION.items():
+        lines = [f"8 3 6 {NVRT} {len(PARTITION)} 2", "1 1 0 0 0"]
+        for items in (elems, nodes, sides):
+            lines.append(str(len(items)))
+            lines += [f"{i + 1} {g + 1}" for i, g in enumerate(items)]
+        lines += [
+            "Header:",
+            "2020 1 1 0.0",
+            "0.0",
+            f"{NREC} 900.0 {NREC} {NVRT} 1 0.01",
+            "1000.0 10.0 0.0 0.0 1",
+            "-1.0",
+            "0.0",
+            f"{len(nodes)} {len(elems)}",
+        ]
+        lines += [
+            f"{NODES[g, 0]} {NODES[g, 1]} {1.0 + g} 1" for g in nodes
+        ]
+        local = {g: i for i, g in enumerate(nodes)}
+        for e in elems:
+            conn = [local[n] + 1 for n in ELEMS[e] if n != MISSING]
+            lines.append(" ".join(str(x) for x in [len(conn)] + conn))
+        fname = path_outputs / "local_to_global_{:04d}".format(rank)
+        fname.write_text("\n".join(lines) + "\n")
+    return path_outputs
+
+
+def expected_elev(nodes, records):
+    return 100.0 * np.asarray(nodes)[None, :] + np.asarray(records)[:, None]
+
+
+def _write_schout(path_outputs, n_spools=3):
+    for rank, (_, nodes, _) in PARTITION.items():
+        for spool in range(1, n_spools + 1):
+            records = np.arange((spool - 1) * NREC, spool * NREC)
+            fname = path_outputs / "schout_{:04d}_{:d}.nc".format(rank, spool)
+            with nc.Dataset(fname, "w") as root:
+                root.createDimension("time", None)
+                root.createDimension("nSCHISM_hgrid_node", len(nodes))
+                root.createDimension("nSCHISM_vgrid_layers", NVRT)
+                time = root.createVariable("time", "f8", ("time",))
+                time[:] = (records + 1) * 900.0
+                elev = root.createVariable(
+                    "elev", "f4", ("time", "nSCHISM_hgrid_node"))
+                elev.i23d = 1
+                elev.ivs = 1
+                elev[:] = expected_elev(nodes, records)
+                salt = root.createVariable(
+                    "salt", "f4",
+                    ("time", "nSCHISM_hgrid_node", "nSCHISM_vgrid_layers"))
+                salt.i23d = 2
+                salt.ivs = 1
+                salt[:] = expected_elev(nodes, records)[:, :, None] \
+                    + 0.5 * np.arange(NVRT)
+    return path_outputs
+
+
+@pytest.fixture
+def path_outputs(tmp_path):
+    return _write_schout(_write_local_to_global(tmp_path / "outputs"))
+
+
+# ---------------------------------------------------------------------------
+# local_to_global parsing
+# ---------------------------------------------------------------------------
+
+
+def test_parse_local_to_global(path_outputs):
+    parsed = schout_reader.parse_local_to_global(
+        str(path_outputs / "local_to_global_0001")
+    )
+    np.testing.assert_array_equal(parsed["elems"], [[0, 2]])
+    np.testing.assert_array_equal(parsed["nodes"][:, 1], [1, 2, 5, 4])
+    assert parsed["header"] == {"nrec": NREC, "start": [2020, 1, 1]}
+    np.testing.assert_array_equal(parsed["elem_conn"], [[1, 2, 3, 4]])
+    np.testing.assert_array_equal(parsed["node_values"][:, 2], [2.0, 3.0, 6.0, 5.0])
+
+
+def test_parse_elem_block_mixed():
+    conn = schout_reader._parse_elem_block([b"3 1 2 3", b"4 2 3 4 5", b" 3 4 5 6"])
+    np.testing.assert_array_equal(conn, [[1, 2, 3, 0], [2, 3, 4, 5], [4, 5, 6, 0]])
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_read_global_geometry(path_outputs, n_workers):
+    mesh = schout_reader.SchoutUncombinedMesh(
+        path_outputs=str(path_outputs), n_workers=n_workers, use_cache=False
+    )
+    assert mesh.global_dims == {"ns": 8, "ne": 3, "np": 6, "nvrt": NVRT, "nproc": 2}
+    np.testing.assert_array_equal(mesh._nodes[:, :2], NODES)
+    np.testing.assert_array_equal(mesh._nodes[:, 2], 1.0 + np.arange(6))
+    np.testing.assert_array_equal(mesh._elems, ELEMS)
+    assert [h["nrec"] for h in mesh.proc_header] == [NREC, NREC]
+    assert not (path_outputs / schout_reader.GEOMETRY_CACHE_NAME).exists()
+
+
+def test_geometry_cache_roundtrip(path_outputs, monkeypatch):
+    first = schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    assert (path_outputs / schout_reader.GEOMETRY_CACHE_NAME).exists()
+
+    def _fail(fname):
+        raise AssertionError("local_to_global parsed despite the cache")
+
+    monkeypatch.setattr(schout_reader, "parse_local_to_global", _fail)
+    second = schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    np.testing.assert_array_equal(second._elems, first._elems)
+    np.testing.assert_array_equal(second._kbp, first._kbp)
+    for a, b in zip(second.nodes_local_to_global, first.nodes_local_to_global):
+        np.testing.assert_array_equal(a, b)
+    assert second.proc_header == first.proc_header
+
+
+def test_geometry_cache_invalidated(path_outputs):
+    schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    fname = path_outputs / "local_to_global_0000"
+    fname.write_text(fname.read_text().replace("0.0 0.0 1.0 1", "0.5 0.0 1.0 1"))
+    mesh = schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    assert mesh._nodes[0, 0] == 0.5
+
+
+def test_geometry_cache_truncated(path_outputs):
+    schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    path_cache = path_outputs / schout_reader.GEOMETRY_CACHE_NAME
+    path_cache.write_bytes(path_cache.read_bytes()[:100])
+    mesh = schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    np.testing.assert_array_equal(mesh._elems, ELEMS)
+    # The rebuilt cache replaced the damaged one, leaving no temporary files
+    assert [p.name for p in path_outputs.glob("*cache*")] == [path_cache.name]
+    with np.load(path_cache) as cache:
+        np.testing.assert_array_equal(cache["elems"], ELEMS)
+
+
+def test_read_section_methods(path_outputs):
+    mesh = schout_reader.SchoutUncombinedMesh(
+        path_outputs=str(path_outputs), n_workers=1, use_cache=False
+    )
+    mesh._allocate_memory()
+    mesh._create_geometry_variables()
+    with open(path_outputs / "local_to_global_0001") as fobj:
+        fobj.readline()
+        fobj.readline()
+        mesh.elems_local_to_global.append(mesh.read_elements_local_to_global(fobj))
+        mesh.nodes_local_to_global.append(mesh.read_nodes_local_to_global(fobj))
+        mesh.read_sides_local_to_global(fobj)
+        header = mesh.read_header_local_to_global(fobj)
+        mesh.read_nodes(fobj, mesh.n_nodes_local)
+        mesh.read_elems(fobj, mesh.n_elems_local)
+    assert header == {"nrec": NREC, "start": [2020, 1, 1]}
+    np.testing.assert_array_equal(mesh._elems[2], ELEMS[2])
+    np.testing.assert_array_equal(mesh._nodes[[1, 2, 5, 4], 2], [2.0, 3.0, 6.0, 5.0])
+
+
+def test_save_and_read_mesh_npz(path_outputs, tmp_path):
+    mesh = schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    mesh.save_mesh(str(tmp_path / "mesh.npz"))
+    for path in (tmp_path / "mesh.npz", path_outputs / schout_reader.GEOMETRY_CACHE_NAME):
+        smesh = schout_reader.read_mesh_npz(str(path))
+        np.testing.assert_array_equal(smesh.nodes[:, :2], NODES)
+        np.testing.assert_array_equal(smesh._elems, ELEMS)
+        np.testing.assert_array_equal(smesh.kbp, np.ones(6))
+
+
+def test_viz_read_mesh_accepts_npz(path_outputs):
+    from schismviz import viz_commands
+
+    schout_reader.SchoutUncombinedMesh(path_outputs=str(path_outputs), n_workers=1)
+    smesh = viz_commands._read_mesh(
+        str(path_outputs / schout_reader.GEOMETRY_CACHE_NAME))
+    assert smesh.n_nodes() == 6
+    assert smesh.n_elems() == 3
+
+
+# ---------------------------------------------------------------------------
+# Global to local node lookup
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def schout(path_outputs):
+    return schout_reader.Schout(path_outputs=str(path_outputs))
+
+
+def test_find_local_node_index(schout):
+    # ghost nodes 1 and 4 are owned by the lowest rank
+    assert schout.find_local_node_index(4) == (0, 2)
+    assert schout.find_local_node_index(5) == (1, 2)
+    ranks, local = schout.find_local_node_index([0, 1, 2, 3, 4, 5])
+    np.testing.assert_array_equal(ranks, [0, 0, 1, 0, 0, 1])
+    np.testing.assert_array_equal(local, [0, 1, 1, 3, 2, 2])
+
+
+def test_find_local_node_index_missing(schout):
+    with pytest.raises(ValueError):
+        schout.find_local_node_index(6)
+
+
+# ---------------------------------------------------------------------------
+# Node extraction
+# ---------------------------------------------------------------------------
+
+
+def test_extract_nodes(schout):
+    nodes = [5, 0, 4]
+    da = schout.extract_nodes("elev", nodes, 2, 3)
+    assert da.dims == ("time", "node")
+    np.testing.assert_array_equal(da["node"], nodes)
+    np.testing.assert_array_equal(da.values, expected_elev(nodes, range(NREC, 3 * NREC)))
+    np.testing.assert_array_equal(da["time"], (np.arange(NREC, 3 * NREC) + 1) * 900.0)
+
+
+def test_extract_nodes_level_and_t_basis(schout):
+    da = schout.extract_nodes("salt", [2, 3], 1, 1, level=1,
+                              t_basis=pd.Timestamp("2020-01-01"))
+    assert da.dims == ("time", "node")
+    np.testing.assert_array_equal(da.values, expected_elev([2, 3], range(NREC)) + 0.5)
+    assert da["time"].values[0] == np.datetime64("2020-01-01T00:15")
+    all_levels = schout.extract_nodes("salt", [2], 1, 1)
+    assert all_levels.dims == ("time", "node", "nSCHISM_vgrid_layers")
+
+
+def test_node_value(schout):
+    # Local node 2 of rank 1 is global node 5
+    da = schout.node_value("salt", 1, 2, 1, 2, t_basis=pd.Timestamp("2020-01-01"))
+    assert da.dims == ("time", "nSCHISM_vgrid_layers")
+    np.testing.assert_array_equal(da.values[:, 0], expected_elev([5], range(2 * NREC))[:, 0])
+    assert da["time"].values[0] == np.datetime64("2020-01-01T00:15")
+
+
+def test_variable_node_i(schout):
+    values = schout.variable("elev", 1, 1, node_i=[1, 2])
+    np.testing.assert_array_equal(values, expected_elev([1, 2], range(NREC)))
+
+
+# ---------------------------------------------------------------------------
+# Whole-domain assembly
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_variable_whole_domain(schout, n_workers):
+    values = schout.variable("elev", 1, 2, n_workers=n_workers)
+    assert values.dtype == np.float64
+    np.testing.assert_array_equal(values, expected_elev(range(6), range(2 * NREC)))
+
+
+def test_variable_float32_level(schout):
+    values = schout.variable("salt", 2, 2, level=1, dtype=np.float32, n_workers=1)
+    assert values.dtype == np.float32
+    np.testing.assert_array_equal(values, expected_elev(range(6), range(NREC, 2 * NREC)) + 0.5)
+
+
+def test_variable_memmap_out(schout, tmp_path):
+    path = tmp_path / "salt.npy"
+    values = schout.variable("salt", 1, 3, out=str(path), dtype=np.float32, n_workers=1)
+    assert isinstance(values, np.memmap)
+    stored = np.load(path)
+    assert stored.shape == (3 * NREC, 6, NVRT)
+    np.testing.assert_array_equal(stored[:, :, 0], expected_elev(range(6), range(3 * NREC)))
+
+
+def test_variable_reads_times_once(schout, monkeypatch):
+    calls = []
+    read_nc_block = schout_reader.read_nc_block
+
+    def _counting(path, name, *args, **kwargs):
+        calls.append((os.path.basename(path), name))
+        return read_nc_block(path, name, *args, **kwargs)
+
+    monkeypatch.setattr(schout_reader, "read_nc_block", _counting)
+    schout.variable("elev", 1, 3, n_workers=1)
+    time_reads = [path for path, name in calls if name == "time"]
+    assert sorted(time_reads) == ["schout_0000_1.nc", "schout_0000_2.nc",
+                                  "schout_0000_3.nc"]
+
+
+def test_iter_variable_yields_spools(schout):
+    spools = [(spool, block.shape) for spool, block in
+              schout.iter_variable("elev", 1, 3, n_workers=1)]
+    assert spools == [(1, (NREC, 6)), (2, (NREC, 6)), (3, (NREC, 6))]
+
+
+# ---------------------------------------------------------------------------
+# Decimated reads
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("skip", [1, 3, 5])
+def test_variable_skip_across_spools(schout, skip):
+    values = schout.variable("elev", 1, 3, skip=skip, n_workers=1)
+    records = np.arange(3 * NREC)[::skip]
+    np.testing.assert_array_equal(values, expected_elev(range(6), records))
+    np.testing.assert_array_equal(schout.times(1, 3, skip=skip), (records + 1) * 900.0)
+
+
+def test_variable_time_window(schout):
+    # records 2..9 have times 2700..9000
+    values = schout.variable("salt", 1, 3, skip=3, level=0, n_workers=1,
+                             time_begin=2700.0, time_end=9000.0)
+    np.testing.assert_array_equal(values, expected_elev(range(6), [2, 5, 8]))
+
+
+# ---------------------------------------------------------------------------
+# Combiner
+# ---------------------------------------------------------------------------
+
+
+def test_combine(schout, tmp_path):
+    combined_dir = tmp_path / "combined"
+    written = schout.combine(str(combined_dir), spool_begin=2, n_workers=1)
+    assert [p.rsplit("/", 1)[-1] for p in written] == ["schout_2.nc", "schout_3.nc"]
+    with nc.Dataset(combined_dir / "schout_2.nc") as root:
+        np.testing.assert_array_equal(
+            root["elev"][:], expected_elev(range(6), range(NREC, 2 * NREC)))
+        np.testing.assert_array_equal(
+            root["salt"][:, :, 1], expected_elev(range(6), range(NREC, 2 * NREC)) + 0.5)
+        np.testing.assert_array_equal(root["SCHISM_hgrid_node_x"][:], NODES[:, 0])
+        faces = root["SCHISM_hgrid_face_nodes"][:]
+        np.testing.assert_array_equal(faces[2], [2, 3, 6, 5])
+        assert faces.mask[0, 3]
+        assert root["elev"].i23d == 1
+
+
+def test_combine_default_dir(schout, path_outputs):
+    written = schout.combine(spool_end=1, variables=["elev"], n_workers=1)
+    assert written == [os.path.join(str(path_outputs), "combined", "schout_1.nc")]
+    assert not (path_outputs / "schout_1.nc").exists()
+
+
+def test_combine_resumes(schout, tmp_path):
+    combined_dir = tmp_path / "combined"
+    schout.combine(str(combined_dir), spool_end=1, variables=["elev"], n_workers=1)
+    (combined_dir / "schout_2.nc.part").write_text("interrupted")
+    written = schout.combine(str(combined_dir), variables=["elev"], n_workers=1)
+    assert [p.rsplit("/", 1)[-1] for p in written] == ["schout_2.nc", "schout_3.nc"]
+    assert not (combined_dir / "schout_2.nc.part").exists()
+    with nc.Dataset(combined_dir / "schout_2.nc") as root:
+        assert "salt" not in root.variables
+
+
+def test_combined_opens_in_nc_viewer(schout, tmp_path):
+    pytest.importorskip("dvue")
+    from schismviz.schism_nc_reader import SchismNcReader
+
+    path, = schout.combine(str(tmp_path / "combined"), spool_begin=2,
+                           spool_end=2, n_workers=1)
+    refs = SchismNcReader.scan(path)
+    assert {(r.get_attribute("variable"), r.get_attribute("layer_k"))
+            for r in refs} == {("elev", None), ("salt", 0), ("salt", 1)}
+    assert refs[0].get_attribute("x") == NODES[0, 0]
+    records = np.arange(NREC, 2 * NREC)
+    df = SchismNcReader(path).load(variable="salt", node_id=5, layer_k=1)
+    np.testing.assert_array_equal(df["salt"], expected_elev([5], records)[:, 0] + 0.5)
+    assert df.index[0] == pd.Timestamp("2020-01-01") + pd.Timedelta(seconds=(NREC + 1) * 900)
@@ -1,4 +1,5 @@
 from pathlib import Path
+import xml.etree.ElementTree as ET
 import numpy as np
 import xarray as xr
 import pytest
@@ -94,6 +95,24 @@ def test_read_hgrid_gr3():
     # assert grid.ds.dims['nSCHISM_hgrid_max_edge_nodes'] == 2
 
 
+def test_face_polygons(grid_test):
+    """ Test face_polygons against polygons built face by face """
+    polygons = grid_test.face_polygons
+    assert polygons.dims == ('nSCHISM_hgrid_face',)
+    face_nodes = grid_test.Mesh2_face_nodes.values
+    node_x = grid_test.Mesh2_node_x.values
+    node_y = grid_test.Mesh2_node_y.values
+    n_nodes = (face_nodes != -1).sum(axis=1)
+    assert set(n_nodes) == {3, 4}
+    for i in (int(np.argmax(n_nodes == 3)), int(np.argmax(n_nodes == 4))):
+        ind = face_nodes[i, :n_nodes[i]] - 1
+        expected = Polygon(zip(node_x[ind], node_y[ind]))
+        assert polygons.values[i].equals(expected)
+        assert len(polygons.values[i].exterior.coords) == n_nodes[i] + 1
+    areas = grid_test.compute_face_areas()
+    assert areas.values[i] == pytest.approx(expected.area)
+
+
 def test_find_element_at_position(grid_test):
     """ Test find_element_at """
     # When a point is inside an element
@@ -104,6 +123,143 @@ def test_find_element_at_position(grid_test):
     assert np.all(elem_ind == np.array([39, 123]))
 
 
+def test_locate_points(grid_test):
+    """ Test locate_points against the STRtree based find_element_at """
+    rng = np.random.default_rng(0)
+    node_x = grid_test.Mesh2_node_x.values
+    node_y = grid_test.Mesh2_node_y.values
+    xs = rng.uniform(node_x.min() - 5., node_x.max() + 5., 200)
+    ys = rng.uniform(node_y.min() - 5., node_y.max() + 5., 200)
+    faces, weights = grid_test.locate_points(xs, ys)
+    assert weights.shape == (200, 4)
+    for x, y, face in zip(xs, ys, faces):
+        expected = grid_test.find_element_at(x, y)
+        if len(expected) == 0:
+            assert face == -1
+        else:
+            assert face == expected.min()
+    inside = faces >= 0
+    assert inside.any() and not inside.all()
+    assert np.isnan(weights[~inside]).all()
+    # The weights reproduce the coordinates of the points
+    face_nodes = grid_test.face_nodes_zero_based()[faces[inside]]
+    valid = face_nodes >= 0
+    w = weights[inside]
+    assert np.all(w[~valid] == 0.)
+    np.testing.assert_allclose(w.sum(axis=1), 1.)
+    np.testing.assert_allclose((w * np.where(valid, node_x[face_nodes], 0.)).sum(axis=1),
+                               xs[inside])
+    np.testing.assert_allclose((w * np.where(valid, node_y[face_nodes], 0.)).sum(axis=1),
+                               ys[inside])
+    # A point on a boundary of two elements goes to the lower index
+    faces, weights = grid_test.locate_points(0., 0.)
+    assert faces.tolist() == [39]
+
+
+def test_element_locator_non_uniform():
+    """ Test ElementLocator on a mesh with element sizes three orders apart """
+    # A fine unit square of 40 x 40 cells surrounded by four coarse
+    # triangles filling the rest of [0, 1000] x [0, 1000]
+    n = 40
+    g = np.linspace(0., 1., n + 1)
+    node_x = np.concatenate((np.tile(g, n + 1), [1000., 1000., 0.]))
+    node_y = np.concatenate((np.repeat(g, n + 1), [0., 1000., 1000.]))
+    corner = (n + 1) ** 2
+    ll = (np.arange(n)[:, None] * (n + 1) + np.arange(n)[None, :]).ravel()
+    fine = np.concatenate((np.stack((ll, ll + 1, ll + n + 2), axis=-1),
+                           np.stack((ll, ll + n + 2, ll + n + 1), axis=-1)))
+    coarse = np.array([[n, corner, corner - 1], [corner - 1, corner, corner + 1],
+                       [corner - 1, corner + 1, corner + 2],
+                       [corner - n - 1, corner - 1, corner + 2]])
+    face_nodes = np.concatenate((fine, coarse))
+    locator = sx.ElementLocator(node_x, node_y, face_nodes)
+    # No bin collects the fine triangles en masse
+    assert np.diff(locator.bin_start).max() <= 8
+
+    rng = np.random.default_rng(0)
+    xs = np.concatenate((rng.uniform(0., 1., 500), rng.uniform(-10., 1010., 500)))
+    ys = np.concatenate((rng.uniform(0., 1., 500), rng.uniform(-10., 1010., 500)))
+    faces, weights = locator.locate(xs, ys)
+    inside = (xs >= 0.) & (xs <= 1000.) & (ys >= 0.) & (ys <= 1000.)
+    np.testing.assert_array_equal(faces >= 0, inside)
+    assert np.all(faces[:500] < len(fine))
+    nodes = face_nodes[faces[inside]]
+    np.testing.assert_allclose((weights[inside, :3] * node_x[nodes]).sum(axis=1),
+                               xs[inside])
+    np.testing.assert_allclose((weights[inside, :3] * node_y[nodes]).sum(axis=1),
+                               ys[inside])
+    faces_coarse, _ = locator.locate([900., 0.05], [500., 900.])
+    assert faces_coarse.tolist() == [len(fine) + 1, len(fine) + 3]
+
+    # Capping the pairs tested at a time gives the same result
+    locator.max_pairs = 7
+    faces_capped, weights_capped = locator.locate(xs, ys, chunk_size=300)
+    np.testing.assert_array_equal(faces_capped, faces)
+    np.testing.assert_array_equal(weights_capped, weights)
+
+
+def test_interpolate_points(grid_test):
+    """ Test interpolate_points with fields linear in x, y and z """
+    node_x = grid_test.Mesh2_node_x.values
+    node_y = grid_test.Mesh2_node_y.values
+    times = np.arange(5.)
+    grid_test.ds['elev'] = xr.DataArray(
+        2. * node_x[None, :] - node_y[None, :] + times[:, None],
+        dims=('time', 'nSCHISM_hgrid_node'), coords={'time': times})
+    # Five layers from -4 to 0 with the bottom layer dry at some nodes
+    z = np.broadcast_to(np.arange(-4., 1.), (5, node_x.size, 5)).copy()
+    z[:, ::3, 0] = np.nan
+    grid_test.ds['zCoordinates'] = xr.DataArray(
+        z, dims=('time', 'nSCHISM_hgrid_node', 'nSCHISM_vgrid_layers'))
+    grid_test.ds['salt'] = xr.DataArray(
+        node_x[None, :, None] + 10. * z + times[:, None, None],
+        dims=('time', 'nSCHISM_hgrid_node', 'nSCHISM_vgrid_layers'))
+    centroids = grid_test.face_polygons.values[[0, 50, 100]]
+    xs = np.array([p.centroid.x for p in centroids] + [1e6])
+    ys = np.array([p.centroid.y for p in centroids] + [1e6])
+
+    da = grid_test.interpolate_points('elev', xs, ys, time_chunk=2)
+    assert da.dims == ('time', 'point')
+    expected = 2. * xs[None, :3] - ys[None, :3] + times[:, None]
+    np.testing.assert_allclose(da.values[:, :3], expected)
+    assert np.isnan(da.values[:, 3]).all()
+
+    da = grid_test.interpolate_points('salt', xs, ys)
+    assert da.dims == ('time', 'point', 'nSCHISM_vgrid_layers')
+    np.testing.assert_allclose(da.values[:, :3, -1], xs[None, :3] + times[:, None])
+
+    zs = np.array([-2.5, -0.2, -1., 0.])
+    da = grid_test.interpolate_points('salt', xs, ys, zs=zs, time_chunk=2)
+    assert da.dims == ('time', 'point')
+    expected = xs[None, :3] + 10. * zs[None, :3] + times[:, None]
+    np.testing.assert_allclose(da.values[:, :3], expected)
+    with pytest.raises(ValueError):
+        grid_test.interpolate_points('elev', xs, ys, zs=zs)
+
+
+def test_spatial_index_persisted(grid_test, tmp_path, monkeypatch):
+    """ Test that the spatial index is saved and loaded memory-mapped """
+    p_cur = Path(__file__).parent.absolute()
+    monkeypatch.setenv(sx.SPATIAL_INDEX_DIR_ENV, str(tmp_path))
+    grid = sx.read_hgrid_gr3(str(p_cur / "testdata/testmesh.gr3"))
+    xs = np.array([2., 0., 35.5, -100.])
+    ys = np.array([1., 0., 42.1, -100.])
+    faces, weights = grid.locate_points(xs, ys)
+    assert len(list(tmp_path.glob('sindex_*'))) == 1
+
+    grid = sx.read_hgrid_gr3(str(p_cur / "testdata/testmesh.gr3"))
+    locator = grid.element_locator
+    assert isinstance(locator.bin_tris, np.memmap)
+    faces_loaded, weights_loaded = grid.locate_points(xs, ys)
+    np.testing.assert_array_equal(faces_loaded, faces)
+    np.testing.assert_array_equal(weights_loaded, weights)
+    np.testing.assert_allclose(grid.compute_face_areas().values,
+                               [p.area for p in grid_test.face_polygons.values])
+    np.testing.assert_allclose(locator.face_centroids,
+                               [(p.centroid.x, p.centroid.y)
+                                for p in grid_test.face_polygons.values])
+
+
 def test_find_element_at_position_dask(grid_test_dask):
     """ Test find_element_at """
     # When a point is inside an element
@@ -122,13 +278,199 @@ def test_subset(grid_test_dask):
     assert grid_sub.ds.SCHISM_hgrid_face_nodes.values[0, -1] == grid_sub.ds.SCHISM_hgrid_face_nodes.attrs['_FillValue']
 
 
+def test_subset_renumbers_and_stays_lazy(grid_test):
+    """ Test subset on a grid with edges and a dask-backed variable """
+    face_nodes = grid_test.Mesh2_face_nodes.values
+    n_nodes = (face_nodes != -1).sum(axis=1)
+    edges = set()
+    for row, n in zip(face_nodes, n_nodes):
+        for a, b in zip(row[:n], np.roll(row[:n], -1)):
+            edges.add((min(a, b), max(a, b)))
+    edges = np.array(sorted(edges))
+    grid_test.ds['SCHISM_hgrid_edge_nodes'] = xr.DataArray(
+        edges, dims=('nSCHISM_hgrid_edge', 'two'), attrs={'start_index': 1})
+    node_x = grid_test.Mesh2_node_x.values
+    node_y = grid_test.Mesh2_node_y.values
+    grid_test.ds['elev'] = xr.DataArray(
+        np.arange(3.)[:, None] + node_x[None, :],
+        dims=('time', 'nSCHISM_hgrid_node')).chunk({'time': 1})
+
+    polygon = Polygon(([-30, -30], [30, -30], [30, 30], [-30, 30]))
+    grid_sub = grid_test.subset(polygon)
+    elem_ilocs = grid_test.elem_strtree.query(polygon, predicate='contains')
+    assert grid_sub.ds.sizes['nSCHISM_hgrid_face'] == len(elem_ilocs)
+    original = grid_sub.ds.SCHISM_hgrid_node_indices.values
+    # The renumbered faces point to the same coordinates
+    new_faces = grid_sub.ds.SCHISM_hgrid_face_nodes.values
+    valid = new_faces != -1
+    old_faces = face_nodes[elem_ilocs]
+    np.testing.assert_array_equal(np.where(valid, original[new_faces - 1], -1), old_faces)
+    # Every edge with both nodes in the subset is kept
+    new_edges = original[grid_sub.ds.SCHISM_hgrid_edge_nodes.values - 1]
+    expected = edges[np.isin(edges, original).all(axis=1)]
+    np.testing.assert_array_equal(new_edges, expected)
+    # Data variables are carried lazily
+    assert grid_sub.ds['elev'].chunks is not None
+    np.testing.assert_array_equal(grid_sub.ds['elev'].values[1],
+                                  1. + node_x[original - 1])
+
+
 def test_depth_average(grid_test_dask):
     da = grid_test_dask.depth_average('salinity')
     assert da.sel(nSCHISM_hgrid_node=492).values[0] == pytest.approx(0.145977, abs=1e-6)
 
 
+def test_depth_average_bottom_index_and_dry(grid_test):
+    """ Test depth_average on a linear profile with varying bottoms """
+    n_node = grid_test.Mesh2_node_x.size
+    n_layer = 6
+    k_bottom = np.arange(n_node) % 3
+    z = np.broadcast_to(np.linspace(-5., 0., n_layer), (4, n_node, n_layer)).copy()
+    # Values below the bottom are fill values, not NaN
+    below = np.arange(n_layer)[None, :] < k_bottom[:, None]
+    z[:, below] = -99999.
+    v = 2. * z + np.arange(4.)[:, None, None]
+    v[:, below] = -99999.
+    dims = ('time', 'nSCHISM_hgrid_node', 'nSCHISM_vgrid_layers')
+    grid_test.ds['zCoordinates'] = xr.DataArray(z, dims=dims)
+    grid_test.ds['salinity'] = xr.DataArray(v.astype(np.float32), dims=dims)
+    grid_test.ds['bottom_index_node'] = xr.DataArray(
+        k_bottom + 1, dims=('nSCHISM_hgrid_node',))
+    dry = np.zeros((4, n_node), dtype=np.int32)
+    dry[2, :5] = 1
+    grid_test.ds['dryFlagNode'] = xr.DataArray(dry, dims=dims[:2])
+
+    da = grid_test.depth_average('salinity', time_chunk=3)
+    assert da.dtype == np.float32
+    assert da.dims == dims[:2]
+    # The average of a linear profile is the value at mid-depth
+    z_bottom = np.linspace(-5., 0., n_layer)[k_bottom]
+    expected = z_bottom[None, :] + np.arange(4.)[:, None]
+    expected[dry == 1] = np.nan
+    np.testing.assert_allclose(da.values, expected, rtol=1e-6)
+
+
 def test_vtk_grid(grid_test_dask):
     polygon = Polygon(([55830, -10401], [56001, -10401], [56001, -10240], [55830, -10240]))
     grid_sub = grid_test_dask.subset(polygon)
     vtk_grid = grid_sub.create_vtk_grid()
     sx.write_vtk_grid(vtk_grid, 'test.vtu')
+
+
+def _read_vtu(path):
+    vtk = pytest.importorskip("vtk")
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(str(path))
+    reader.Update()
+    return reader.GetOutput()
+
+
+def test_create_vtk_grid_mixed_cells(grid_test):
+    """ Test create_vtk_grid with triangles and quads """
+    from vtk.util import numpy_support
+    vtk_grid = grid_test.create_vtk_grid()
+    assert vtk_grid.GetNumberOfPoints() == 112
+    assert vtk_grid.GetNumberOfCells() == 135
+    np.testing.assert_array_equal(
+        numpy_support.vtk_to_numpy(vtk_grid.GetPoints().GetData())[:, 0],
+        grid_test.Mesh2_node_x.values)
+    face_nodes = grid_test.face_nodes_zero_based()
+    for i in (0, 60, 134):
+        ids = vtk_grid.GetCell(i).GetPointIds()
+        cell = [ids.GetId(j) for j in range(ids.GetNumberOfIds())]
+        assert cell == [n for n in face_nodes[i] if n >= 0]
+    n_nodes = (face_nodes >= 0).sum(axis=1)
+    cell_types = [vtk_grid.GetCellType(i) for i in range(135)]
+    np.testing.assert_array_equal(cell_types, np.where(n_nodes == 3, 5, 9))
+
+
+def test_write_vtk_time_series(grid_test, tmp_path):
+    """ Test writing a VTU/PVD time series with worker processes """
+    from vtk.util import numpy_support
+    node_x = grid_test.Mesh2_node_x.values
+    times = np.array(['2020-01-01T00', '2020-01-01T01', '2020-01-01T02'],
+                     dtype='datetime64[ns]')
+    grid_test.ds['elev'] = xr.DataArray(
+        np.arange(3.)[:, None] + node_x[None, :],
+        dims=('time', 'nSCHISM_hgrid_node'), coords={'time': times})
+    paths = grid_test.write_vtk_time_series('elev', str(tmp_path / 'out.pvd'),
+                                            n_workers=2)
+    assert [Path(p).name for p in paths] == ['out_00000.vtu', 'out_00001.vtu',
+                                             'out_00002.vtu']
+    datasets = ET.parse(tmp_path / 'out.pvd').getroot().iter('DataSet')
+    assert [(d.get('timestep'), d.get('file')) for d in datasets] == [
+        ('0.0', 'out_00000.vtu'), ('3600.0', 'out_00001.vtu'),
+        ('7200.0', 'out_00002.vtu')]
+    vtk_grid = _read_vtu(paths[2])
+    assert vtk_grid.GetNumberOfCells() == 135
+    values = numpy_support.vtk_to_numpy(vtk_grid.GetPointData().GetArray('elev'))
+    np.testing.assert_allclose(values, 2. + node_x)
+
+
+@pytest.fixture
+def grid_test_layers(grid_test):
+    """ Test mesh with four levels, a deeper bottom at every other node """
+    n_node = grid_test.Mesh2_node_x.size
+    k_bottom = np.arange(n_node) % 2
+    dims = ('time', 'nSCHISM_hgrid_node', 'nSCHISM_vgrid_layers')
+    z = np.broadcast_to(np.linspace(-3., 0., 4), (2, n_node, 4)).copy()
+    z[1] += 0.5
+    z[:, k_bottom == 1, 0] = np.nan
+    grid_test.ds['bottom_index_node'] = xr.DataArray(k_bottom + 1, dims=dims[1:2])
+    grid_test.ds['zCoordinates'] = xr.DataArray(z, dims=dims)
+    grid_test.ds['salt'] = xr.DataArray(
+        np.arange(2.)[:, None, None] + grid_test.Mesh2_node_x.values[None, :, None]
+        + np.arange(4.)[None, None, :], dims=dims)
+    return grid_test
+
+
+def test_create_vtk_grid_3d(grid_test_layers):
+    """ Test the layered VTK grid """
+    vtk = pytest.importorskip("vtk")
+    from vtk.util import numpy_support
+    grid = grid_test_layers
+    vtk_grid = grid.create_vtk_grid_3d()
+    face_nodes = grid.face_nodes_zero_based()
+    k_bottom = grid.ds.bottom_index_node.values - 1
+    k_face = np.where(face_nodes >= 0, k_bottom[face_nodes], -1).max(axis=1)
+    assert vtk_grid.GetNumberOfPoints() == 4 * 112
+    assert vtk_grid.GetNumberOfCells() == (3 - k_face).sum()
+    n_nodes = (face_nodes >= 0).sum(axis=1)
+    cell_types = [vtk_grid.GetCellType(i) for i in range(vtk_grid.GetNumberOfCells())]
+    np.testing.assert_array_equal(
+        cell_types, np.repeat(np.where(n_nodes == 3, vtk.VTK_WEDGE, vtk.VTK_HEXAHEDRON),
+                              3 - k_face))
+    # All the cells are right side up
+    quality = vtk.vtkMeshQuality()
+    quality.SetInputData(vtk_grid)
+    quality.SetWedgeQualityMeasureToVolume()
+    quality.SetHexQualityMeasureToVolume()
+    quality.Update()
+    volumes = numpy_support.vtk_to_numpy(
+        quality.GetOutput().GetCellData().GetArray('Quality'))
+    assert (volumes > 0.).all()
+    # Points below the bottom sit on the bottom
+    z = numpy_support.vtk_to_numpy(vtk_grid.GetPoints().GetData())[:, 2]
+    np.testing.assert_allclose(z.reshape(4, 112)[0], np.where(k_bottom == 1, -2., -3.))
+
+
+def test_write_vtk_time_series_3d(grid_test_layers, tmp_path):
+    """ Test writing a layered VTU/PVD time series with worker processes """
+    from vtk.util import numpy_support
+    grid = grid_test_layers
+    paths = grid.write_vtk_time_series_3d('salt', str(tmp_path / 'salt.pvd'),
+                                          n_workers=2)
+    assert len(paths) == 2
+    assert len(list(ET.parse(tmp_path / 'salt.pvd').getroot().iter('DataSet'))) == 2
+    vtk_grid = _read_vtu(paths[1])
+    z = numpy_support.vtk_to_numpy(vtk_grid.GetPoints().GetData())[:, 2]
+    np.testing.assert_allclose(z.reshape(4, 112)[-1], 0.5)
+    values = numpy_support.vtk_to_numpy(
+        vtk_grid.GetPointData().GetArray('salt')).reshape(4, 112)
+    node_x = grid.Mesh2_node_x.values
+    np.testing.assert_allclose(values[2], 1. + node_x + 2.)
+    k_bottom = grid.ds.bottom_index_node.values - 1
+    assert np.isnan(values[0, k_bottom == 1]).all()
+    assert not np.isnan(values[0, k_bottom == 0]).any()
+    with pytest.raises(ValueError):
+        grid.write_vtk_time_series_3d('bottom_index_node', str(tmp_path / 'x.pvd'))